@@ -1,4 +1,7 @@
 from enum import IntEnum
+from typing import Tuple
+
+from constants import ROWS, COLUMNS
 
 class ActionType(IntEnum):
     """Enumeration of possible action types in the environment."""
@@ -9,3 +12,32 @@ class ActionType(IntEnum):
     ATTACK = 4
     DRAW_SPELL = 5
     DRAW_UNIT = 6
+
+
+# Upper bound (exclusive) of the unit or hand index of an action.
+MAX_ACTION_INDEX = 20
+
+# Size of the discrete action space. There are seven action types
+# (move, deploy, play card, end turn, attack, draw spell, draw unit) so the action space must account
+# for all of them.
+# The action space includes one dimension for the ``ActionType`` enum
+ACTION_SIZE = len(ActionType) * MAX_ACTION_INDEX * ROWS * COLUMNS
+
+# Shape of the action space when viewed as ``(type, index, row, col)``.
+ACTION_SHAPE = (len(ActionType), MAX_ACTION_INDEX, ROWS, COLUMNS)
+
+
+def action_to_index(action: Tuple[int, int, int, int]) -> int:
+    atype, idx, row, col = action
+    atype = int(atype)
+    return ((atype * MAX_ACTION_INDEX + idx) * ROWS + row) * COLUMNS + col
+
+
+def index_to_action(index: int) -> Tuple[int, int, int, int]:
+    col = index % COLUMNS
+    index //= COLUMNS
+    row = index % ROWS
+    index //= ROWS
+    idx = index % MAX_ACTION_INDEX
+    atype = index // MAX_ACTION_INDEX
+    return ActionType(atype), idx, row, col
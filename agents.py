@@ -3,10 +3,23 @@ from grids_env import GridsEnv
 from actions import ActionType
 
 class RandomAgent:
-    """Agent that selects a random valid action."""
+    """Agent that selects a random valid action.
+
+    Choices come from ``rng`` (a :class:`random.Random`), or from the
+    :mod:`random` module when it is omitted.
+    """
+    def __init__(self, rng=None):
+        self.rng = random if rng is None else rng
+
     def act(self, env: GridsEnv):
-        actions = env.valid_actions()
-        return random.choice(actions) if actions else (
+        return self._choose(env.valid_actions())
+
+    def act_batch(self, valid_actions):
+        """Pick one action per game from a list of valid action lists."""
+        return [self._choose(actions) for actions in valid_actions]
+
+    def _choose(self, actions):
+        return self.rng.choice(actions) if actions else (
             ActionType.PLAY_CARD,
             0,
             0,
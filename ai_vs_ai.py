@@ -4,11 +4,12 @@ from game import GridsGame
 from grids_env import GridsEnv
 from agents import RandomAgent
 from dqn_agent import DQNAgent
+from inference_server import InferenceServer, InferenceClientAgent
 
 class AIVsAI(GridsGame):
     """Visualize two AI agents playing against each other."""
     def __init__(self, agent1, agent2, step_delay: float = 0.5):
-        self.env = GridsEnv(animate=True)
+        self.env = GridsEnv()
         self.agent1 = agent1
         self.agent2 = agent2
         if hasattr(self.agent1, "env"):
@@ -54,15 +55,15 @@ class AIVsAI(GridsGame):
 
 
 def main():
-    # Load the trained model for both players by default.
-    agent1 = DQNAgent(GridsEnv())
-    agent1.load("dqn_model.pth")
-    agent1.epsilon = 0.0
-    agent2 = DQNAgent(GridsEnv())
-    agent2.load("dqn_model.pth")
-    agent2.epsilon = 0.0
-    window = AIVsAI(agent1, agent2)
-    arcade.run()
+    # Load the trained model once and let both players share it through an
+    # inference server.
+    model = DQNAgent(GridsEnv())
+    model.load("dqn_model.pth")
+    with InferenceServer(model.policy_net) as server:
+        agent1 = InferenceClientAgent(server)
+        agent2 = InferenceClientAgent(server)
+        window = AIVsAI(agent1, agent2)
+        arcade.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,635 @@
+"""Structure-of-arrays rules engine running many games at once.
+
+:class:`BatchedGameState` keeps every game of a batch in NumPy arrays and
+applies one ``(action_type, index, row, col)`` action per game with array
+operations. Each step reproduces :meth:`GridsEnv.step` on top of
+:class:`GameState` exactly: rewards, the early termination of malformed
+actions, the automatic end of turn when action points run out and every rule
+of ``move_unit``, ``attack_unit``, ``play_card`` and
+``process_turn_effects`` (Trebuchet splash, knockback, fire and burn ticks).
+
+Units live in per-game slots numbered in creation order. ``GameState.units``
+only ever appends new units and removes dead ones, so the ``index`` of MOVE
+and ATTACK actions is the position of a slot among the live slots.
+
+Teleport picks its unit with the game's own ``random.Random``: every game
+keeps one in :attr:`BatchedGameState.game_rngs`, copied from
+``GameState.rng`` by :meth:`BatchedGameState.load_game_state`, so it draws
+the same unit as :class:`GameState` would.
+"""
+
+import random
+
+import numpy as np
+
+from actions import ActionType
+from cards import Fireball, MeteoriteStrike, Teleport
+from constants import ROWS, COLUMNS, HAND_CAPACITY
+from game_state import (
+    ACTION_POINTS,
+    BLOCKED_ACTION_POINTS,
+    BURN_DAMAGE,
+    FIRE_DAMAGE,
+    UNIT_DECK_TYPES,
+    SPELL_DECK_TYPES,
+    DECK_COPIES,
+    COMMANDER_STATS,
+)
+from grids_env import (
+    UNIT_TYPES,
+    UNIT_TYPE_TO_ID,
+    SPELL_TYPES,
+    SPELL_TYPE_TO_ID,
+    DAMAGE_REWARD_SCALE,
+    UNIT_DEPLOY_REWARD,
+    ITEM_USE_REWARD,
+    ATTACK_REWARD,
+    DRAW_CARD_REWARD,
+)
+from units import Trebuchet, Healer
+
+# Unit type ids reuse the observation encoding; commanders get the next id.
+COMMANDER_ID = len(UNIT_TYPES) + 1
+TREBUCHET_ID = UNIT_TYPE_TO_ID[Trebuchet]
+HEALER_ID = UNIT_TYPE_TO_ID[Healer]
+UNIT_NAMES = {UNIT_TYPE_TO_ID[cls]: cls.__name__ for cls in UNIT_TYPES}
+UNIT_NAMES[COMMANDER_ID] = "Commander"
+UNIT_NAME_TO_ID = {name: tid for tid, name in UNIT_NAMES.items()}
+
+FIREBALL_ID = SPELL_TYPE_TO_ID[Fireball]
+METEORITE_ID = SPELL_TYPE_TO_ID[MeteoriteStrike]
+TELEPORT_ID = SPELL_TYPE_TO_ID[Teleport]
+
+UNIT_DECK = np.array(
+    [UNIT_TYPE_TO_ID[cls] for cls in UNIT_DECK_TYPES] * DECK_COPIES, dtype=np.int8
+)
+SPELL_DECK = np.array(
+    [SPELL_TYPE_TO_ID[cls] for cls in SPELL_DECK_TYPES] * DECK_COPIES, dtype=np.int8
+)
+# Two commanders plus every unit card of both decks.
+MAX_UNITS = 2 + 2 * len(UNIT_DECK)
+INITIAL_DRAW = 3
+
+OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _stat_tables():
+    """Return per-type ``health, attack, move, range, deploy_cost`` arrays."""
+    size = COMMANDER_ID + 1
+    tables = [np.zeros(size, dtype=np.int16) for _ in range(5)]
+    for cls, tid in UNIT_TYPE_TO_ID.items():
+        unit = cls(0, 0, owner=1)
+        stats = (unit.health, unit.attack, unit.move_range, unit.attack_range,
+                 unit.deploy_cost)
+        for table, value in zip(tables, stats):
+            table[tid] = value
+    stats = (COMMANDER_STATS["health"], COMMANDER_STATS["attack"],
+             COMMANDER_STATS["move_range"], COMMANDER_STATS["attack_range"], 1)
+    for table, value in zip(tables, stats):
+        table[COMMANDER_ID] = value
+    return tables
+
+
+UNIT_HEALTH, UNIT_ATTACK, UNIT_MOVE, UNIT_RANGE, UNIT_DEPLOY_COST = _stat_tables()
+SPELL_COST = np.zeros(len(SPELL_TYPES) + 1, dtype=np.int16)
+for _cls, _sid in SPELL_TYPE_TO_ID.items():
+    SPELL_COST[_sid] = _cls().cost
+
+
+def _dilate(mask: np.ndarray) -> np.ndarray:
+    """Grow a ``(n, ROWS, COLUMNS)`` boolean mask by one orthogonal step."""
+    out = np.zeros_like(mask)
+    out[:, 1:, :] |= mask[:, :-1, :]
+    out[:, :-1, :] |= mask[:, 1:, :]
+    out[:, :, 1:] |= mask[:, :, :-1]
+    out[:, :, :-1] |= mask[:, :, 1:]
+    return out
+
+
+def _inside(row, col):
+    return (row >= 0) & (row < ROWS) & (col >= 0) & (col < COLUMNS)
+
+
+class BatchedGameState:
+    """``batch_size`` games stored as NumPy arrays.
+
+    Per-unit arrays have shape ``(batch_size, max_units)``; hands and decks
+    are indexed by ``player - 1``. Use :meth:`from_game_states` to mirror
+    existing :class:`GameState` objects, or :meth:`reset` to deal fresh games
+    from the engine's own random generator.
+
+    ``game_rngs`` holds the ``random.Random`` of every game (the counterpart
+    of ``GameState.rng``) and ``selected_unit`` the slot of
+    ``GameState.selected_unit`` (-1 for none); both only matter for Teleport.
+    """
+
+    def __init__(self, batch_size: int, seed=None, max_units: int = MAX_UNITS):
+        self.batch_size = batch_size
+        self.max_units = max_units
+        self.rng = np.random.default_rng(seed)
+        B, U = batch_size, max_units
+
+        self.alive = np.zeros((B, U), dtype=bool)
+        self.unit_type = np.zeros((B, U), dtype=np.int8)
+        self.owner = np.zeros((B, U), dtype=np.int8)
+        self.row = np.zeros((B, U), dtype=np.int8)
+        self.col = np.zeros((B, U), dtype=np.int8)
+        self.health = np.zeros((B, U), dtype=np.int16)
+        self.max_health = np.zeros((B, U), dtype=np.int16)
+        self.attack = np.zeros((B, U), dtype=np.int16)
+        self.move_range = np.zeros((B, U), dtype=np.int16)
+        self.attack_range = np.zeros((B, U), dtype=np.int16)
+        self.frozen_turns = np.zeros((B, U), dtype=np.int8)
+        self.burn_turns = np.zeros((B, U), dtype=np.int8)
+        self.has_attacked = np.zeros((B, U), dtype=bool)
+        # attacked[b, attacker, target] replaces ``Unit.attacked_targets``
+        self.attacked = np.zeros((B, U, U), dtype=bool)
+        self.num_created = np.zeros(B, dtype=np.int16)
+
+        self.fires = np.zeros((B, ROWS, COLUMNS), dtype=np.int8)
+        self.action_points = np.zeros(B, dtype=np.int16)
+        self.current_player = np.ones(B, dtype=np.int8)
+        self.blocked_turns = np.zeros((B, 2), dtype=np.int8)
+        self.winner = np.zeros(B, dtype=np.int8)  # 0 while the game is ongoing
+        self.selected_unit = np.full(B, -1, dtype=np.int16)
+        self.game_rngs = [random.Random() for _ in range(B)]
+
+        self.unit_hand = np.zeros((B, 2, HAND_CAPACITY), dtype=np.int8)
+        self.unit_hand_len = np.zeros((B, 2), dtype=np.int16)
+        self.spell_hand = np.zeros((B, 2, HAND_CAPACITY), dtype=np.int8)
+        self.spell_hand_len = np.zeros((B, 2), dtype=np.int16)
+        # decks are drawn from ``pos`` onwards; earlier entries are spent
+        self.unit_deck = np.zeros((B, 2, len(UNIT_DECK)), dtype=np.int8)
+        self.unit_deck_pos = np.zeros((B, 2), dtype=np.int16)
+        self.spell_deck = np.zeros((B, 2, len(SPELL_DECK)), dtype=np.int8)
+        self.spell_deck_pos = np.zeros((B, 2), dtype=np.int16)
+
+    # ------------------------------------------------------------------
+    # Construction
+    def reset(self, indices=None) -> None:
+        """Deal new games into ``indices`` (all games by default)."""
+        b = np.arange(self.batch_size) if indices is None else np.asarray(indices)
+        n = len(b)
+        if n == 0:
+            return
+        for name in ("alive", "has_attacked", "unit_type", "owner", "row", "col",
+                     "health", "max_health", "attack", "move_range",
+                     "attack_range", "frozen_turns", "burn_turns", "attacked",
+                     "fires", "blocked_turns", "unit_hand", "unit_hand_len",
+                     "spell_hand", "spell_hand_len"):
+            getattr(self, name)[b] = 0
+        self.current_player[b] = 1
+        self.action_points[b] = ACTION_POINTS
+        self.winner[b] = 0
+        self.selected_unit[b] = -1
+        self.num_created[b] = 0
+        for owner, col in ((1, 0), (2, COLUMNS - 1)):
+            slot = np.full(n, owner - 1)
+            self._create_units(b, slot, np.full(n, COMMANDER_ID), np.full(n, owner),
+                               np.full(n, ROWS // 2), np.full(n, col))
+        self.num_created[b] = 2
+
+        # shuffle every deck independently with one argsort
+        self.unit_deck[b] = UNIT_DECK[np.argsort(self.rng.random((n, 2, len(UNIT_DECK))), axis=2)]
+        self.spell_deck[b] = SPELL_DECK[np.argsort(self.rng.random((n, 2, len(SPELL_DECK))), axis=2)]
+        self.spell_hand[b, :, :INITIAL_DRAW] = self.spell_deck[b, :, :INITIAL_DRAW]
+        self.unit_hand[b, :, :INITIAL_DRAW] = self.unit_deck[b, :, :INITIAL_DRAW]
+        self.spell_hand_len[b] = INITIAL_DRAW
+        self.unit_hand_len[b] = INITIAL_DRAW
+        self.spell_deck_pos[b] = INITIAL_DRAW
+        self.unit_deck_pos[b] = INITIAL_DRAW
+        for i, seed in zip(b, self.rng.integers(2**63, size=n)):
+            self.game_rngs[i].seed(int(seed))
+
+    @classmethod
+    def from_game_states(cls, states, seed=None) -> "BatchedGameState":
+        """Build a batch mirroring a list of :class:`GameState` objects."""
+        batch = cls(len(states), seed=seed)
+        for i, state in enumerate(states):
+            batch.load_game_state(i, state)
+        return batch
+
+    def load_game_state(self, i: int, state) -> None:
+        """Copy the logical contents of ``state`` into game ``i``."""
+        if len(state.units) > self.max_units:
+            raise ValueError("state has more units than max_units")
+        uid = {id(u): slot for slot, u in enumerate(state.units)}
+        for name in ("alive", "has_attacked", "attacked", "fires", "unit_hand",
+                     "spell_hand", "unit_deck", "spell_deck"):
+            getattr(self, name)[i] = 0
+        for slot, unit in enumerate(state.units):
+            self.alive[i, slot] = True
+            self.unit_type[i, slot] = UNIT_NAME_TO_ID[unit.unit_type]
+            self.owner[i, slot] = unit.owner
+            self.row[i, slot] = unit.row
+            self.col[i, slot] = unit.col
+            self.health[i, slot] = unit.health
+            self.max_health[i, slot] = unit.max_health
+            self.attack[i, slot] = unit.attack
+            self.move_range[i, slot] = unit.move_range
+            self.attack_range[i, slot] = unit.attack_range
+            self.frozen_turns[i, slot] = unit.frozen_turns
+            self.burn_turns[i, slot] = unit.burn_turns
+            self.has_attacked[i, slot] = unit.has_attacked
+            for target in unit.attacked_targets:
+                if id(target) in uid:
+                    self.attacked[i, slot, uid[id(target)]] = True
+        self.num_created[i] = len(state.units)
+        for (row, col), turns in state.fires.items():
+            if 0 <= row < ROWS and 0 <= col < COLUMNS:
+                self.fires[i, row, col] = turns
+        self.action_points[i] = state.current_action_points
+        self.current_player[i] = state.current_player
+        self.blocked_turns[i] = (state.player1BlockedTurnsTimer,
+                                 state.player2BlockedTurnsTimer)
+        self.winner[i] = state.winner or 0
+        self.selected_unit[i] = uid.get(id(state.selected_unit), -1)
+        self.game_rngs[i].setstate(state.rng.getstate())
+        for p in (0, 1):
+            units = [UNIT_TYPE_TO_ID[c] for c in state.unit_hands[p + 1]]
+            spells = [SPELL_TYPE_TO_ID[type(c)] for c in state.spell_hands[p + 1]]
+            self.unit_hand[i, p, :len(units)] = units
+            self.unit_hand_len[i, p] = len(units)
+            self.spell_hand[i, p, :len(spells)] = spells
+            self.spell_hand_len[i, p] = len(spells)
+            # remaining cards are right-aligned so ``pos`` marks the next draw
+            deck = [UNIT_TYPE_TO_ID[c] for c in state.unit_decks[p + 1]]
+            self.unit_deck_pos[i, p] = len(UNIT_DECK) - len(deck)
+            self.unit_deck[i, p, len(UNIT_DECK) - len(deck):] = deck
+            deck = [SPELL_TYPE_TO_ID[type(c)] for c in state.spell_decks[p + 1]]
+            self.spell_deck_pos[i, p] = len(SPELL_DECK) - len(deck)
+            self.spell_deck[i, p, len(SPELL_DECK) - len(deck):] = deck
+
+    def unit_records(self, i: int):
+        """Return ``(type, owner, row, col, health, frozen, burn, has_attacked)``
+        for the live units of game ``i`` in ``GameState.units`` order."""
+        return [
+            (
+                UNIT_NAMES[int(self.unit_type[i, s])], int(self.owner[i, s]),
+                int(self.row[i, s]), int(self.col[i, s]), int(self.health[i, s]),
+                int(self.frozen_turns[i, s]), int(self.burn_turns[i, s]),
+                bool(self.has_attacked[i, s]),
+            )
+            for s in np.flatnonzero(self.alive[i])
+        ]
+
+    # ------------------------------------------------------------------
+    # Observations
+    def observations(self, out=None) -> dict:
+        """Fill ``out`` (or new arrays) with stacked :class:`GridsEnv`
+        observations using the same keys and dtypes as
+        :func:`grids_vec_env.buffer_spec`."""
+        B = self.batch_size
+        if out is None:
+            from grids_vec_env import allocate_buffers
+
+            out = allocate_buffers(B)
+        games = np.arange(B)
+        p = self.current_player.astype(np.intp) - 1
+        out["current_player"][:] = self.current_player
+        out["action_points"][:] = self.action_points
+        out["board_owner"].fill(0)
+        out["board_health"].fill(0)
+        gi, slot = np.nonzero(self.alive)
+        cells = (gi, self.row[gi, slot], self.col[gi, slot])
+        out["board_owner"][cells] = self.owner[gi, slot]
+        out["board_health"][cells] = self.health[gi, slot]
+        out["opponent_hand"][:] = (
+            self.unit_hand_len[games, 1 - p] + self.spell_hand_len[games, 1 - p]
+        )
+        out["unit_hand"][:] = self.unit_hand[games, p]
+        out["spell_hand"][:] = self.spell_hand[games, p]
+        return out
+
+    # ------------------------------------------------------------------
+    # Stepping
+    def step(self, actions):
+        """Apply one action per game.
+
+        ``actions`` is an integer array of shape ``(batch_size, 4)``. Returns
+        ``(rewards, terminated)`` with the values :meth:`GridsEnv.step` would
+        report. Games are not reset automatically.
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.batch_size, 4)
+        atype, idx, row, col = actions.T
+        if ((atype < 0) | (atype >= len(ActionType))).any():
+            raise ValueError("unknown action type")
+        B = self.batch_size
+        games = np.arange(B)
+        rewards = np.zeros(B, dtype=np.float64)
+        # malformed actions end the episode with -1, as in ``GridsEnv.step``
+        early = np.zeros(B, dtype=bool)
+
+        opponent = 3 - self.current_player
+        pre_health = self._commander_health(games, opponent)
+
+        handlers = {
+            ActionType.MOVE: self._step_move,
+            ActionType.DEPLOY: self._step_deploy,
+            ActionType.PLAY_CARD: self._step_play_card,
+            ActionType.ATTACK: self._step_attack,
+            ActionType.DRAW_SPELL: self._step_draw_spell,
+            ActionType.DRAW_UNIT: self._step_draw_unit,
+            ActionType.END_TURN: self._step_end_turn,
+        }
+        for action_type, handler in handlers.items():
+            b = np.flatnonzero(atype == action_type)
+            if len(b):
+                handler(b, idx[b], row[b], col[b], rewards, early)
+
+        normal = ~early
+        self._end_turn(np.flatnonzero(normal & (self.action_points <= 0)))
+        damage = np.maximum(0, pre_health - self._commander_health(games, opponent))
+        rewards[normal] += damage[normal] * DAMAGE_REWARD_SCALE
+        rewards[early] = -1.0
+        terminated = early | (self.winner != 0)
+        return rewards.astype(np.float32), terminated
+
+    # -- per action type ------------------------------------------------
+    def _step_move(self, b, idx, row, col, rewards, early):
+        slot, valid = self._slot_of_index(b, idx)
+        early[b[~valid]] = True
+        b, slot, row, col = b[valid], slot[valid], row[valid], col[valid]
+        ok = self._move(b, slot, row, col)
+        rewards[b] = np.where(ok, 0.0, -1.0)
+
+    def _step_deploy(self, b, idx, row, col, rewards, early):
+        p = self.current_player[b].astype(np.intp) - 1
+        deploy_col = np.where(p == 0, 0, COLUMNS - 1)
+        inside = _inside(row, col)
+        occupied = self._occupancy(b)[np.arange(len(b)), row.clip(0, ROWS - 1),
+                                      col.clip(0, COLUMNS - 1)] > 0
+        valid = (idx < self.unit_hand_len[b, p]) & inside & (col == deploy_col) & ~occupied
+        early[b[~valid]] = True
+        b, idx, p, row, col = b[valid], idx[valid], p[valid], row[valid], col[valid]
+        unit_type = self.unit_hand[b, p, idx]
+        ok = self.action_points[b] >= UNIT_DEPLOY_COST[unit_type]
+        rewards[b] = np.where(ok, UNIT_DEPLOY_REWARD, -1.0)
+        b, p, row, col, unit_type = b[ok], p[ok], row[ok], col[ok], unit_type[ok]
+        # ``list.remove`` drops the first card of that type, not ``idx``
+        first = np.argmax(self.unit_hand[b, p] == unit_type[:, None], axis=1)
+        self._remove_from_hand(self.unit_hand, self.unit_hand_len, b, p, first)
+        self._create_units(b, self.num_created[b], unit_type, p + 1, row, col)
+        self.num_created[b] += 1
+        self.action_points[b] -= UNIT_DEPLOY_COST[unit_type]
+
+    def _step_play_card(self, b, idx, row, col, rewards, early):
+        p = self.current_player[b].astype(np.intp) - 1
+        valid = idx < self.spell_hand_len[b, p]
+        early[b[~valid]] = True
+        b, idx, p, row, col = b[valid], idx[valid], p[valid], row[valid], col[valid]
+        card = self.spell_hand[b, p, idx]
+        cost = SPELL_COST[card]
+        ok = self.action_points[b] >= cost
+        rewards[b] = np.where(ok, ITEM_USE_REWARD, -1.0)
+        b, idx, p, row, col, card, cost = (
+            b[ok], idx[ok], p[ok], row[ok], col[ok], card[ok], cost[ok]
+        )
+        # with a cell target only Fireball and Meteorite Strike have effects
+        fire = (card == FIREBALL_ID) & _inside(row, col)
+        self.fires[b[fire], row[fire], col[fire]] = Fireball.FIRE_TURNS
+        meteor = card == METEORITE_ID
+        if meteor.any():
+            self._meteorite(b[meteor], row[meteor], col[meteor])
+        teleport = np.flatnonzero(card == TELEPORT_ID)
+        for k in teleport:
+            self._teleport(b[k], row[k], col[k])
+        self._remove_from_hand(self.spell_hand, self.spell_hand_len, b, p, idx)
+        self.action_points[b] -= cost
+        self._remove_dead(b)
+
+    def _step_attack(self, b, idx, row, col, rewards, early):
+        slot, valid = self._slot_of_index(b, idx)
+        inside = _inside(row, col)
+        target = self._occupancy(b)[np.arange(len(b)), row.clip(0, ROWS - 1),
+                                    col.clip(0, COLUMNS - 1)].astype(np.intp) - 1
+        valid &= inside & (target >= 0)
+        early[b[~valid]] = True
+        b, slot, target = b[valid], slot[valid], target[valid]
+        ok = self._attack(b, slot, target)
+        rewards[b] = np.where(ok, ATTACK_REWARD, -1.0)
+
+    def _step_draw_spell(self, b, idx, row, col, rewards, early):
+        ok = self._draw(b, self.spell_deck, self.spell_deck_pos,
+                        self.spell_hand, self.spell_hand_len)
+        rewards[b] = np.where(ok, DRAW_CARD_REWARD, -1.0)
+
+    def _step_draw_unit(self, b, idx, row, col, rewards, early):
+        ok = self._draw(b, self.unit_deck, self.unit_deck_pos,
+                        self.unit_hand, self.unit_hand_len)
+        rewards[b] = np.where(ok, DRAW_CARD_REWARD, -1.0)
+
+    def _step_end_turn(self, b, idx, row, col, rewards, early):
+        self._end_turn(b)
+        rewards[b] = 0.0
+
+    # -- rules ----------------------------------------------------------
+    def _move(self, b, slot, row, col):
+        """Batched ``GameState.move_unit`` without animation."""
+        n = len(b)
+        ok = self.frozen_turns[b, slot] <= 0
+        start_row = self.row[b, slot].astype(np.intp)
+        start_col = self.col[b, slot].astype(np.intp)
+        move_range = self.move_range[b, slot]
+        free = self._occupancy(b) == 0
+        # cells reachable in ``k`` steps through free cells equal the A*
+        # path length check in ``move_unit``
+        reach = np.zeros((n, ROWS, COLUMNS), dtype=bool)
+        reach[np.arange(n), start_row, start_col] = True
+        for k in range(1, int(move_range.max(initial=0)) + 1):
+            grown = reach | (_dilate(reach) & free)
+            reach = np.where((k <= move_range)[:, None, None], grown, reach)
+        ok &= _inside(row, col)
+        ok &= reach[np.arange(n), row.clip(0, ROWS - 1), col.clip(0, COLUMNS - 1)]
+        ok &= (row != start_row) | (col != start_col)
+        self.row[b[ok], slot[ok]] = row[ok]
+        self.col[b[ok], slot[ok]] = col[ok]
+        self.action_points[b[ok]] -= 1
+        return ok
+
+    def _attack(self, b, attacker, target):
+        """Batched ``GameState.attack_unit``; returns which attacks succeeded."""
+        ok = np.zeros(len(b), dtype=bool)
+        pending = self.frozen_turns[b, attacker] <= 0
+        attacker_type = self.unit_type[b, attacker]
+        pending &= ~((attacker_type == TREBUCHET_ID) & self.has_attacked[b, attacker])
+        pending &= ~self.attacked[b, attacker, target]
+
+        healer = pending & (attacker_type == HEALER_ID)
+        heal = healer & (self.owner[b, attacker] == self.owner[b, target])
+        hb, ha, ht = b[heal], attacker[heal], target[heal]
+        self.health[hb, ht] = np.minimum(
+            self.health[hb, ht] + self.attack[hb, ha], self.max_health[hb, ht]
+        )
+        ok |= heal
+        pending &= ~healer
+        pending &= self.health[b, target] > 0
+
+        b, attacker, target = b[pending], attacker[pending], target[pending]
+        ok[pending] = True
+        a_row = self.row[b, attacker].astype(np.intp)
+        a_col = self.col[b, attacker].astype(np.intp)
+        t_row = self.row[b, target].astype(np.intp)
+        t_col = self.col[b, target].astype(np.intp)
+        attack = self.attack[b, attacker]
+        trebuchet = self.unit_type[b, attacker] == TREBUCHET_ID
+        distance = np.abs(a_row - t_row) + np.abs(a_col - t_col)
+        damage = np.where(trebuchet & (distance == 1), attack // 2, attack)
+        if trebuchet.any():
+            occupancy = self._occupancy(b)
+            n = np.arange(len(b))
+            for dr, dc in OFFSETS:
+                r, c = t_row + dr, t_col + dc
+                victim = occupancy[n, r.clip(0, ROWS - 1), c.clip(0, COLUMNS - 1)].astype(np.intp) - 1
+                hit = (trebuchet & _inside(r, c) & (victim >= 0)
+                       & (victim != target) & (victim != attacker))
+                self.health[b[hit], victim[hit]] -= attack[hit] // 2
+        self.health[b, target] -= damage
+        survived = self.health[b, target] > 0
+        self._remove_dead(b)
+
+        # surviving targets are knocked one cell away from the attacker
+        sb, s_attacker, s_target = b[survived], attacker[survived], target[survived]
+        knock_row = t_row[survived] + np.sign(t_row[survived] - a_row[survived])
+        knock_col = t_col[survived] + np.sign(t_col[survived] - a_col[survived])
+        inside = _inside(knock_row, knock_col)
+        free = self._occupancy(sb)[np.arange(len(sb)), knock_row.clip(0, ROWS - 1),
+                                   knock_col.clip(0, COLUMNS - 1)] == 0
+        knock = inside & free & (s_attacker != s_target)
+        self.row[sb[knock], s_target[knock]] = knock_row[knock]
+        self.col[sb[knock], s_target[knock]] = knock_col[knock]
+
+        self.has_attacked[b, attacker] = True
+        self.attacked[b, attacker, target] = True
+        return ok
+
+    def _meteorite(self, b, row, col):
+        """Batched ``MeteoriteStrike.play`` on a cell target."""
+        occupancy = self._occupancy(b)
+        n = np.arange(len(b))
+        victim = occupancy[n, row.clip(0, ROWS - 1), col.clip(0, COLUMNS - 1)].astype(np.intp) - 1
+        hit = _inside(row, col) & (victim >= 0)
+        self.health[b[hit], victim[hit]] -= MeteoriteStrike.DAMAGE
+        # pushes in different directions never compete for the same cell,
+        # so the pre-strike occupancy is valid for all four of them
+        for dr, dc in OFFSETS:
+            r, c = row + dr, col + dc
+            dest_r, dest_c = r + dr, c + dc
+            unit = occupancy[n, r.clip(0, ROWS - 1), c.clip(0, COLUMNS - 1)].astype(np.intp) - 1
+            dest_free = occupancy[n, dest_r.clip(0, ROWS - 1), dest_c.clip(0, COLUMNS - 1)] == 0
+            push = _inside(r, c) & (unit >= 0) & _inside(dest_r, dest_c) & dest_free
+            self.row[b[push], unit[push]] = dest_r[push]
+            self.col[b[push], unit[push]] = dest_c[push]
+
+    def _teleport(self, i, row, col):
+        """``Teleport.play`` in game ``i``; draws from ``game_rngs[i]``."""
+        player = self.current_player[i]
+        slot = self.selected_unit[i]
+        if slot < 0 or not self.alive[i, slot] or self.owner[i, slot] != player:
+            friendly = np.flatnonzero(self.alive[i] & (self.owner[i] == player))
+            if len(friendly) == 0:
+                return
+            slot = self.game_rngs[i].choice(friendly)
+        if not _inside(row, col) or self._occupancy([i])[0, row, col]:
+            return
+        self.row[i, slot] = row
+        self.col[i, slot] = col
+
+    def _draw(self, b, deck, deck_pos, hand, hand_len):
+        """Batched ``GameState.draw_cards(num=1, ap_cost=1)``."""
+        p = self.current_player[b].astype(np.intp) - 1
+        pos = deck_pos[b, p]
+        combined = self.unit_hand_len[b, p] + self.spell_hand_len[b, p]
+        ok = (pos < deck.shape[2]) & (combined < HAND_CAPACITY) & (self.action_points[b] >= 1)
+        b, p, pos = b[ok], p[ok], pos[ok]
+        hand[b, p, hand_len[b, p]] = deck[b, p, pos]
+        hand_len[b, p] += 1
+        deck_pos[b, p] += 1
+        self.action_points[b] -= 1
+        return ok
+
+    def _end_turn(self, b):
+        """Batched ``GameState.end_turn`` including ``process_turn_effects``."""
+        if len(b) == 0:
+            return
+        alive = self.alive[b]
+        frozen = self.frozen_turns[b]
+        self.frozen_turns[b] = np.where(alive & (frozen > 0), frozen - 1, frozen)
+        burn = self.burn_turns[b]
+        burning = alive & (burn > 0)
+        self.burn_turns[b] = np.where(burning, burn - 1, burn)
+        health = self.health[b] - np.where(burning, BURN_DAMAGE, 0).astype(np.int16)
+        fires = self.fires[b]
+        in_fire = fires[np.arange(len(b))[:, None], self.row[b], self.col[b]] > 0
+        health -= np.where(alive & in_fire, FIRE_DAMAGE, 0).astype(np.int16)
+        self.health[b] = health
+        self.fires[b] = np.where(fires > 0, fires - 1, 0)
+        self._remove_dead(b)
+
+        self.has_attacked[b] = False
+        self.attacked[b] = False
+        player = 3 - self.current_player[b]
+        self.current_player[b] = player
+        blocked = self.blocked_turns[b, player - 1] > 0
+        self.blocked_turns[b[blocked], player[blocked] - 1] -= 1
+        self.action_points[b] = np.where(blocked, BLOCKED_ACTION_POINTS, ACTION_POINTS)
+
+    # -- helpers --------------------------------------------------------
+    def _create_units(self, b, slot, unit_type, owner, row, col):
+        self.alive[b, slot] = True
+        self.unit_type[b, slot] = unit_type
+        self.owner[b, slot] = owner
+        self.row[b, slot] = row
+        self.col[b, slot] = col
+        self.health[b, slot] = UNIT_HEALTH[unit_type]
+        self.max_health[b, slot] = UNIT_HEALTH[unit_type]
+        self.attack[b, slot] = UNIT_ATTACK[unit_type]
+        self.move_range[b, slot] = UNIT_MOVE[unit_type]
+        self.attack_range[b, slot] = UNIT_RANGE[unit_type]
+        self.frozen_turns[b, slot] = 0
+        self.burn_turns[b, slot] = 0
+        self.has_attacked[b, slot] = False
+        self.attacked[b, slot] = False
+        self.attacked[b, :, slot] = False
+
+    @staticmethod
+    def _remove_from_hand(hand, hand_len, b, p, pos):
+        """Delete entry ``pos`` of each selected hand, shifting the rest left."""
+        if len(b) == 0:
+            return
+        columns = np.arange(hand.shape[2])
+        source = np.minimum(columns + (columns >= pos[:, None]), hand.shape[2] - 1)
+        shifted = np.take_along_axis(hand[b, p], source, axis=1)
+        shifted[columns == (hand_len[b, p] - 1)[:, None]] = 0
+        hand[b, p] = shifted
+        hand_len[b, p] -= 1
+
+    def _occupancy(self, b) -> np.ndarray:
+        """Return ``slot + 1`` of the unit in every cell (0 when empty)."""
+        occupancy = np.zeros((len(b), ROWS, COLUMNS), dtype=np.int16)
+        alive = self.alive[b]
+        gi, slot = np.nonzero(alive)
+        occupancy[gi, self.row[b][gi, slot], self.col[b][gi, slot]] = slot + 1
+        return occupancy
+
+    def _slot_of_index(self, b, idx):
+        """Map ``GameState.units`` indices to slots; also return validity."""
+        alive = self.alive[b]
+        valid = (idx >= 0) & (idx < alive.sum(axis=1))
+        rank = np.cumsum(alive, axis=1)
+        slot = np.argmax(alive & (rank == (idx + 1)[:, None]), axis=1)
+        return slot, valid
+
+    def _remove_dead(self, b) -> None:
+        self.alive[b] &= self.health[b] > 0
+        commanders = self.alive[b] & (self.unit_type[b] == COMMANDER_ID)
+        p1 = (commanders & (self.owner[b] == 1)).any(axis=1)
+        p2 = (commanders & (self.owner[b] == 2)).any(axis=1)
+        self.winner[b] = np.where(p1 & ~p2, 1, np.where(p2 & ~p1, 2, 0))
+
+    def _commander_health(self, b, player) -> np.ndarray:
+        mask = (self.alive[b] & (self.unit_type[b] == COMMANDER_ID)
+                & (self.owner[b] == player[:, None]))
+        first = np.argmax(mask, axis=1)
+        health = self.health[b, first].astype(np.int32)
+        return np.where(mask.any(axis=1), health, 0)
@@ -0,0 +1 @@
+"""Micro-benchmarks for the headless engine. Run modules with ``python -m``."""
@@ -0,0 +1,63 @@
+"""Compare the cost of copying a mid-game :class:`GameState`.
+
+Also times an ``apply``/``undo`` round trip of an end-turn action, the most
+expensive action to journal.
+
+Run with ``python -m benchmarks.clone_state``. The state is advanced with
+random legal actions first so the board holds a realistic number of units,
+fires and cards.
+"""
+
+import argparse
+import copy
+import random
+import timeit
+
+from actions import ActionType
+from grids_env import GridsEnv
+
+
+def midgame_state(seed=0, steps=60):
+    """Return a ``GameState`` after ``steps`` random legal actions."""
+    random.seed(seed)
+    env = GridsEnv()
+    env.reset(seed=seed)
+    for _ in range(steps):
+        _, _, term, trunc, _ = env.step(random.choice(env.valid_actions()))
+        if term or trunc:
+            env.reset()
+    return env.state
+
+
+def run(number=2000, seed=0):
+    state = midgame_state(seed)
+    snapshot = state.snapshot()
+    end_turn = (ActionType.END_TURN, 0, 0, 0)
+    cases = {
+        "copy.deepcopy": lambda: copy.deepcopy(state),
+        "GameState.clone": state.clone,
+        "GameState.snapshot": state.snapshot,
+        "GameState.restore": lambda: state.restore(snapshot),
+        "apply+undo end turn": lambda: state.undo(state.apply(end_turn)),
+    }
+    results = {}
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+        results[name] = seconds * 1e6
+    return len(state.units), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    num_units, results = run(args.number, args.seed)
+    baseline = results["copy.deepcopy"]
+    print(f"mid-game state with {num_units} units")
+    for name, micros in results.items():
+        print(f"{name:<20} {micros:9.2f} us  ({baseline / micros:5.1f}x deepcopy)")
+
+
+if __name__ == "__main__":
+    main()
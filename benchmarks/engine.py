@@ -0,0 +1,319 @@
+"""Time the hot paths of the engine and compare them against a baseline.
+
+Run with ``python -m benchmarks.engine``. Every operation is timed on three
+boards: ``empty`` (a fresh game with only the commanders), ``midgame`` (60
+random legal actions in) and ``crowded`` (both players deployed their whole
+unit deck). Each board is then adjusted so that every ``ActionType`` is
+legal, giving one ``step`` case per action type and density. The report
+lists ops/sec together with the median, 90th and 99th percentile latency of
+each case.
+
+Results can be written as JSON with ``--output``. They are compared with the
+baseline in ``benchmarks/baselines/engine.json`` (or ``--baseline``) and the
+run exits with status 1 when the median of any case got slower than the
+baseline by more than ``--tolerance`` or a baseline case was not run.
+Refresh the baseline on the machine that runs the comparison with
+``--save-baseline``; timings from different machines are not comparable.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from actions import ActionType
+from cards import Fireball
+from constants import ROWS, COLUMNS, HAND_CAPACITY
+from dqn_agent import obs_to_tensor
+from game_state import GameState
+from grids_env import GridsEnv
+from units import Warrior
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "engine.json")
+DENSITIES = ("empty", "midgame", "crowded")
+# a batch of calls should last at least this long to drown out timer overhead
+MIN_SAMPLE_SECONDS = 20e-6
+
+_CROWD_PRIORITY = (ActionType.DEPLOY, ActionType.DRAW_UNIT, ActionType.MOVE, ActionType.END_TURN)
+
+
+def make_env(density: str, seed: int = 0) -> GridsEnv:
+    """Return an env whose game has the board ``density`` of :data:`DENSITIES`.
+
+    ``midgame`` plays random legal actions; ``crowded`` prefers deploying,
+    drawing units and moving over attacking and casting spells, so the
+    board fills up with the units of both decks. The board is finally
+    passed through :func:`make_all_actions_legal`.
+    """
+    rng = random.Random(seed)
+    env = GridsEnv()
+    env.reset(seed=seed)
+    if density == "empty":
+        steps, priority = 0, ()
+    elif density == "midgame":
+        steps, priority = 60, ()
+    elif density == "crowded":
+        steps, priority = 150, _CROWD_PRIORITY
+    else:
+        raise ValueError(f"unknown density {density!r}; expected one of {DENSITIES}")
+    for _ in range(steps):
+        actions = env.valid_actions()
+        for action_type in priority:
+            preferred = [a for a in actions if a[0] == action_type]
+            if preferred:
+                actions = preferred
+                break
+        _, _, term, trunc, _ = env.step(rng.choice(actions))
+        if term or trunc:
+            env.reset()
+    make_all_actions_legal(env)
+    return env
+
+
+def make_all_actions_legal(env: GridsEnv) -> None:
+    """Edit ``env.state`` so the current player may take every ``ActionType``.
+
+    Missing cards are added to the hands and decks, and when no unit can
+    attack, the nearest enemy is placed next to one that can. The units on
+    the board stay the same, so the density is preserved. ``END_TURN`` is
+    always stepped, even where :meth:`GameState.legal_actions` omits it.
+    """
+    state = env.state
+    player = state.current_player
+    state.current_action_points = max(state.current_action_points, 2)
+    if not state.unit_decks[player]:
+        state.unit_decks[player].append(Warrior)
+    if not state.spell_decks[player]:
+        state.spell_decks[player].append(Fireball())
+    for hand, card in ((state.unit_hands[player], Warrior), (state.spell_hands[player], Fireball())):
+        if not hand:
+            hand.append(card)
+            state.hands[player].append(card)
+        # leave room to draw
+        while len(hand) >= HAND_CAPACITY:
+            state.hands[player].remove(hand.pop())
+    state.refresh_player_hands()
+    if not any(state.get_attackable_units(unit) for unit in state.units if unit.owner == player):
+        _bring_enemy_into_range(state, player)
+    state.invalidate_hash()
+    env.refresh_obs()
+    available = {action[0] for action in state.legal_actions()} | {ActionType.END_TURN}
+    missing = set(ActionType) - available
+    if missing:
+        raise RuntimeError(f"could not make {sorted(t.name for t in missing)} legal")
+
+
+def _bring_enemy_into_range(state: GameState, player: int) -> None:
+    """Place the enemy nearest to one of ``player``'s units beside it."""
+    enemies = [u for u in state.units if u.owner != player]
+    for unit in state.units:
+        if unit.owner != player or unit.unit_type in ("Healer", "Trebuchet"):
+            continue
+        free = [(unit.row + dr, unit.col + dc) for dr, dc in ((0, 1), (0, -1), (1, 0), (-1, 0))]
+        free = [(r, c) for r, c in free
+                if 0 <= r < ROWS and 0 <= c < COLUMNS and not state.is_occupied(r, c)]
+        if free:
+            start = (unit.row, unit.col)
+            enemy = min(enemies, key=lambda e: state.manhattan_distance(start, (e.row, e.col)))
+            state.relocate_unit(enemy, *free[0])
+            return
+
+
+def measure(func, setup=None, samples: int = 200, warmup: int = 5) -> dict:
+    """Time ``func`` and return ops/sec and latency percentiles in µs.
+
+    Without ``setup``, every sample times a batch of calls sized to last at
+    least :data:`MIN_SAMPLE_SECONDS`. With ``setup`` (e.g. restoring a
+    snapshot before each step) every sample is one call and ``setup`` runs
+    outside the timed region. The garbage collector is paused meanwhile,
+    as in :mod:`timeit`.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+    inner = 1
+    if setup is None:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        inner = max(1, int(MIN_SAMPLE_SECONDS / max(elapsed, 1e-9)))
+
+    timings = np.empty(samples)
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for k in range(samples):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for _ in range(inner):
+                func()
+            timings[k] = (time.perf_counter() - start) / inner
+    finally:
+        if enabled:
+            gc.enable()
+
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99]) * 1e6
+    return {
+        "ops_per_sec": float(1.0 / timings.mean()),
+        "mean_us": float(timings.mean() * 1e6),
+        "p50_us": float(p50),
+        "p90_us": float(p90),
+        "p99_us": float(p99),
+        "samples": samples,
+        "calls_per_sample": inner,
+    }
+
+
+def _path_query(state: GameState):
+    """Return a current-player unit and the empty cell farthest from it."""
+    unit = next(u for u in state.units if u.owner == state.current_player)
+    empty = [(r, c) for r in range(ROWS) for c in range(COLUMNS) if not state.is_occupied(r, c)]
+    goal = max(empty, key=lambda cell: state.manhattan_distance((unit.row, unit.col), cell))
+    return unit, goal
+
+
+def cases(seed: int = 0) -> dict:
+    """Return ``{name: (func, setup)}`` for every benchmarked operation."""
+    result = {
+        "GameState()": (GameState, None),
+        "GridsEnv.reset": (GridsEnv().reset, None),
+    }
+    for density in DENSITIES:
+        env = make_env(density, seed)
+        state = env.state
+        snapshot = state.snapshot()
+        obs = env._get_obs()
+        unit, goal = _path_query(state)
+        start = (unit.row, unit.col)
+        result.update({
+            f"valid_actions[{density}]": (env.valid_actions, None),
+            f"valid_action_mask[{density}]": (env.valid_action_mask, None),
+            f"get_valid_move_squares[{density}]": (
+                lambda state=state, unit=unit: state.get_valid_move_squares(unit), None),
+            f"a_star_pathfinding[{density}]": (
+                lambda state=state, start=start, goal=goal: state.a_star_pathfinding(start, goal),
+                None),
+            f"_get_obs[{density}]": (env._get_obs, None),
+            f"obs_to_tensor[{density}]": (lambda obs=obs: obs_to_tensor(obs), None),
+        })
+        by_type = {ActionType.END_TURN: (ActionType.END_TURN, 0, 0, 0)}
+        for action in env.valid_actions():
+            by_type.setdefault(action[0], action)
+        for action_type in ActionType:
+            result[f"step.{action_type.name}[{density}]"] = (
+                lambda env=env, action=by_type[action_type]: env.step(action),
+                lambda state=state, snapshot=snapshot: state.restore(snapshot),
+            )
+    return result
+
+
+def run(samples: int = 200, seed: int = 0, pattern: str = "") -> dict:
+    """Benchmark every case whose name contains ``pattern``."""
+    results = {}
+    for name, (func, setup) in cases(seed).items():
+        if pattern in name:
+            results[name] = measure(func, setup, samples)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "filter": pattern,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """Return ``(name, baseline_us, current_us)`` for every regressed case.
+
+    A case regressed when its median latency exceeds the baseline median by
+    more than ``tolerance`` (a fraction). Baseline cases that the run's
+    filter selects but that were not run are reported with ``current_us``
+    set to ``None``; cases new in the current run are ignored.
+    """
+    pattern = results.get("meta", {}).get("filter", "")
+    regressions = [(name, base["p50_us"], None) for name, base in baseline["results"].items()
+                   if pattern in name and name not in results["results"]]
+    for name, stats in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is not None and stats["p50_us"] > base["p50_us"] * (1.0 + tolerance):
+            regressions.append((name, base["p50_us"], stats["p50_us"]))
+    return regressions
+
+
+def report(results: dict, baseline=None) -> None:
+    print(f"{'case':<34} {'ops/sec':>11} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9} {'vs base':>8}")
+    for name, stats in results["results"].items():
+        line = (f"{name:<34} {stats['ops_per_sec']:11.0f} {stats['p50_us']:9.2f} "
+                f"{stats['p90_us']:9.2f} {stats['p99_us']:9.2f}")
+        base = baseline and baseline["results"].get(name)
+        if base:
+            line += f" {stats['p50_us'] / base['p50_us']:7.2f}x"
+        print(line)
+
+
+def write_json(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown of the median before failing (fraction)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the new baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    results = run(args.samples, args.seed, args.filter)
+    if args.output:
+        write_json(args.output, results)
+    if args.save_baseline:
+        report(results)
+        write_json(args.baseline, results)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if baseline is None:
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for name, base, current in regressions:
+        if current is None:
+            print(f"MISSING {name}: in the baseline but not run", file=sys.stderr)
+            continue
+        print(f"REGRESSION {name}: median {base:.2f} us -> {current:.2f} us "
+              f"({current / base:.2f}x)", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} case(s) missing or slower than the baseline by more "
+              f"than {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
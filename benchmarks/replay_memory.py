@@ -0,0 +1,103 @@
+"""Compare :class:`replay.ReplayMemory` with a deque of observation dicts.
+
+Run with ``python -m benchmarks.replay_memory``. Both buffers are filled with
+the same transitions from random self-play and then sampled repeatedly;
+the report shows bytes per stored transition and the latency of drawing one
+batch of tensors.
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from collections import deque
+
+import torch
+
+from actions import action_to_index
+from dqn_agent import obs_to_tensor
+from grids_vec_env import GridsVecEnv
+from replay import ReplayMemory
+
+
+def collect(num_transitions, num_envs=8, seed=0):
+    random.seed(seed)
+    env = GridsVecEnv(num_envs, max_episode_steps=115)
+    obs, _ = env.reset(seed=seed)
+    transitions = []
+    while len(transitions) < num_transitions:
+        actions = [random.choice(valid) for valid in env.valid_actions()]
+        prev = {key: value.copy() for key, value in obs.items()}
+        obs, rewards, terms, _, infos = env.step(actions)
+        for i, info in enumerate(infos):
+            next_obs = info.get("final_observation") or {
+                key: value[i].copy() for key, value in obs.items()
+            }
+            transitions.append((
+                i,
+                {key: value[i].copy() for key, value in prev.items()},
+                actions[i],
+                float(rewards[i]),
+                next_obs,
+                bool(terms[i]),
+            ))
+    return transitions[:num_transitions]
+
+
+def deep_size(obj):
+    """Approximate bytes held by a transition tuple of dicts and arrays."""
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(deep_size(v) for v in obj.values())
+    if isinstance(obj, tuple):
+        return sys.getsizeof(obj) + sum(deep_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def deque_sample(buffer, batch_size):
+    """The sampling code ``DQNAgent`` used before ``ReplayMemory``."""
+    batch = random.sample(buffer, batch_size)
+    states, actions, rewards, next_states, dones = zip(*batch)
+    states = torch.stack([obs_to_tensor(o) for o in states])
+    actions = torch.tensor([action_to_index(a) for a in actions])
+    rewards = torch.tensor(rewards, dtype=torch.float32)
+    next_states = torch.stack([obs_to_tensor(o) for o in next_states])
+    dones = torch.tensor(dones, dtype=torch.float32)
+    return states, actions, rewards, next_states, dones
+
+
+def run(num_transitions=10000, batch_size=64, number=200):
+    transitions = collect(num_transitions)
+    results = {}
+
+    buffer = deque((tuple(t[1:]) for t in transitions), maxlen=num_transitions)
+    deque_bytes = sum(deep_size(transition) for transition in buffer)
+
+    memory = ReplayMemory(num_transitions, seed=0)
+    for stream, *transition in transitions:
+        memory.store(*transition, stream=stream)
+    frames_used = int((memory.refcount > 0).sum())
+
+    results["deque"] = (
+        deque_bytes / num_transitions,
+        min(timeit.repeat(lambda: deque_sample(buffer, batch_size), number=number, repeat=3)) / number,
+    )
+    results["ReplayMemory"] = (
+        memory.nbytes / num_transitions,
+        min(timeit.repeat(lambda: memory.sample(batch_size), number=number, repeat=3)) / number,
+    )
+    return results, frames_used / num_transitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transitions", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    results, frames_per_transition = run(args.transitions, args.batch_size)
+    for name, (nbytes, seconds) in results.items():
+        print(f"{name:<14} {nbytes:8.0f} bytes/transition  {seconds * 1e6:9.1f} us/sample")
+    print(f"frames per transition with sharing: {frames_per_transition:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Measure the throughput of the synchronous DQN self-play loop.
+
+Run with ``python -m benchmarks.training``. The loop body of
+:func:`train_dqn.train`, :func:`train_dqn.self_play_step` (batched action
+selection, vectorized env step on flat observations, replay storage and one
+update per agent that acted), runs for a fixed number of vectorized steps
+with every RNG seeded, after untimed warm-up steps that fill the replay
+memories. Both agents explore with a fixed ``--epsilon`` so the forward
+passes of a mostly greedy policy are part of the measurement.
+
+The report shows env steps/sec, updates/sec and how the wall time splits
+between ``select_action``, ``env.step``, ``store``, ``sample`` (drawing
+batches from replay) and ``learn`` (the rest of the update: forward and
+backward passes and the optimizer step). ``--profile out.prof`` also dumps
+a :mod:`cProfile` of the timed steps for ``snakeviz`` or :mod:`pstats`.
+
+As with :mod:`benchmarks.engine`, results are compared with a stored
+baseline (``benchmarks/baselines/training.json``) and the run fails when
+throughput dropped by more than ``--tolerance``; refresh it with
+``--save-baseline``.
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import platform
+import pstats
+import random
+import sys
+import time
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+import torch
+
+from benchmarks.engine import write_json
+from dqn_agent import DQNAgent
+from grids_env import GridsEnv
+from grids_vec_env import GridsVecEnv
+from train_dqn import self_play_step
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "training.json")
+PHASES = ("select_action", "env.step", "store", "sample", "learn", "other")
+THROUGHPUT = ("env_steps_per_sec", "updates_per_sec")
+
+
+def _timed(times: Counter, phase: str, func):
+    """Wrap ``func`` so its run time is added to ``times[phase]``."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            times[phase] += time.perf_counter() - start
+    return wrapper
+
+
+def run(steps: int = 100, num_envs: int = 8, warmup: int = 20, seed: int = 0,
+        epsilon: float = 0.1, prioritized: bool = False, network: str = "dense",
+        max_steps: int = 115, profile: Optional[str] = None) -> dict:
+    """Run ``warmup`` + ``steps`` vectorized steps and time the last ``steps``."""
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    vec_env = GridsVecEnv(num_envs, max_episode_steps=max_steps, obs_mode="flat")
+    agents = {}
+    times = Counter()
+    # time the phases of self_play_step where it calls into the env and agents
+    vec_env.step = _timed(times, "env.step", vec_env.step)
+    for player in (1, 2):
+        agent = DQNAgent(GridsEnv(), prioritized=prioritized, network=network,
+                         seed=seed + player)
+        agent.epsilon = epsilon
+        agent.select_actions = _timed(times, "select_action", agent.select_actions)
+        agent.store = _timed(times, "store", agent.store)
+        agent.update = _timed(times, "update", agent.update)
+        # sampling happens inside update(); time it separately from learning
+        agent.sample = _timed(times, "sample", agent.sample)
+        agent.buffer.sample_indices = _timed(times, "sample", agent.buffer.sample_indices)
+        agents[player] = agent
+    obs, _ = vec_env.reset(seed=seed)
+
+    profiler = cProfile.Profile() if profile else None
+    updates = 0
+    clock = time.perf_counter
+    for step in range(warmup + steps):
+        if step == warmup:
+            times.clear()
+            updates = sum(agent.steps_done for agent in agents.values())
+            if profiler is not None:
+                profiler.enable()
+            start = clock()
+        obs, _ = self_play_step(vec_env, agents, obs)
+
+    wall = clock() - start
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile)
+    vec_env.close()
+
+    updates = sum(agent.steps_done for agent in agents.values()) - updates
+    split = {phase: times[phase] for phase in ("select_action", "env.step", "store", "sample")}
+    split["learn"] = times["update"] - times["sample"]
+    split["other"] = wall - sum(split.values())
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "threads": torch.get_num_threads(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "config": {
+            "steps": steps, "num_envs": num_envs, "warmup": warmup, "seed": seed,
+            "epsilon": epsilon, "prioritized": prioritized, "network": network,
+            "max_steps": max_steps,
+        },
+        "results": {
+            "wall_seconds": wall,
+            "env_steps": steps * num_envs,
+            "updates": updates,
+            "env_steps_per_sec": steps * num_envs / wall,
+            "updates_per_sec": updates / wall,
+            "seconds": split,
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """Return ``(metric, baseline, current)`` for every throughput that dropped.
+
+    A metric regressed when the baseline is more than ``1 + tolerance``
+    times the current value. Runs with different configurations are not
+    comparable and yield a :class:`ValueError`.
+    """
+    if results["config"] != baseline["config"]:
+        raise ValueError(f"baseline was measured with {baseline['config']}, "
+                         f"not {results['config']}")
+    regressions = []
+    for metric in THROUGHPUT:
+        base, current = baseline["results"][metric], results["results"][metric]
+        if current * (1.0 + tolerance) < base:
+            regressions.append((metric, base, current))
+    return regressions
+
+
+def report(results: dict, baseline=None) -> None:
+    stats = results["results"]
+    print(f"{stats['env_steps']} env steps and {stats['updates']} updates "
+          f"in {stats['wall_seconds']:.2f} s")
+    for metric in THROUGHPUT:
+        line = f"{metric:<20} {stats[metric]:10.1f}"
+        if baseline is not None:
+            line += f"  ({stats[metric] / baseline['results'][metric]:.2f}x baseline)"
+        print(line)
+    print(f"{'phase':<20} {'seconds':>10} {'share':>7}")
+    for phase in PHASES:
+        seconds = stats["seconds"][phase]
+        print(f"{phase:<20} {seconds:10.3f} {seconds / stats['wall_seconds']:7.1%}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=100, help="timed vectorized steps")
+    parser.add_argument("--envs", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--epsilon", type=float, default=0.1)
+    parser.add_argument("--network", choices=("dense", "branching"), default="dense")
+    parser.add_argument("--prioritized", action="store_true")
+    parser.add_argument("--profile", help="dump a cProfile of the timed steps here")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed throughput drop before failing (fraction)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the new baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    results = run(args.steps, args.envs, args.warmup, args.seed, args.epsilon,
+                  args.prioritized, args.network, profile=args.profile)
+    if args.output:
+        write_json(args.output, results)
+    if args.profile:
+        pstats.Stats(args.profile).sort_stats("cumulative").print_stats(15)
+    if args.save_baseline:
+        report(results)
+        write_json(args.baseline, results)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != results["config"]:
+            print(f"baseline at {args.baseline} uses a different configuration; not comparing")
+            baseline = None
+    report(results, baseline)
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for metric, base, current in regressions:
+        print(f"REGRESSION {metric}: {base:.1f} -> {current:.1f}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
+import os
 import random
-from collections import deque
-from typing import List, Tuple
+from typing import List, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
 import torch
@@ -8,33 +8,26 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 from grids_env import GridsEnv
-from actions import ActionType
-from constants import ROWS, COLUMNS
+from actions import (
+    ActionType,
+    ACTION_SIZE,
+    ACTION_SHAPE,
+    index_to_action,
+)
+from replay import ReplayMemory, PrioritizedReplayMemory
+from metrics import timed
 
-# Size of the discrete action space. There are seven action types
-# (move, deploy, play card, end turn, attack, draw spell, draw unit) so the action space must account
-# for all of them.
-# The action space includes one dimension for the ``ActionType`` enum
-ACTION_SIZE = len(ActionType) * 20 * ROWS * COLUMNS
 
+def obs_to_tensor(obs, copy: bool = True) -> torch.Tensor:
+    """Return the feature vector of an observation dict or flat observation.
 
-def action_to_index(action: Tuple[int, int, int, int]) -> int:
-    atype, idx, row, col = action
-    atype = int(atype)
-    return ((atype * 20 + idx) * ROWS + row) * COLUMNS + col
-
-
-def index_to_action(index: int) -> Tuple[int, int, int, int]:
-    col = index % COLUMNS
-    index //= COLUMNS
-    row = index % ROWS
-    index //= ROWS
-    idx = index % 20
-    atype = index // 20
-    return ActionType(atype), idx, row, col
-
-
-def obs_to_tensor(obs: dict) -> torch.Tensor:
+    Flat observations (``GridsEnv(obs_mode="flat")``) already have this
+    layout and are copied; with ``copy=False`` they are wrapped without
+    copying, so the tensor changes with the env's buffer (see
+    ``copy_obs``) and must be used before the next step.
+    """
+    if isinstance(obs, np.ndarray):
+        return torch.tensor(obs) if copy else torch.from_numpy(obs)
     arr = np.concatenate(
         [
             np.array(
@@ -54,6 +47,35 @@ def obs_to_tensor(obs: dict) -> torch.Tensor:
     return torch.from_numpy(arr)
 
 
+def batch_obs_to_tensor(obs) -> torch.Tensor:
+    """Convert stacked observations (see :class:`GridsVecEnv`) to a batch.
+
+    Rows use the same feature layout as :func:`obs_to_tensor`; a flat
+    observation matrix is wrapped without copying.
+    """
+    if isinstance(obs, np.ndarray):
+        return torch.from_numpy(obs)
+    n = len(obs["current_player"])
+    arr = np.concatenate(
+        [
+            np.stack(
+                [
+                    obs["current_player"],
+                    obs["action_points"],
+                    obs["opponent_hand"],
+                ],
+                axis=1,
+            ).astype(np.float32),
+            obs["board_owner"].reshape(n, -1).astype(np.float32),
+            obs["board_health"].reshape(n, -1).astype(np.float32),
+            obs["unit_hand"].reshape(n, -1).astype(np.float32),
+            obs["spell_hand"].reshape(n, -1).astype(np.float32),
+        ],
+        axis=1,
+    )
+    return torch.from_numpy(arr)
+
+
 class QNetwork(nn.Module):
     def __init__(self, obs_size: int, action_size: int):
         super().__init__()
@@ -67,22 +89,157 @@ class QNetwork(nn.Module):
         return self.out(x)
 
 
+class Branches(NamedTuple):
+    """Output of :class:`BranchingQNetwork`, one tensor per action component."""
+
+    value: torch.Tensor  # (batch,)
+    action_type: torch.Tensor  # (batch, len(ActionType))
+    index: torch.Tensor  # (batch, MAX_ACTION_INDEX)
+    row: torch.Tensor  # (batch, ROWS)
+    col: torch.Tensor  # (batch, COLUMNS)
+
+
+class BranchingQNetwork(nn.Module):
+    """Dueling Q-network with one advantage head per action component.
+
+    ``Q(s, (t, i, r, c)) = V(s) + A_t + A_i + A_r + A_c`` with every head
+    centred on its mean. The heads have ``sum(ACTION_SHAPE)`` outputs
+    instead of ``ACTION_SIZE``, so their size grows with the board and hand
+    dimensions rather than with their product. Use :func:`joint_q`,
+    :func:`gather_q`, :func:`argmax_q` and :func:`legal_argmax` to work with
+    the output.
+    """
+
+    def __init__(self, obs_size: int, action_shape: Tuple[int, ...] = ACTION_SHAPE):
+        super().__init__()
+        self.fc1 = nn.Linear(obs_size, 128)
+        self.fc2 = nn.Linear(128, 128)
+        self.value = nn.Linear(128, 1)
+        self.heads = nn.ModuleList(nn.Linear(128, size) for size in action_shape)
+
+    def forward(self, x: torch.Tensor) -> Branches:
+        x = F.relu(self.fc1(x))
+        x = F.relu(self.fc2(x))
+        advantages = []
+        for head in self.heads:
+            a = head(x)
+            advantages.append(a - a.mean(dim=1, keepdim=True))
+        return Branches(self.value(x).squeeze(1), *advantages)
+
+
+QOutput = Union[torch.Tensor, Branches]
+
+
+def joint_q(output: QOutput) -> torch.Tensor:
+    """Return ``(batch, ACTION_SIZE)`` Q-values in :func:`action_to_index` order."""
+    if not isinstance(output, Branches):
+        return output
+    value, atype, index, row, col = output
+    q = (
+        value[:, None, None, None, None]
+        + atype[:, :, None, None, None]
+        + index[:, None, :, None, None]
+        + row[:, None, None, :, None]
+        + col[:, None, None, None, :]
+    )
+    return q.reshape(len(value), -1)
+
+
+def gather_q(output: QOutput, actions: torch.Tensor) -> torch.Tensor:
+    """Return the Q-value of each row's action index."""
+    if not isinstance(output, Branches):
+        return output.gather(1, actions.view(-1, 1)).squeeze(1)
+    value, *heads = output
+    q = value
+    rest = actions
+    # peel components off the flat index from the last dimension backwards
+    for head in reversed(heads):
+        size = head.shape[1]
+        q = q + head.gather(1, (rest % size).view(-1, 1)).squeeze(1)
+        rest = rest // size
+    return q
+
+
+def argmax_q(output: QOutput) -> torch.Tensor:
+    """Return the action index with the highest Q-value in each row.
+
+    Branched Q-values are additive, so each head is maximised on its own.
+    """
+    if not isinstance(output, Branches):
+        return output.argmax(1)
+    index = torch.zeros_like(output.value, dtype=torch.long)
+    for head in output[1:]:
+        index = index * head.shape[1] + head.argmax(1)
+    return index
+
+
+def _segment_argmax(values: torch.Tensor, rows: torch.Tensor, legal: torch.Tensor,
+                    n: int) -> torch.Tensor:
+    """Return, for each of ``n`` rows, the ``legal`` entry with the top value.
+
+    Ties go to the lowest index, as with :meth:`torch.Tensor.argmax`; rows
+    without any entry get 0.
+    """
+    best = torch.full((n,), float("-inf")).scatter_reduce(0, rows, values, "amax")
+    top = values == best[rows]
+    return torch.zeros(n, dtype=torch.long).scatter_reduce(
+        0, rows[top], legal[top], "amin", include_self=False
+    )
+
+
+def legal_argmax(output: QOutput, masks: torch.Tensor) -> torch.Tensor:
+    """Return the best action index of each row among those allowed by ``masks``.
+
+    ``masks`` is a ``(batch, ACTION_SIZE)`` boolean tensor. Branched
+    Q-values are only computed for the legal indices, so the cost grows with
+    the number of legal actions rather than with ``ACTION_SIZE``.
+    """
+    if not isinstance(output, Branches):
+        return output.masked_fill(~masks, float("-inf")).argmax(1)
+    rows, legal = masks.nonzero(as_tuple=True)
+    q = gather_q(Branches(*(t[rows] for t in output)), legal)
+    return _segment_argmax(q, rows, legal, len(masks))
+
+
 class DQNAgent:
-    """Minimal DQN agent for the Grids environment."""
+    """Minimal DQN agent for the Grids environment.
+
+    With ``prioritized=True`` transitions are replayed from a
+    :class:`PrioritizedReplayMemory` and the loss is weighted by its
+    importance-sampling weights. ``network="branching"`` swaps the dense
+    ``ACTION_SIZE``-wide output layer for a :class:`BranchingQNetwork`.
+    ``seed`` seeds the sampling of the replay memory.
+    """
 
     def __init__(self, env: GridsEnv, lr: float = 1e-3, gamma: float = 0.99,
                  buffer_size: int = 10000, batch_size: int = 64,
                  epsilon_start: float = 1.0, epsilon_end: float = 0.1,
-                 epsilon_decay: int = 1000, target_update: int = 100):
+                 epsilon_decay: int = 1000, target_update: int = 100,
+                 prioritized: bool = False, per_alpha: float = 0.6,
+                 per_beta: float = 0.4, network: str = "dense",
+                 seed: Optional[int] = None):
         self.env = env
         obs_size = len(obs_to_tensor(env.reset()[0]))
-        self.policy_net = QNetwork(obs_size, ACTION_SIZE)
-        self.target_net = QNetwork(obs_size, ACTION_SIZE)
+        if network == "dense":
+            self.policy_net = QNetwork(obs_size, ACTION_SIZE)
+            self.target_net = QNetwork(obs_size, ACTION_SIZE)
+        elif network == "branching":
+            self.policy_net = BranchingQNetwork(obs_size)
+            self.target_net = BranchingQNetwork(obs_size)
+        else:
+            raise ValueError(f"unknown network {network!r}")
+        self.network = network
         self.target_net.load_state_dict(self.policy_net.state_dict())
         self.optimizer = torch.optim.Adam(self.policy_net.parameters(), lr=lr)
         self.gamma = gamma
         self.batch_size = batch_size
-        self.buffer = deque(maxlen=buffer_size)
+        self.prioritized = prioritized
+        if prioritized:
+            self.buffer = PrioritizedReplayMemory(
+                buffer_size, alpha=per_alpha, beta_start=per_beta, seed=seed
+            )
+        else:
+            self.buffer = ReplayMemory(buffer_size, seed=seed)
         self.epsilon = epsilon_start
         self.epsilon_end = epsilon_end
         self.epsilon_decay = epsilon_decay
@@ -99,35 +256,121 @@ class DQNAgent:
         self.policy_net.load_state_dict(state_dict)
         self.target_net.load_state_dict(state_dict)
 
-    def select_action(self, obs: dict) -> Tuple[int, int, int, int]:
-        valid_actions = self.env.valid_actions()
+    def save_checkpoint(self, directory: str) -> None:
+        """Write everything needed to resume training to ``directory``.
+
+        ``agent.pt`` holds both networks, the optimizer, epsilon, the step
+        counter and the Python, NumPy and torch RNG states; the replay
+        memory goes to ``replay/`` (see :meth:`ReplayMemory.save`).
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.buffer.save(os.path.join(directory, "replay"))
+        path = os.path.join(directory, "agent.pt")
+        torch.save(
+            {
+                "network": self.network,
+                "prioritized": self.prioritized,
+                "policy_net": self.policy_net.state_dict(),
+                "target_net": self.target_net.state_dict(),
+                "optimizer": self.optimizer.state_dict(),
+                "epsilon": self.epsilon,
+                "steps_done": self.steps_done,
+                "rng": {
+                    "python": random.getstate(),
+                    "numpy": np.random.get_state(),
+                    "torch": torch.get_rng_state(),
+                },
+            },
+            path + ".tmp",
+        )
+        os.replace(path + ".tmp", path)
+
+    def load_checkpoint(self, directory: str, mmap_mode: Optional[str] = "c") -> None:
+        """Resume from a checkpoint written by :meth:`save_checkpoint`.
+
+        The agent must have been created with the same ``network``,
+        ``prioritized`` and ``buffer_size`` settings. The replay memory is
+        memory-mapped according to ``mmap_mode``.
+        """
+        checkpoint = torch.load(os.path.join(directory, "agent.pt"), map_location="cpu",
+                                weights_only=False)
+        for key in ("network", "prioritized"):
+            if checkpoint[key] != getattr(self, key):
+                raise ValueError(
+                    f"checkpoint was saved with {key}={checkpoint[key]!r}, "
+                    f"agent uses {getattr(self, key)!r}"
+                )
+        self.policy_net.load_state_dict(checkpoint["policy_net"])
+        self.target_net.load_state_dict(checkpoint["target_net"])
+        self.optimizer.load_state_dict(checkpoint["optimizer"])
+        self.epsilon = checkpoint["epsilon"]
+        self.steps_done = checkpoint["steps_done"]
+        random.setstate(checkpoint["rng"]["python"])
+        np.random.set_state(checkpoint["rng"]["numpy"])
+        torch.set_rng_state(checkpoint["rng"]["torch"])
+        self.buffer.load(os.path.join(directory, "replay"), mmap_mode=mmap_mode)
+
+    @timed("dqn.select_action")
+    def select_action(self, obs: dict, mask: Optional[np.ndarray] = None
+                      ) -> Tuple[int, int, int, int]:
+        """Epsilon-greedy action among those allowed by ``mask``.
+
+        ``mask`` is a boolean array of length ``ACTION_SIZE`` as returned by
+        :meth:`GridsEnv.valid_action_mask`; it is queried from ``self.env``
+        when omitted.
+        """
+        if mask is None:
+            mask = self.env.valid_action_mask()
         if random.random() < self.epsilon:
-            return random.choice(valid_actions)
-        state = obs_to_tensor(obs).unsqueeze(0)
+            return index_to_action(int(random.choice(np.flatnonzero(mask))))
+        state = obs_to_tensor(obs, copy=False).unsqueeze(0)
         with torch.no_grad():
-            q_values = self.policy_net(state)[0]
-        indices = [action_to_index(a) for a in valid_actions]
-        best_index = indices[int(torch.argmax(q_values[indices]).item())]
-        return index_to_action(best_index)
-
-    def store(self, *transition):
-        self.buffer.append(transition)
-
-    def sample(self):
-        batch = random.sample(self.buffer, self.batch_size)
-        states, actions, rewards, next_states, dones = zip(*batch)
-        states = torch.stack([obs_to_tensor(o) for o in states])
-        actions = torch.tensor([action_to_index(a) for a in actions])
-        rewards = torch.tensor(rewards, dtype=torch.float32)
-        next_states = torch.stack([obs_to_tensor(o) for o in next_states])
-        dones = torch.tensor(dones, dtype=torch.float32)
-        return states, actions, rewards, next_states, dones
+            index = legal_argmax(self.policy_net(state), torch.from_numpy(mask)[None])
+        return index_to_action(int(index[0]))
+
+    @timed("dqn.select_actions")
+    def select_actions(self, obs: dict, masks: np.ndarray
+                       ) -> List[Tuple[int, int, int, int]]:
+        """Epsilon-greedy actions for a batch of games in one forward pass.
+
+        ``obs`` holds stacked observations and ``masks`` the matching
+        ``(n, ACTION_SIZE)`` legal-action masks. Exploring rows pick a
+        uniformly random legal action; the others are scored in one forward
+        pass.
+        """
+        masks = torch.from_numpy(np.asarray(masks, dtype=bool))
+        n = masks.shape[0]
+        explore = torch.rand(n) < self.epsilon
+        indices = torch.zeros(n, dtype=torch.long)
+        if explore.any():
+            rows, legal = masks[explore].nonzero(as_tuple=True)
+            indices[explore] = _segment_argmax(torch.rand(len(legal)), rows, legal,
+                                               int(explore.sum()))
+        greedy = ~explore
+        if greedy.any():
+            with torch.no_grad():
+                output = self.policy_net(batch_obs_to_tensor(obs)[greedy])
+                indices[greedy] = legal_argmax(output, masks[greedy])
+        return [index_to_action(int(i)) for i in indices]
+
+    def store(self, obs, action, reward, next_obs, done, stream=0):
+        """Add a transition to the replay memory.
+
+        ``stream`` identifies the trajectory (e.g. the vectorized env slot)
+        so consecutive observations can share storage.
+        """
+        self.buffer.store(obs, action, reward, next_obs, done, stream=stream)
+
+    def sample(self, indices: Optional[np.ndarray] = None):
+        return self.buffer.sample(self.batch_size, indices)
 
+    @timed("dqn.update")
     def update(self):
         if len(self.buffer) < self.batch_size:
             return
-        states, actions, rewards, next_states, dones = self.sample()
-        q_values = self.policy_net(states).gather(1, actions.view(-1, 1)).squeeze()
+        indices = self.buffer.sample_indices(self.batch_size)
+        states, actions, rewards, next_states, dones = self.sample(indices)
+        q_values = gather_q(self.policy_net(states), actions)
         with torch.no_grad():
             # -------------------------------
             # Double DQN target computation
@@ -135,12 +378,16 @@ class DQNAgent:
             # state and the target network to evaluate its value. This has
             # been shown to reduce overestimation bias and leads to more
             # stable learning.
-            next_actions = self.policy_net(next_states).argmax(1)
-            next_q = self.target_net(next_states).gather(
-                1, next_actions.view(-1, 1)
-            ).squeeze()
+            next_actions = argmax_q(self.policy_net(next_states))
+            next_q = gather_q(self.target_net(next_states), next_actions)
             target = rewards + self.gamma * next_q * (1 - dones)
-        loss = F.mse_loss(q_values, target)
+        if self.prioritized:
+            td_errors = target - q_values
+            weights = torch.from_numpy(self.buffer.importance_weights(indices))
+            loss = (weights * td_errors.pow(2)).mean()
+            self.buffer.update_priorities(indices, td_errors.detach().abs().numpy())
+        else:
+            loss = F.mse_loss(q_values, target)
         self.optimizer.zero_grad()
         loss.backward()
         # Gradient clipping helps prevent very large updates which can
@@ -0,0 +1,193 @@
+"""Typed game events and the bus :class:`GameState` emits them on.
+
+Rules code reports what happened (damage, healing, deaths, moves, card
+draws and plays, turn changes, roll-backs) as small immutable event tuples instead of printing.
+Every :class:`GameState` owns an :class:`EventBus`; emitters guard with
+``if events:`` so that, while nobody is subscribed, not even the event
+object is built. Sinks are plain callables taking one event, e.g.
+``state.events.subscribe(log.append)`` to collect them in a list,
+:class:`PrintSink` for the console or :class:`LogSink` for :mod:`logging`.
+
+Copies of a state made with :meth:`GameState.clone`, :func:`copy.deepcopy`
+or :mod:`pickle` start with an empty bus, so lookahead never reaches the
+subscribers of the real game.
+"""
+
+import logging
+import sys
+from typing import NamedTuple, Optional, Tuple
+
+
+class Damage(NamedTuple):
+    """``unit`` lost ``amount`` health and has ``health`` left.
+
+    ``source`` is the attacking unit, the card played or ``"burn"``/``"fire"``
+    for damage applied between turns.
+    """
+
+    unit: object
+    amount: int
+    health: int
+    source: object
+
+
+class Heal(NamedTuple):
+    healer: object
+    unit: object
+    amount: int
+    health: int
+
+
+class Death(NamedTuple):
+    unit: object
+
+
+class Move(NamedTuple):
+    """``unit`` walked from ``origin`` along ``path`` (the cells entered)."""
+
+    unit: object
+    origin: Tuple[int, int]
+    path: list
+
+
+class Knockback(NamedTuple):
+    unit: object
+    origin: Tuple[int, int]
+    destination: Tuple[int, int]
+
+
+class Teleported(NamedTuple):
+    unit: object
+    origin: Tuple[int, int]
+    destination: Tuple[int, int]
+
+
+class UnitDeployed(NamedTuple):
+    player: int
+    unit: object
+
+
+class CardPlayed(NamedTuple):
+    """``card`` was played on ``target`` (a unit or a ``(row, col)`` cell)."""
+
+    player: int
+    card: object
+    target: object
+
+
+class CardDrawn(NamedTuple):
+    """``card`` (a spell card or a unit class) was drawn into ``player``'s hand."""
+
+    player: int
+    card: object
+
+
+class TurnEnded(NamedTuple):
+    player: int
+    next_player: int
+
+
+class Restored(NamedTuple):
+    """The state was rolled back by ``restore`` or ``undo``; anything may have changed."""
+
+
+class EventBus:
+    """Deliver events to subscribed sinks; falsy while it has none."""
+
+    __slots__ = ("_sinks",)
+
+    def __init__(self):
+        self._sinks = []
+
+    def __bool__(self):
+        return bool(self._sinks)
+
+    def subscribe(self, sink, types: Optional[tuple] = None):
+        """Call ``sink(event)`` for every event, or only for ``types``.
+
+        Returns ``sink`` so it can be passed to :meth:`unsubscribe` later.
+        """
+        self._sinks.append((sink, types))
+        return sink
+
+    def unsubscribe(self, sink) -> None:
+        self._sinks = [entry for entry in self._sinks if entry[0] != sink]
+
+    def emit(self, event) -> None:
+        for sink, types in self._sinks:
+            if types is None or isinstance(event, types):
+                sink(event)
+
+    # subscribers belong to one game; copies start without any
+    def __reduce__(self):
+        return EventBus, ()
+
+
+def format_event(event) -> str:
+    """Return the human readable log line for ``event``."""
+    kind = type(event)
+    if kind is Damage:
+        source = event.source
+        if isinstance(source, str):
+            by = source
+        elif hasattr(source, "unit_type"):
+            by = source.unit_type
+        else:
+            by = source.name
+        return (f"{event.unit.unit_type} took {event.amount} damage from {by}, "
+                f"health is now {event.health}.")
+    if kind is Heal:
+        return (f"{event.healer.unit_type} heals {event.unit.unit_type}! "
+                f"{event.unit.unit_type} health is now {event.health}.")
+    if kind is Death:
+        return f"{event.unit.unit_type} of player {event.unit.owner} was defeated."
+    if kind is Move:
+        return f"{event.unit.unit_type} moved from {event.origin} to {event.path[-1]}."
+    if kind is Knockback:
+        return f"{event.unit.unit_type} was knocked back to {event.destination}."
+    if kind is Teleported:
+        return f"Teleported {event.unit.unit_type} to {event.destination}."
+    if kind is UnitDeployed:
+        unit = event.unit
+        return f"Player {event.player} deployed {unit.unit_type} at ({unit.row}, {unit.col})."
+    if kind is CardPlayed:
+        target = event.target
+        if isinstance(target, tuple):
+            on = target
+        else:
+            on = f"{target.unit_type} at ({target.row}, {target.col})"
+        return f"Player {event.player} played {event.card.name} on {on}."
+    if kind is CardDrawn:
+        card = event.card
+        return f"Player {event.player} drew {getattr(card, 'name', None) or card.__name__}."
+    if kind is TurnEnded:
+        return f"Player {event.player} ended the turn."
+    if kind is Restored:
+        return "State restored."
+    return repr(event)
+
+
+class PrintSink:
+    """Print every event as :func:`format_event` text to ``file``."""
+
+    def __init__(self, file=None):
+        self.file = file
+
+    def __call__(self, event) -> None:
+        print(format_event(event), file=self.file or sys.stdout)
+
+
+class LogSink:
+    """Send every event to ``logger`` at ``level``.
+
+    Formatting is deferred to the logging framework, so disabled levels cost
+    a single check.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("grids.events")
+        self.level = level
+
+    def __call__(self, event) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s", format_event(event))
@@ -1,5 +1,11 @@
 import arcade
+import logging
+import math
+
 from game_state import GameState
+from entities import GameEntity
+from events import Move, PrintSink
+from metrics import timed
 
 from constants import (SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, ROWS, COLUMNS,
                        CELL_SIZE, GRID_WIDTH, GRID_HEIGHT, UI_PANEL_WIDTH)
@@ -14,12 +20,133 @@ from cards import (
     Teleport,
 )
 
+logger = logging.getLogger(__name__)
+
+class UnitView(GameEntity):
+    """Sprite and animation state for a logical :class:`Unit`.
+
+    Views are only created by :class:`GridsGame`, so headless game states
+    never load unit artwork. ``row``/``col`` track the cell the view is
+    currently displayed in, which lags behind the unit while a move is
+    being animated.
+    """
+
+    SPRITE_PATHS = {
+        "Commander": "sprites/units/commander.png",
+        "Warrior": "sprites/units/warrior.png",
+        "Archer": "sprites/units/archer.png",
+        "Healer": "sprites/units/healer.png",
+        "Trebuchet": "sprites/units/trebuchet.png",
+        "Viking": "sprites/units/viking.png",
+    }
+
+    def __init__(self, unit):
+        color = arcade.color.BLUE if unit.owner == 1 else arcade.color.RED
+        sprite_path = self.SPRITE_PATHS.get(unit.unit_type, "sprites/units/commander.png")
+        # Original unit artwork is extremely large (1024x1536 pixels). Scaling
+        # based on the larger dimension ensures the sprite fits inside a single
+        # grid cell regardless of the cell size. 1536 corresponds to the
+        # original sprite height.
+        sprite = arcade.Sprite(sprite_path, scale=CELL_SIZE / 1536)
+        sprite.color = color
+        super().__init__(unit.row, unit.col, sprite)
+        self.unit = unit
+
+        # Animation attributes
+        self.pixel_x = self.col * CELL_SIZE + CELL_SIZE / 2
+        self.pixel_y = self.row * CELL_SIZE + CELL_SIZE / 2
+        self.target_pixel_x = self.pixel_x
+        self.target_pixel_y = self.pixel_y
+        self.start_pixel_x = self.pixel_x
+        self.start_pixel_y = self.pixel_y
+        self.animation_timer = 0.0
+        self.move_queue = []
+
+    @property
+    def is_animating(self):
+        return bool(self.move_queue) or (
+            self.pixel_x != self.target_pixel_x or self.pixel_y != self.target_pixel_y
+        )
+
+    def draw(self):
+        """Render the unit sprite and its status markers."""
+        self.sprite.center_x = self.pixel_x
+        self.sprite.center_y = self.pixel_y
+        arcade.draw_sprite(self.sprite)
+        if self.unit.frozen_turns > 0:
+            arcade.draw_text(
+                "F",
+                self.pixel_x - CELL_SIZE / 4,
+                self.pixel_y + CELL_SIZE / 4,
+                arcade.color.CYAN,
+                12,
+            )
+        if self.unit.burn_turns > 0:
+            arcade.draw_text(
+                "B",
+                self.pixel_x + CELL_SIZE / 4 - 8,
+                self.pixel_y + CELL_SIZE / 4,
+                arcade.color.RED,
+                12,
+            )
+
+    def snap_to(self, row, col):
+        """Jump straight to ``(row, col)``, e.g. after knockback or teleport."""
+        self.row = row
+        self.col = col
+        self.pixel_x = col * CELL_SIZE + CELL_SIZE / 2
+        self.pixel_y = row * CELL_SIZE + CELL_SIZE / 2
+        self.target_pixel_x = self.pixel_x
+        self.target_pixel_y = self.pixel_y
+        self.move_queue = []
+
+    def start_move(self, path):
+        """Begin moving along the provided path."""
+        # Copy the path so callers retain the original list. This prevents side
+        # effects such as the move list being emptied by the first step which
+        # previously caused index errors for the caller when they accessed the
+        # path after calling ``start_move``.
+        self.move_queue = list(path)
+        if self.move_queue:
+            self._begin_next_step()
+
+    def _begin_next_step(self):
+        next_row, next_col = self.move_queue.pop(0)
+        self.start_pixel_x = self.pixel_x
+        self.start_pixel_y = self.pixel_y
+        self.target_pixel_x = next_col * CELL_SIZE + CELL_SIZE / 2
+        self.target_pixel_y = next_row * CELL_SIZE + CELL_SIZE / 2
+        self.animation_timer = 0.0
+
+    def update_animation(self, delta_time):
+        if self.pixel_x != self.target_pixel_x or self.pixel_y != self.target_pixel_y:
+            self.animation_timer += delta_time
+            progress = min(self.animation_timer / 0.2, 1.0)
+            hop = math.sin(progress * math.pi) * 10
+            self.pixel_x = (self.target_pixel_x - self.start_pixel_x) * progress + self.start_pixel_x
+            self.pixel_y = (self.target_pixel_y - self.start_pixel_y) * progress + self.start_pixel_y + hop
+            if progress >= 1.0:
+                self.pixel_x = self.target_pixel_x
+                self.pixel_y = self.target_pixel_y
+                self.row = int(self.target_pixel_y // CELL_SIZE)
+                self.col = int(self.target_pixel_x // CELL_SIZE)
+                if self.move_queue:
+                    self._begin_next_step()
+        self.sprite.center_x = self.pixel_x
+        self.sprite.center_y = self.pixel_y
+
+
 class GridsGame(arcade.Window):
     def __init__(self):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         self.grid_origin_x = 0
         self.grid_origin_y = 0
 
+        # ``(unit, path)`` moves reported by the state, animated on update
+        self.pending_moves = []
+        # combat log printed to the console
+        self.event_log = PrintSink()
+
         # game state containing units and rules
         self.state = GameState()
 
@@ -35,6 +162,8 @@ class GridsGame(arcade.Window):
 
         self.units = self.state.units
         self.obstacles = self.state.obstacles
+        # sprite views keyed by the logical unit they render
+        self.unit_views = {}
 
         self.selected_card_index = None
         self.move_squares = []
@@ -64,12 +193,54 @@ class GridsGame(arcade.Window):
         self.card_rects = []
         self.unit_card_rects = []
 
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        """Switch to ``state`` and move the event subscriptions over to it."""
+        old = getattr(self, "_state", None)
+        if old is not None:
+            old.events.unsubscribe(self.on_move_event)
+            old.events.unsubscribe(self.event_log)
+        self._state = state
+        self.pending_moves = []
+        state.events.subscribe(self.on_move_event, (Move,))
+        state.events.subscribe(self.event_log)
+
+    def on_move_event(self, event):
+        self.pending_moves.append((event.unit, event.path))
+
     def sync_hands(self):
         """Refresh hand references from the underlying game state."""
         self.hand = self.state.hand
         self.unit_hand = self.state.unit_hand
         self.spell_hand = self.state.spell_hand
 
+    def view_for(self, unit):
+        """Return the :class:`UnitView` for ``unit``, creating it on demand."""
+        view = self.unit_views.get(unit)
+        if view is None:
+            view = UnitView(unit)
+            self.unit_views[unit] = view
+        return view
+
+    def sync_unit_views(self):
+        """Bring unit views in line with the logical game state."""
+        for unit, path in self.pending_moves:
+            if unit in self.state.units:
+                self.view_for(unit).start_move(path)
+        self.pending_moves.clear()
+        alive = set(self.state.units)
+        for unit in list(self.unit_views):
+            if unit not in alive:
+                del self.unit_views[unit]
+        for unit in self.state.units:
+            view = self.view_for(unit)
+            if not view.is_animating and (view.row, view.col) != (unit.row, unit.col):
+                view.snap_to(unit.row, unit.col)
+
     # expose selected_unit through the underlying game state
     @property
     def selected_unit(self):
@@ -95,7 +266,7 @@ class GridsGame(arcade.Window):
         self.sync_hands()
 
     def move_unit(self, unit, target_row, target_col):
-        result = self.state.move_unit(unit, target_row, target_col, animate=True)
+        result = self.state.move_unit(unit, target_row, target_col)
         self.current_action_points = self.state.current_action_points
         return result
 
@@ -121,11 +292,10 @@ class GridsGame(arcade.Window):
         unit = self.state.place_unit(unit_cls, row, col)
         self.current_action_points = self.state.current_action_points
         self.units = self.state.units
-        if unit:
-            print(f"Deployed {unit.unit_type} at ({row}, {col})")
         self.sync_hands()
         return unit
 
+    @timed("gui.on_draw")
     def on_draw(self):
         arcade.Window.clear(self)
         for row in range(ROWS):
@@ -174,7 +344,7 @@ class GridsGame(arcade.Window):
             )
             arcade.draw_rect_filled(rect, arcade.color.DARK_RED)
         for unit in self.units:
-            unit.draw()
+            self.view_for(unit).draw()
         panel_x = GRID_WIDTH + UI_PANEL_WIDTH / 2
 
         arcade.draw_lbwh_rectangle_filled(
@@ -273,7 +443,7 @@ class GridsGame(arcade.Window):
             self.card_rects.append(rect)
 
     def on_mouse_press(self, x, y, button, modifiers):
-        print(f"Mouse pressed at ({x}, {y})")
+        logger.debug("Mouse pressed at (%s, %s)", x, y)
         # Click within UI panel
         if x >= GRID_WIDTH:
             if self.point_in_rect(x, y, self.end_turn_button):
@@ -292,11 +462,11 @@ class GridsGame(arcade.Window):
                     self.selected_card_index = idx
                     item = self.hand[idx]
                     if isinstance(item, Card):
-                        print(f"Selected card: {item.name}")
+                        logger.debug("Selected card: %s", item.name)
                         self.deploy_squares = []
                         self.selected_unit_class = None
                     else:
-                        print(f"Selected unit: {item.__name__}")
+                        logger.debug("Selected unit: %s", item.__name__)
                         self.selected_unit_class = item
                         self.deploy_squares = self.get_valid_deploy_squares()
                     return
@@ -305,17 +475,13 @@ class GridsGame(arcade.Window):
         cell = self.get_clicked_cell(x, y)
         if cell:
             row, col = cell
-            print(f"Clicked on cell: ({row}, {col})")
+            logger.debug("Clicked on cell: (%s, %s)", row, col)
 
             # If a card is selected, play or deploy it on this target
             if self.selected_card_index is not None and self.selected_card_index < len(self.hand):
                 selected = self.hand[self.selected_card_index]
                 if isinstance(selected, Card):
-                    target_unit = None
-                    for unit in self.units:
-                        if unit.row == row and unit.col == col:
-                            target_unit = unit
-                            break
+                    target_unit = self.state.unit_at(row, col)
                     target = target_unit if target_unit else (row, col)
                     self.play_card(selected, target)
                     self.selected_card_index = None
@@ -328,24 +494,24 @@ class GridsGame(arcade.Window):
                         self.selected_unit_class = None
                     return
 
-            for unit in self.units:
-                if unit.row == row and unit.col == col:
-                    if (
-                        self.selected_unit
-                        and unit in self.attack_targets
-                        and self.selected_unit.owner == self.current_player
-                    ):
-                        self.attack_unit(self.selected_unit, unit)
-                        self.attack_targets = []
-                        self.move_squares = []
-                        self.selected_unit = None
-                        return
-                    if unit.owner == self.current_player:
-                        self.selected_unit = unit
-                        self.move_squares = self.get_valid_move_squares(unit)
-                        self.attack_targets = self.get_attackable_units(unit)
-                        print("Selected unit:", unit.describe())
-                        return
+            unit = self.state.unit_at(row, col)
+            if unit is not None:
+                if (
+                    self.selected_unit
+                    and unit in self.attack_targets
+                    and self.selected_unit.owner == self.current_player
+                ):
+                    self.attack_unit(self.selected_unit, unit)
+                    self.attack_targets = []
+                    self.move_squares = []
+                    self.selected_unit = None
+                    return
+                if unit.owner == self.current_player:
+                    self.selected_unit = unit
+                    self.move_squares = self.get_valid_move_squares(unit)
+                    self.attack_targets = self.get_attackable_units(unit)
+                    logger.debug("Selected unit: %s", unit.describe())
+                    return
             if self.selected_unit and (row, col) in self.move_squares:
                 self.move_unit(self.selected_unit, row, col)
                 self.attack_targets = self.get_attackable_units(self.selected_unit)
@@ -376,9 +542,11 @@ class GridsGame(arcade.Window):
     def manhattan_distance(self, cell1, cell2):
         return self.state.manhattan_distance(cell1, cell2)
 
+    @timed("gui.on_update")
     def on_update(self, delta_time):
-        for unit in self.state.units:
-            unit.update_animation(delta_time)
+        self.sync_unit_views()
+        for view in self.unit_views.values():
+            view.update_animation(delta_time)
         self.player1BlockedTurnsTimer = self.state.player1BlockedTurnsTimer
         self.player2BlockedTurnsTimer = self.state.player2BlockedTurnsTimer
         self.current_action_points = self.state.current_action_points
@@ -1,8 +1,11 @@
 # Game state logic for grids environment
+import copy
 import heapq
-from collections import deque
+from collections import deque, namedtuple
+from operator import attrgetter
 import random
-from constants import ROWS, COLUMNS, CELL_SIZE, HAND_CAPACITY
+from actions import ActionType
+from constants import ROWS, COLUMNS, HAND_CAPACITY
 from units import (
     Unit,
     Warrior,
@@ -11,6 +14,21 @@ from units import (
     Trebuchet,
     Viking,
 )
+from zobrist import KEYS as ZOBRIST
+from metrics import timed
+from events import (
+    EventBus,
+    Damage,
+    Heal,
+    Death,
+    Move,
+    Knockback,
+    UnitDeployed,
+    CardPlayed,
+    CardDrawn,
+    TurnEnded,
+    Restored,
+)
 from cards import (
     Card,
     Fireball,
@@ -21,13 +39,162 @@ from cards import (
     Teleport,
 )
 
-class GameState:
-    """Headless game state detached from rendering."""
+# Action points granted at the start of a turn, and while actions are blocked.
+ACTION_POINTS = 7
+BLOCKED_ACTION_POINTS = 4
+# Damage applied between turns to burning units and units standing in fire.
+BURN_DAMAGE = 10
+FIRE_DAMAGE = 15
+
+# Each player gets ``DECK_COPIES`` copies of every unit and spell type.
+UNIT_DECK_TYPES = [Warrior, Archer, Trebuchet, Viking]  # Healer,
+# Temporarily exclude Teleport to simplify the learning task
+SPELL_DECK_TYPES = [Fireball, Freeze, StrengthUp, MeteoriteStrike, ActionBlock]
+DECK_COPIES = 2
+
+COMMANDER_STATS = dict(health=150, attack=20, move_range=2, attack_range=1, cost=1)
+
+
+# Scalar attributes copied verbatim by ``clone``/``snapshot``/``restore``.
+SCALAR_FIELDS = (
+    "current_action_points",
+    "current_player",
+    "player1BlockedTurnsTimer",
+    "player2BlockedTurnsTimer",
+    "winner",
+    "_zobrist",
+)
+
+# Opaque record returned by :meth:`GameState.snapshot`. ``units`` holds
+# ``(unit, attributes)`` pairs so :meth:`GameState.restore` can put the
+# original unit objects back in place.
+Snapshot = namedtuple(
+    "Snapshot",
+    "units scalars selected_unit obstacles fires unit_decks spell_decks "
+    "hands unit_hands spell_hands rng",
+)
+
+
+# Unit attributes that actions can change, saved by :meth:`GameState.apply`.
+UNIT_STATE_FIELDS = (
+    "row",
+    "col",
+    "health",
+    "attack",
+    "frozen_turns",
+    "burn_turns",
+    "action_blocked",
+    "has_attacked",
+)
+_unit_state = attrgetter(*UNIT_STATE_FIELDS)
+
+# Undo information returned by :meth:`GameState.apply`. Only what the action
+# actually changed is kept: ``unit_fields`` holds ``(unit, old_values)``
+# pairs, ``units`` the previous unit list if units were added or removed,
+# ``piles`` ``(pile, old_cards)`` pairs for the hands and decks it touched
+# and ``fires`` the previous fire map if it changed. ``ok`` is the result of
+# :meth:`GameState.perform`. ``zkeys`` holds the previous cached Zobrist
+# keys of units whose key changed and ``rng`` the generator state before a
+# card (the only action that may draw random numbers) was played.
+UndoRecord = namedtuple(
+    "UndoRecord",
+    "ok scalars selected_unit units unit_fields targets piles fires zkeys rng",
+)
+
+
+def _unit_key(unit):
+    return ZOBRIST.unit_key(
+        unit.unit_type,
+        unit.owner,
+        unit.row,
+        unit.col,
+        unit.health,
+        unit.attack,
+        unit.frozen_turns,
+        unit.burn_turns,
+        unit.has_attacked,
+    )
+
+
+def _scalars_key(scalars):
+    action_points, player, blocked1, blocked2, winner = scalars[:5]
+    return ZOBRIST.scalars_key(player, action_points, blocked1, blocked2, winner)
+
+
+def _copy_piles(piles):
+    return {player: list(pile) for player, pile in piles.items()}
+
+
+class UnitList(list):
+    """List of units that keeps its state's occupancy grid in sync.
+
+    Appending a unit occupies its cell; any other structural change rebuilds
+    the grid. Position changes must go through
+    :meth:`GameState.relocate_unit`.
+    """
 
-    def __init__(self):
+    def __init__(self, state, units=()):
+        super().__init__(units)
+        self._state = state
+
+    def _assign(self, units):
+        """Replace the contents without touching the occupancy grid."""
+        super().__setitem__(slice(None), units)
+
+    def append(self, unit):
+        super().append(unit)
+        self._state._occupy(unit)
+
+    def _rebuilding(method):
+        def wrapper(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            self._state._rebuild_occupancy()
+            return result
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    extend = _rebuilding(list.extend)
+    insert = _rebuilding(list.insert)
+    remove = _rebuilding(list.remove)
+    pop = _rebuilding(list.pop)
+    clear = _rebuilding(list.clear)
+    __setitem__ = _rebuilding(list.__setitem__)
+    __delitem__ = _rebuilding(list.__delitem__)
+    __iadd__ = _rebuilding(list.__iadd__)
+    del _rebuilding
+
+    def __reduce_ex__(self, protocol):
+        # the owning state is restored afterwards so pickling the state
+        # that holds this list does not recurse
+        return (UnitList, (None, list(self)), {"_state": self._state})
+
+
+class GameState:
+    """Headless game state detached from rendering.
+
+    Besides the ``units`` list the state keeps a ``ROWS`` x ``COLUMNS`` grid
+    mapping each cell to the unit standing on it, so occupancy checks are
+    O(1) regardless of how many units are on the board.
+
+    All randomness (deck shuffles, Teleport's unit choice) comes from
+    ``self.rng``, a ``random.Random`` seeded with ``seed``, so states never
+    share or touch the global ``random`` module. Without a ``seed`` one is
+    drawn from the OS; either way it is kept in ``self.seed`` so the game
+    can be recorded and rebuilt (see :mod:`recording`).
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        # private generator behind deck shuffles and random card effects, so
+        # games with the same seed play out identically
+        self.rng = random.Random(seed)
+        # cached Zobrist hash, ``None`` while stale
+        self._zobrist = None
         self.units = []
         self.obstacles = []
-        self.current_action_points = 7
+        self.current_action_points = ACTION_POINTS
         self.current_player = 1
         self.player1BlockedTurnsTimer = 0
         self.player2BlockedTurnsTimer = 0
@@ -40,18 +207,19 @@ class GameState:
         # stateful selections used by some cards
         self.selected_unit = None
 
+        # typed events describing every rule effect (see ``events.py``);
+        # nothing is built while no sink is subscribed
+        self.events = EventBus()
+
         # each player gets their own identical decks to ensure fairness
-        unit_types = [Warrior, Archer, Trebuchet, Viking] # Healer,
-        # Temporarily exclude Teleport to simplify the learning task
-        spell_types = [Fireball, Freeze, StrengthUp, MeteoriteStrike, ActionBlock]
         self.unit_decks = {1: [], 2: []}
         self.spell_decks = {1: [], 2: []}
         for player in (1, 2):
-            for _ in range(2):  # two copies of each card/unit
-                self.unit_decks[player].extend(unit_types)
-                self.spell_decks[player].extend(card() for card in spell_types)
-            random.shuffle(self.unit_decks[player])
-            random.shuffle(self.spell_decks[player])
+            for _ in range(DECK_COPIES):
+                self.unit_decks[player].extend(UNIT_DECK_TYPES)
+                self.spell_decks[player].extend(card() for card in SPELL_DECK_TYPES)
+            self.rng.shuffle(self.unit_decks[player])
+            self.rng.shuffle(self.spell_decks[player])
 
         # each player maintains separate hands for units and spells
         self.hands = {1: [], 2: []}
@@ -68,6 +236,397 @@ class GameState:
         self.refresh_player_hands()
 
     # ------------------------------------------------------------------
+    @property
+    def units(self):
+        return self._units
+
+    @units.setter
+    def units(self, units):
+        self._units = UnitList(self, units)
+        self._rebuild_occupancy()
+
+    def _rebuild_occupancy(self):
+        self._zobrist = None
+        self._grid = [[None] * COLUMNS for _ in range(ROWS)]
+        for unit in self._units:
+            self._occupy(unit)
+
+    def _occupy(self, unit):
+        self._zobrist = None
+        if 0 <= unit.row < ROWS and 0 <= unit.col < COLUMNS:
+            self._grid[unit.row][unit.col] = unit
+
+    def _vacate(self, unit):
+        if 0 <= unit.row < ROWS and 0 <= unit.col < COLUMNS:
+            if self._grid[unit.row][unit.col] is unit:
+                self._grid[unit.row][unit.col] = None
+
+    def unit_at(self, row, col):
+        """Return the unit at ``(row, col)`` or ``None``."""
+        if 0 <= row < ROWS and 0 <= col < COLUMNS:
+            return self._grid[row][col]
+        return None
+
+    def is_occupied(self, row, col):
+        return self.unit_at(row, col) is not None
+
+    def relocate_unit(self, unit, row, col):
+        """Move ``unit`` to ``(row, col)`` and update the occupancy grid.
+
+        Every position change (moves, knockback, teleports) must use this
+        rather than assigning ``unit.row``/``unit.col`` directly.
+        """
+        self._vacate(unit)
+        unit.row = row
+        unit.col = col
+        self._occupy(unit)
+
+    # ------------------------------------------------------------------
+    def clone(self):
+        """Return an independent copy of the logical game state.
+
+        Units, hands, decks, fires and timers are copied; immutable card
+        objects and unit classes are shared between the copies. The copy gets
+        its own copy of the RNG and an empty :class:`EventBus`. This is far cheaper than
+        ``copy.deepcopy`` and intended for lookahead and rollouts.
+        """
+        new = self.__class__.__new__(self.__class__)
+        new.seed = self.seed
+        for name in SCALAR_FIELDS:
+            setattr(new, name, getattr(self, name))
+        mapping = {unit: unit.copy() for unit in self._units}
+        for unit in mapping.values():
+            if unit.attacked_targets:
+                unit.attacked_targets = {
+                    mapping.get(target, target) for target in unit.attacked_targets
+                }
+        new._units = UnitList(new, mapping.values())
+        # copy the occupancy grid row by row and swap in the new units
+        # rather than rebuilding it from scratch
+        grid = new._grid = [row[:] for row in self._grid]
+        for old, unit in mapping.items():
+            if 0 <= old.row < ROWS and 0 <= old.col < COLUMNS and grid[old.row][old.col] is old:
+                grid[old.row][old.col] = unit
+        new.selected_unit = mapping.get(self.selected_unit, self.selected_unit)
+        new.obstacles = list(self.obstacles)
+        new.fires = dict(self.fires)
+        new.events = EventBus()
+        new.rng = copy.copy(self.rng)
+        new.unit_decks = _copy_piles(self.unit_decks)
+        new.spell_decks = _copy_piles(self.spell_decks)
+        new.hands = _copy_piles(self.hands)
+        new.unit_hands = _copy_piles(self.unit_hands)
+        new.spell_hands = _copy_piles(self.spell_hands)
+        new.refresh_player_hands()
+        return new
+
+    def snapshot(self):
+        """Capture the logical state so :meth:`restore` can roll back to it.
+
+        Unlike :meth:`clone`, restoring keeps this object and its unit
+        objects, so references held elsewhere (GUI views, environments,
+        selected units) stay valid. A snapshot may be restored many times.
+        """
+        units = []
+        for unit in self._units:
+            fields = unit.__dict__.copy()
+            fields["attacked_targets"] = set(unit.attacked_targets)
+            units.append((unit, fields))
+        return Snapshot(
+            units=units,
+            scalars=tuple(getattr(self, name) for name in SCALAR_FIELDS),
+            selected_unit=self.selected_unit,
+            obstacles=list(self.obstacles),
+            fires=dict(self.fires),
+            unit_decks=_copy_piles(self.unit_decks),
+            spell_decks=_copy_piles(self.spell_decks),
+            hands=_copy_piles(self.hands),
+            unit_hands=_copy_piles(self.unit_hands),
+            spell_hands=_copy_piles(self.spell_hands),
+            rng=self.rng.getstate(),
+        )
+
+    def restore(self, snapshot):
+        """Return the state to the point captured by :meth:`snapshot`."""
+        for unit, fields in snapshot.units:
+            unit.__dict__.clear()
+            unit.__dict__.update(fields)
+            unit.attacked_targets = set(fields["attacked_targets"])
+        # keep the same list object so aliases such as ``GridsGame.units``
+        # keep working
+        self._units._assign([unit for unit, _ in snapshot.units])
+        self._rebuild_occupancy()
+        for name, value in zip(SCALAR_FIELDS, snapshot.scalars):
+            setattr(self, name, value)
+        self.selected_unit = snapshot.selected_unit
+        self.obstacles = list(snapshot.obstacles)
+        self.fires = dict(snapshot.fires)
+        self.unit_decks = _copy_piles(snapshot.unit_decks)
+        self.spell_decks = _copy_piles(snapshot.spell_decks)
+        self.hands = _copy_piles(snapshot.hands)
+        self.unit_hands = _copy_piles(snapshot.unit_hands)
+        self.spell_hands = _copy_piles(snapshot.spell_hands)
+        self.rng.setstate(snapshot.rng)
+        self.refresh_player_hands()
+        if self.events:
+            self.events.emit(Restored())
+
+    # ------------------------------------------------------------------
+    @timed("game_state.perform")
+    def perform(self, action):
+        """Carry out an ``(action_type, index, row, col)`` action.
+
+        This is the state transition behind :meth:`GridsEnv.step`. Returns
+        ``(ok, played)`` where ``played`` is the unit class deployed or the
+        card played. ``ok`` is ``None`` for malformed actions (index out of
+        range, a deploy square outside the deployment column, an attack on
+        an empty cell or an unknown action type), which leave the state
+        untouched. Otherwise the turn ends automatically once the current
+        player has no action points left.
+        """
+        action_type, idx, row, col = action
+        played = None
+        if action_type == ActionType.MOVE:
+            if idx >= len(self.units):
+                return None, None
+            ok = self.move_unit(self.units[idx], row, col)
+        elif action_type == ActionType.DEPLOY:
+            if idx >= len(self.unit_hand):
+                return None, None
+            played = self.unit_hand[idx]
+            if (row, col) not in self.get_valid_deploy_squares():
+                return None, None
+            ok = self.place_unit(played, row, col) is not None
+        elif action_type == ActionType.PLAY_CARD:
+            if idx >= len(self.spell_hand):
+                return None, None
+            played = self.spell_hand[idx]
+            ok = self.play_card(played, (row, col))
+        elif action_type == ActionType.ATTACK:
+            if idx >= len(self.units):
+                return None, None
+            target = self.unit_at(row, col)
+            if target is None:
+                return None, None
+            ok = bool(self.attack_unit(self.units[idx], target))
+        elif action_type == ActionType.DRAW_SPELL:
+            ok = self.draw_cards(self.spell_deck, self.current_player, num=1, ap_cost=1)
+        elif action_type == ActionType.DRAW_UNIT:
+            ok = self.draw_cards(self.unit_deck, self.current_player, num=1, ap_cost=1)
+        elif action_type == ActionType.END_TURN:
+            self.end_turn()
+            ok = True
+        else:
+            return None, None
+
+        if self.current_action_points <= 0:
+            self.end_turn()
+        return ok, played
+
+    @timed("game_state.apply")
+    def apply(self, action):
+        """Perform ``action`` in place and return an :class:`UndoRecord`.
+
+        Passing the record to :meth:`undo` reverses the action exactly, so a
+        search can walk :meth:`legal_actions` trees without copying the
+        state. Records must be undone in reverse order of application.
+        """
+        player = self.current_player
+        action_type = action[0]
+        if action_type == ActionType.DRAW_SPELL:
+            touched = (self.spell_decks, self.hands, self.spell_hands)
+        elif action_type == ActionType.DRAW_UNIT:
+            touched = (self.unit_decks, self.hands, self.unit_hands)
+        elif action_type == ActionType.DEPLOY:
+            touched = (self.hands, self.unit_hands)
+        elif action_type == ActionType.PLAY_CARD:
+            touched = (self.hands, self.spell_hands)
+        else:
+            touched = ()
+        rng = self.rng.getstate() if action_type == ActionType.PLAY_CARD else None
+        piles = [(piles[player], list(piles[player])) for piles in touched]
+        zobrist = self._zobrist
+        if zobrist is not None and touched:
+            cards_before = ZOBRIST.cards_key(self, player)
+        else:
+            cards_before = None
+        units = list(self._units)
+        fields = [_unit_state(unit) for unit in units]
+        targets = [set(unit.attacked_targets) for unit in units]
+        fires = dict(self.fires)
+        scalars = tuple(getattr(self, name) for name in SCALAR_FIELDS)
+        selected_unit = self.selected_unit
+
+        ok, _ = self.perform(action)
+
+        old_units = None if units == self._units else units
+        unit_fields = [
+            (unit, old) for unit, old in zip(units, fields) if _unit_state(unit) != old
+        ]
+        old_fires = None if fires == self.fires else fires
+        zkeys = []
+        if zobrist is not None:
+            self._zobrist = self._rehash(
+                zobrist, old_units, unit_fields, zkeys, player, cards_before,
+                old_fires, scalars,
+            )
+        return UndoRecord(
+            ok=ok,
+            scalars=scalars,
+            selected_unit=selected_unit,
+            units=old_units,
+            unit_fields=unit_fields,
+            targets=[
+                (unit, old)
+                for unit, old in zip(units, targets)
+                if unit.attacked_targets != old
+            ],
+            piles=[(pile, old) for pile, old in piles if len(pile) != len(old)],
+            fires=old_fires,
+            zkeys=zkeys,
+            rng=rng,
+        )
+
+    def _rehash(self, zobrist, old_units, unit_fields, zkeys, player, cards_before,
+                old_fires, old_scalars):
+        """Return ``zobrist`` updated for the changes :meth:`apply` found.
+
+        Relies on every unit's cached ``_zkey`` being current before the
+        action; ``(unit, previous_key)`` pairs are appended to ``zkeys``.
+        """
+        alive = None if old_units is None else set(self._units)
+        for unit, _ in unit_fields:
+            if alive is not None and unit not in alive:
+                continue
+            key = _unit_key(unit)
+            zkeys.append((unit, unit._zkey))
+            zobrist ^= unit._zkey ^ key
+            unit._zkey = key
+        if old_units is not None:
+            before = set(old_units)
+            for unit in old_units:
+                if unit not in alive:
+                    zobrist ^= unit._zkey
+            for unit in self._units:
+                if unit not in before:
+                    unit._zkey = _unit_key(unit)
+                    zobrist ^= unit._zkey
+        if cards_before is not None:
+            zobrist ^= cards_before ^ ZOBRIST.cards_key(self, player)
+        if old_fires is not None:
+            zobrist ^= ZOBRIST.fires_key(old_fires) ^ ZOBRIST.fires_key(self.fires)
+        new_scalars = tuple(getattr(self, name) for name in SCALAR_FIELDS)
+        return zobrist ^ _scalars_key(old_scalars) ^ _scalars_key(new_scalars)
+
+    @timed("game_state.undo")
+    def undo(self, record):
+        """Reverse the action that produced ``record``."""
+        for unit, key in record.zkeys:
+            unit._zkey = key
+        moved = record.units is not None
+        for unit, old in record.unit_fields:
+            if not moved and (unit.row, unit.col) != old[:2]:
+                moved = True
+            for name, value in zip(UNIT_STATE_FIELDS, old):
+                setattr(unit, name, value)
+        for unit, old in record.targets:
+            unit.attacked_targets = set(old)
+        if record.units is not None:
+            self._units._assign(record.units)
+        if moved:
+            self._rebuild_occupancy()
+        for pile, old in record.piles:
+            pile[:] = old
+        if record.fires is not None:
+            self.fires = dict(record.fires)
+        for name, value in zip(SCALAR_FIELDS, record.scalars):
+            setattr(self, name, value)
+        self.selected_unit = record.selected_unit
+        if record.rng is not None:
+            self.rng.setstate(record.rng)
+        self.refresh_player_hands()
+        if self.events:
+            self.events.emit(Restored())
+
+    @property
+    def zobrist_hash(self):
+        """64-bit Zobrist hash of the position (see :mod:`zobrist`).
+
+        :meth:`apply` and :meth:`undo` keep the hash up to date
+        incrementally. The other mutators mark it stale and the next read
+        recomputes it; call :meth:`invalidate_hash` after changing units or
+        cards directly.
+        """
+        if self._zobrist is None:
+            self._zobrist = self.compute_hash()
+        return self._zobrist
+
+    def invalidate_hash(self):
+        self._zobrist = None
+
+    def compute_hash(self):
+        """Compute the Zobrist hash from scratch and refresh the unit keys."""
+        zobrist = 0
+        for unit in self._units:
+            unit._zkey = _unit_key(unit)
+            zobrist ^= unit._zkey
+        zobrist ^= ZOBRIST.cards_key(self, 1) ^ ZOBRIST.cards_key(self, 2)
+        zobrist ^= ZOBRIST.fires_key(self.fires)
+        return zobrist ^ _scalars_key(tuple(getattr(self, name) for name in SCALAR_FIELDS))
+
+    @timed("game_state.legal_actions")
+    def legal_actions(self):
+        """Return every action the current player may take.
+
+        Actions are ``(action_type, index, row, col)`` tuples as accepted by
+        :meth:`perform` and :meth:`apply`.
+        """
+        actions = []
+        player = self.current_player
+        for idx, unit in enumerate(self.units):
+            if unit.owner != player:
+                continue
+            for r, c in self.get_valid_move_squares(unit):
+                actions.append((ActionType.MOVE, idx, r, c))
+            for target in self.get_attackable_units(unit):
+                actions.append((ActionType.ATTACK, idx, target.row, target.col))
+        for idx, unit_cls in enumerate(self.unit_hands[player]):
+            for r, c in self.get_valid_deploy_squares(player):
+                actions.append((ActionType.DEPLOY, idx, r, c))
+        for idx, card in enumerate(self.spell_hands[player]):
+            target_cells = set()
+            for u in self.units:
+                for dr in (-1, 0, 1):
+                    for dc in (-1, 0, 1):
+                        r, c = u.row + dr, u.col + dc
+                        if 0 <= r < ROWS and 0 <= c < COLUMNS:
+                            target_cells.add((r, c))
+            for r, c in target_cells:
+                actions.append((ActionType.PLAY_CARD, idx, r, c))
+
+        # drawing cards costs 1 action point and is only available when
+        # the player has remaining AP and space in hand
+        if (
+            self.spell_decks[player]
+            and len(self.spell_hands[player]) < HAND_CAPACITY
+            and self.current_action_points > 0
+        ):
+            actions.append((ActionType.DRAW_SPELL, 0, 0, 0))
+        if (
+            self.unit_decks[player]
+            and len(self.unit_hands[player]) < HAND_CAPACITY
+            and self.current_action_points > 0
+        ):
+            actions.append((ActionType.DRAW_UNIT, 0, 0, 0))
+
+        # Only allow ending the turn early if no other actions are available or
+        # the player has exhausted their action points. This encourages the AI
+        # to use all actions each turn.
+        if not actions or self.current_action_points <= 0:
+            actions.append((ActionType.END_TURN, 0, 0, 0))
+
+        return actions
+
     def check_winner(self):
         """Update the winner attribute based on remaining commanders."""
         p1_alive = any(
@@ -87,7 +646,14 @@ class GameState:
 
     def remove_dead_units(self):
         """Remove units with no health and check for a winner."""
-        self.units[:] = [u for u in self.units if u.health > 0]
+        alive = [u for u in self.units if u.health > 0]
+        if len(alive) != len(self.units):
+            for unit in self.units:
+                if unit.health <= 0:
+                    self._vacate(unit)
+                    if self.events:
+                        self.events.emit(Death(unit))
+            self.units._assign(alive)
         self.check_winner()
 
     def refresh_player_hands(self):
@@ -108,30 +674,10 @@ class GameState:
     def init_board(self):
         # start with only the two commanders on the board
         self.units.append(
-            Unit(
-                ROWS // 2,
-                0,
-                "Commander",
-                owner=1,
-                health=150,
-                attack=20,
-                move_range=2,
-                attack_range=1,
-                cost=1,
-            )
+            Unit(ROWS // 2, 0, "Commander", owner=1, **COMMANDER_STATS)
         )
         self.units.append(
-            Unit(
-                ROWS // 2,
-                COLUMNS - 1,
-                "Commander",
-                owner=2,
-                health=150,
-                attack=20,
-                move_range=2,
-                attack_range=1,
-                cost=1,
-            )
+            Unit(ROWS // 2, COLUMNS - 1, "Commander", owner=2, **COMMANDER_STATS)
         )
 
     def draw_cards(self, deck, player, num=1, ap_cost=0):
@@ -141,6 +687,7 @@ class GameState:
         the action point cost per card and will be subtracted when a card is
         successfully drawn.
         """
+        self._zobrist = None
         drawn = False
         hand = self.hands[player]
         for _ in range(num):
@@ -156,6 +703,8 @@ class GameState:
                 if ap_cost:
                     self.current_action_points -= ap_cost
                 drawn = True
+                if self.events:
+                    self.events.emit(CardDrawn(player, card))
         return drawn
 
     def get_valid_deploy_squares(self, player=None):
@@ -165,18 +714,19 @@ class GameState:
         col = 0 if player == 1 else COLUMNS - 1
         valid = []
         for row in range(ROWS):
-            if not any(u.row == row and u.col == col for u in self.units):
+            if self._grid[row][col] is None:
                 valid.append((row, col))
         return valid
 
     def place_unit(self, unit_cls, row, col):
         """Deploy a unit from the player's hand onto the board."""
+        self._zobrist = None
         player = self.current_player
         if unit_cls not in self.unit_hands[player]:
             return None
         if (player == 1 and col != 0) or (player == 2 and col != COLUMNS - 1):
             return None
-        if any(u.row == row and u.col == col for u in self.units):
+        if self.is_occupied(row, col):
             return None
         unit = unit_cls(row, col, owner=player)
         cost = getattr(unit, "deploy_cost", 1)
@@ -188,30 +738,28 @@ class GameState:
         self.units.append(unit)
         self.current_action_points -= cost
         self.refresh_player_hands()
+        if self.events:
+            self.events.emit(UnitDeployed(player, unit))
         return unit
 
     # ---------- Core game mechanics ----------
-    def move_unit(self, unit, target_row, target_col, animate=False):
+    def move_unit(self, unit, target_row, target_col):
+        self._zobrist = None
         if unit.frozen_turns > 0:
             return False
-        path = self.a_star_pathfinding((unit.row, unit.col), (target_row, target_col))
+        origin = (unit.row, unit.col)
+        path = self.a_star_pathfinding(origin, (target_row, target_col))
         if not path or len(path) > unit.move_range:
             return False
         final_row, final_col = path[-1]
-        if animate:
-            unit.start_move(path)
-        else:
-            unit.row = final_row
-            unit.col = final_col
-            unit.pixel_x = final_col * CELL_SIZE + CELL_SIZE / 2
-            unit.pixel_y = final_row * CELL_SIZE + CELL_SIZE / 2
-            unit.target_pixel_x = unit.pixel_x
-            unit.target_pixel_y = unit.pixel_y
-            unit.move_queue = []
+        self.relocate_unit(unit, final_row, final_col)
+        if self.events:
+            self.events.emit(Move(unit, origin, path))
         self.current_action_points -= 1
         return True
 
     def attack_unit(self, attacker, target):
+        self._zobrist = None
         if attacker.frozen_turns > 0:
             return False
 
@@ -225,10 +773,10 @@ class GameState:
         if attacker.unit_type == "Healer":
             if attacker.owner == target.owner:
                 # Heal friendly target up to its maximum health
+                before = target.health
                 target.health = min(target.health + attacker.attack, target.max_health)
-                print(
-                    f"{attacker.unit_type} heals {target.unit_type}! {target.unit_type} health is now {target.health}."
-                )
+                if self.events:
+                    self.events.emit(Heal(attacker, target, target.health - before, target.health))
                 return True
             else:
                 # Healers cannot damage enemies
@@ -238,32 +786,22 @@ class GameState:
             return
         dist = self.manhattan_distance((attacker.row, attacker.col), (target.row, target.col))
         damage = attacker.attack
-        adjacency_damaged = []
+        events = self.events
         if attacker.unit_type == "Trebuchet":
             if dist == 1:
                 damage = attacker.attack // 2
             # deal splash damage to units adjacent to the target
             offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
             for dr, dc in offsets:
-                ar, ac = target.row + dr, target.col + dc
-                for unit in self.units:
-                    if unit is target or unit is attacker:
-                        continue
-                    if unit.row == ar and unit.col == ac:
-                        unit.health -= attacker.attack // 2
-                        adjacency_damaged.append(unit)
+                unit = self.unit_at(target.row + dr, target.col + dc)
+                if unit is None or unit is target or unit is attacker:
+                    continue
+                unit.health -= attacker.attack // 2
+                if events:
+                    events.emit(Damage(unit, attacker.attack // 2, unit.health, attacker))
         target.health -= damage
-        if attacker.unit_type == "Trebuchet" and adjacency_damaged:
-            adj_info = ", ".join(
-                f"{u.unit_type} (now {u.health})" for u in adjacency_damaged
-            )
-            print(
-                f"{attacker.unit_type} attacks {target.unit_type}! {target.unit_type} health is now {target.health}. Adjacent units damaged: {adj_info}."
-            )
-        else:
-            print(
-                f"{attacker.unit_type} attacks {target.unit_type}! {target.unit_type} health is now {target.health}."
-            )
+        if events:
+            events.emit(Damage(target, damage, target.health, attacker))
         if target.health <= 0:
             # remove defeated unit immediately so its cell becomes free and
             # check if the game has been won.
@@ -282,46 +820,47 @@ class GameState:
         knock_row = target.row + (1 if dr > 0 else -1 if dr < 0 else 0)
         knock_col = target.col + (1 if dc > 0 else -1 if dc < 0 else 0)
         if 0 <= knock_row < ROWS and 0 <= knock_col < COLUMNS:
-            if not any(u.row == knock_row and u.col == knock_col for u in self.units):
+            if not self.is_occupied(knock_row, knock_col):
                 if attacker != target:
-                    target.row = knock_row
-                    target.col = knock_col
-                    # keep pixel values in sync with logical position so
-                    # pathfinding and rendering remain consistent after
-                    # knockback.
-                    target.pixel_x = knock_col * CELL_SIZE + CELL_SIZE / 2
-                    target.pixel_y = knock_row * CELL_SIZE + CELL_SIZE / 2
-                    target.target_pixel_x = target.pixel_x
-                    target.target_pixel_y = target.pixel_y
-                    target.move_queue = []
+                    origin = (target.row, target.col)
+                    self.relocate_unit(target, knock_row, knock_col)
+                    if events:
+                        events.emit(Knockback(target, origin, (knock_row, knock_col)))
         attacker.has_attacked = True
         attacker.attacked_targets.add(target)
         return True
 
     def end_turn(self):
+        self._zobrist = None
         # apply status effects at the end of each turn before switching players
         self.process_turn_effects()
         for unit in self.units:
             unit.has_attacked = False
             unit.attacked_targets.clear()
+        player = self.current_player
         self.current_player = 2 if self.current_player == 1 else 1
         if self.current_player == 1 and self.player1BlockedTurnsTimer > 0:
             self.player1BlockedTurnsTimer -= 1
-            self.current_action_points = 4
+            self.current_action_points = BLOCKED_ACTION_POINTS
         elif self.current_player == 2 and self.player2BlockedTurnsTimer > 0:
             self.player2BlockedTurnsTimer -= 1
-            self.current_action_points = 4
+            self.current_action_points = BLOCKED_ACTION_POINTS
         else:
-            self.current_action_points = 7
+            self.current_action_points = ACTION_POINTS
         # card drawing is now an explicit action rather than automatic
         self.refresh_player_hands()
+        if self.events:
+            self.events.emit(TurnEnded(player, self.current_player))
 
     def play_card(self, card, target):
+        self._zobrist = None
         player = self.current_player
         if card not in self.spell_hands[player]:
             return False
         if self.current_action_points < card.cost:
             return False
+        if self.events:
+            self.events.emit(CardPlayed(player, card, target))
         card.play(self, target)
         self.spell_hands[player].remove(card)
         if card in self.hands[player]:
@@ -350,7 +889,7 @@ class GameState:
                     continue
                 if (nr, nc) in visited:
                     continue
-                if any(u.row == nr and u.col == nc for u in self.units):
+                if self._grid[nr][nc] is not None:
                     continue
                 visited.add((nr, nc))
                 valid_moves.append((nr, nc))
@@ -402,7 +941,7 @@ class GameState:
                 neighbor = (current[0] + dr, current[1] + dc)
                 if not (0 <= neighbor[0] < ROWS and 0 <= neighbor[1] < COLUMNS):
                     continue
-                if any(u.row == neighbor[0] and u.col == neighbor[1] for u in self.units):
+                if self._grid[neighbor[0]][neighbor[1]] is not None:
                     continue
                 tentative_g_score = g_score[current] + 1
                 if neighbor not in g_score or tentative_g_score < g_score[neighbor]:
@@ -416,14 +955,19 @@ class GameState:
         return abs(cell1[0] - cell2[0]) + abs(cell1[1] - cell2[1])
 
     def process_turn_effects(self):
+        events = self.events
         for unit in self.units:
             if unit.frozen_turns > 0:
                 unit.frozen_turns -= 1
             if unit.burn_turns > 0:
-                unit.health -= 10
+                unit.health -= BURN_DAMAGE
                 unit.burn_turns -= 1
+                if events:
+                    events.emit(Damage(unit, BURN_DAMAGE, unit.health, "burn"))
             if (unit.row, unit.col) in self.fires:
-                unit.health -= 15
+                unit.health -= FIRE_DAMAGE
+                if events:
+                    events.emit(Damage(unit, FIRE_DAMAGE, unit.health, "fire"))
         # decrement fire durations and clean up
         expired = []
         for pos in list(self.fires.keys()):
@@ -3,7 +3,22 @@ from gym import spaces
 import numpy as np
 
 from game_state import GameState
-from actions import ActionType
+from events import (
+    Damage,
+    Heal,
+    Death,
+    Move,
+    Knockback,
+    Teleported,
+    UnitDeployed,
+    CardPlayed,
+    CardDrawn,
+    TurnEnded,
+    Restored,
+)
+from metrics import timed
+from recording import GameRecorder
+from actions import ActionType, ACTION_SIZE, ACTION_SHAPE, MAX_ACTION_INDEX
 from constants import ROWS, COLUMNS, HAND_CAPACITY
 from units import Warrior, Archer, Healer, Trebuchet, Viking
 from cards import Fireball, Freeze, StrengthUp, MeteoriteStrike, ActionBlock, Teleport
@@ -26,20 +41,314 @@ UNIT_TYPE_TO_ID = {cls: i + 1 for i, cls in enumerate(UNIT_TYPES)}
 SPELL_TYPES = [Fireball, Freeze, StrengthUp, MeteoriteStrike, ActionBlock, Teleport]
 SPELL_TYPE_TO_ID = {cls: i + 1 for i, cls in enumerate(SPELL_TYPES)}
 
+# Layout of the flat observation vector (``obs_mode="flat"``): the three
+# scalars, board owners, board health, unit hand and spell hand. It matches
+# the feature order of :func:`dqn_agent.obs_to_tensor`.
+BOARD_CELLS = ROWS * COLUMNS
+FLAT_OWNER = slice(3, 3 + BOARD_CELLS)
+FLAT_HEALTH = slice(FLAT_OWNER.stop, FLAT_OWNER.stop + BOARD_CELLS)
+FLAT_UNIT_HAND = slice(FLAT_HEALTH.stop, FLAT_HEALTH.stop + HAND_CAPACITY)
+FLAT_SPELL_HAND = slice(FLAT_UNIT_HAND.stop, FLAT_UNIT_HAND.stop + HAND_CAPACITY)
+FLAT_OBS_SIZE = FLAT_SPELL_HAND.stop
+
+def fill_action_mask(state: GameState, mask: np.ndarray) -> np.ndarray:
+    """Write the legal actions of ``state`` into ``mask`` and return it.
+
+    ``mask`` is a boolean array of length ``ACTION_SIZE`` indexed by
+    :func:`actions.action_to_index`. It marks exactly the actions listed by
+    :meth:`GridsEnv.valid_actions` without building any tuples.
+    """
+    mask[:] = False
+    grid = mask.reshape(ACTION_SHAPE)
+    player = state.current_player
+    for idx, unit in enumerate(state.units):
+        if unit.owner != player:
+            continue
+        for r, c in state.get_valid_move_squares(unit):
+            grid[ActionType.MOVE, idx, r, c] = True
+        for target in state.get_attackable_units(unit):
+            grid[ActionType.ATTACK, idx, target.row, target.col] = True
+
+    num_units = len(state.unit_hands[player])
+    if num_units:
+        squares = state.get_valid_deploy_squares(player)
+        if squares:
+            rows = [r for r, _ in squares]
+            grid[ActionType.DEPLOY, :num_units, rows, squares[0][1]] = True
+
+    num_spells = len(state.spell_hands[player])
+    if num_spells and state.units:
+        # spells may target any cell within one square (incl. diagonals) of a unit
+        near = np.zeros((ROWS, COLUMNS), dtype=bool)
+        near[[u.row for u in state.units], [u.col for u in state.units]] = True
+        wide = near.copy()
+        wide[:, 1:] |= near[:, :-1]
+        wide[:, :-1] |= near[:, 1:]
+        near = wide.copy()
+        near[1:, :] |= wide[:-1, :]
+        near[:-1, :] |= wide[1:, :]
+        grid[ActionType.PLAY_CARD, :num_spells] = near
+
+    ap = state.current_action_points
+    if (
+        state.spell_decks[player]
+        and len(state.spell_hands[player]) < HAND_CAPACITY
+        and ap > 0
+    ):
+        grid[ActionType.DRAW_SPELL, 0, 0, 0] = True
+    if (
+        state.unit_decks[player]
+        and len(state.unit_hands[player]) < HAND_CAPACITY
+        and ap > 0
+    ):
+        grid[ActionType.DRAW_UNIT, 0, 0, 0] = True
+    if ap <= 0 or not mask.any():
+        grid[ActionType.END_TURN, 0, 0, 0] = True
+    return mask
+
+
+def observe(state: GameState) -> dict:
+    """Return the observation dict of ``state`` from the current player's view."""
+    board_owner = np.zeros((ROWS, COLUMNS), dtype=np.int8)
+    board_health = np.zeros((ROWS, COLUMNS), dtype=np.int16)
+    for unit in state.units:
+        board_owner[unit.row, unit.col] = unit.owner
+        board_health[unit.row, unit.col] = unit.health
+    opponent = 2 if state.current_player == 1 else 1
+    unit_hand = np.zeros(HAND_CAPACITY, dtype=np.int8)
+    for i, unit_cls in enumerate(state.unit_hand[:HAND_CAPACITY]):
+        unit_hand[i] = UNIT_TYPE_TO_ID.get(unit_cls, 0)
+    spell_hand = np.zeros(HAND_CAPACITY, dtype=np.int8)
+    for i, card in enumerate(state.spell_hand[:HAND_CAPACITY]):
+        spell_hand[i] = SPELL_TYPE_TO_ID.get(card.__class__, 0)
+    return {
+        "current_player": state.current_player,
+        "action_points": state.current_action_points,
+        "board_owner": board_owner,
+        "board_health": board_health,
+        "opponent_hand": len(state.hands[opponent]),
+        "unit_hand": unit_hand,
+        "spell_hand": spell_hand,
+    }
+
+
+def flatten_obs(obs: dict, out=None) -> np.ndarray:
+    """Write the observation dict ``obs`` into a float32 vector in flat layout."""
+    if out is None:
+        out = np.empty(FLAT_OBS_SIZE, dtype=np.float32)
+    out[0] = obs["current_player"]
+    out[1] = obs["action_points"]
+    out[2] = obs["opponent_hand"]
+    out[FLAT_OWNER] = np.ravel(obs["board_owner"])
+    out[FLAT_HEALTH] = np.ravel(obs["board_health"])
+    out[FLAT_UNIT_HAND] = obs["unit_hand"]
+    out[FLAT_SPELL_HAND] = obs["spell_hand"]
+    return out
+
+
+class ObservationBuffers:
+    """The observation of one :class:`GameState`, kept current from its events.
+
+    The board arrays are filled once when a state is attached; afterwards
+    each move, hit, heal, death or deployment rewrites only the cells it
+    touched, read back from the state's occupancy grid. Card draws and
+    plays, deployments and turn changes mark the hand arrays stale and the
+    next :meth:`observation` refills them. :class:`events.Restored` (sent by
+    ``restore`` and ``undo``) rebuilds everything.
+
+    The state must only change through methods that emit events; call
+    :meth:`rebuild` (:meth:`GridsEnv.refresh_obs`) after editing units or
+    hands directly.
+
+    Given a float32 vector of length ``FLAT_OBS_SIZE`` as ``flat``, the
+    arrays are views into it, so events write the flat layout directly and
+    :meth:`flat_observation` only has to fill in the three scalars.
+    """
+
+    def __init__(self, flat=None):
+        self.flat = flat
+        if flat is None:
+            self.board_owner = np.zeros((ROWS, COLUMNS), dtype=np.int8)
+            self.board_health = np.zeros((ROWS, COLUMNS), dtype=np.int16)
+            self.unit_hand = np.zeros(HAND_CAPACITY, dtype=np.int8)
+            self.spell_hand = np.zeros(HAND_CAPACITY, dtype=np.int8)
+        else:
+            self.board_owner = flat[FLAT_OWNER].reshape(ROWS, COLUMNS)
+            self.board_health = flat[FLAT_HEALTH].reshape(ROWS, COLUMNS)
+            self.unit_hand = flat[FLAT_UNIT_HAND]
+            self.spell_hand = flat[FLAT_SPELL_HAND]
+        self._arrays = {
+            "board_owner": self.board_owner,
+            "board_health": self.board_health,
+            "unit_hand": self.unit_hand,
+            "spell_hand": self.spell_hand,
+        }
+        self._view = {}
+        for key, array in self._arrays.items():
+            view = array.view()
+            view.flags.writeable = False
+            self._view[key] = view
+        self._handlers = {
+            Move: self._on_move,
+            Knockback: self._on_relocation,
+            Teleported: self._on_relocation,
+            Damage: self._on_unit,
+            Death: self._on_unit,
+            Heal: self._on_heal,
+            UnitDeployed: self._on_deploy,
+            CardPlayed: self._on_hand,
+            CardDrawn: self._on_hand,
+            TurnEnded: self._on_hand,
+            Restored: self._on_restored,
+        }
+        self.state = None
+        self._hands_stale = True
+
+    def attach(self, state: GameState) -> None:
+        """Follow ``state`` instead of the previously attached one."""
+        if self.state is not None:
+            self.state.events.unsubscribe(self._on_event)
+        self.state = state
+        state.events.subscribe(self._on_event, tuple(self._handlers))
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Refill every array from the attached state."""
+        self.board_owner[:] = 0
+        self.board_health[:] = 0
+        for unit in self.state.units:
+            self.board_owner[unit.row, unit.col] = unit.owner
+            self.board_health[unit.row, unit.col] = unit.health
+        self._hands_stale = True
+
+    def observation(self, copy: bool = True) -> dict:
+        """Return the observation of the attached state.
+
+        With ``copy=False`` the arrays are read-only views of the live
+        buffers, so they change with the next action; copy whatever must be
+        kept.
+        """
+        state = self.state
+        if self._hands_stale:
+            self._fill_hands()
+        opponent = 2 if state.current_player == 1 else 1
+        obs = {
+            "current_player": state.current_player,
+            "action_points": state.current_action_points,
+            "opponent_hand": len(state.hands[opponent]),
+        }
+        arrays = self._arrays if copy else self._view
+        for key, array in arrays.items():
+            obs[key] = array.copy() if copy else array
+        return obs
+
+    def flat_observation(self) -> np.ndarray:
+        """Bring :attr:`flat` up to date and return it (not a copy)."""
+        state = self.state
+        if self._hands_stale:
+            self._fill_hands()
+        flat = self.flat
+        flat[0] = state.current_player
+        flat[1] = state.current_action_points
+        flat[2] = len(state.hands[2 if state.current_player == 1 else 1])
+        return flat
+
+    # ------------------------------------------------------------------
+    def _fill_hands(self) -> None:
+        self.unit_hand[:] = 0
+        for i, unit_cls in enumerate(self.state.unit_hand[:HAND_CAPACITY]):
+            self.unit_hand[i] = UNIT_TYPE_TO_ID.get(unit_cls, 0)
+        self.spell_hand[:] = 0
+        for i, card in enumerate(self.state.spell_hand[:HAND_CAPACITY]):
+            self.spell_hand[i] = SPELL_TYPE_TO_ID.get(card.__class__, 0)
+        self._hands_stale = False
+
+    def _write_cell(self, row: int, col: int) -> None:
+        unit = self.state.unit_at(row, col)
+        if unit is None:
+            self.board_owner[row, col] = 0
+            self.board_health[row, col] = 0
+        else:
+            self.board_owner[row, col] = unit.owner
+            self.board_health[row, col] = unit.health
+
+    def _on_event(self, event) -> None:
+        self._handlers[type(event)](event)
+
+    def _on_move(self, event: Move) -> None:
+        self._write_cell(*event.origin)
+        self._write_cell(*event.path[-1])
+
+    def _on_relocation(self, event) -> None:
+        self._write_cell(*event.origin)
+        self._write_cell(*event.destination)
+
+    def _on_unit(self, event) -> None:
+        self._write_cell(event.unit.row, event.unit.col)
+
+    def _on_heal(self, event: Heal) -> None:
+        self._write_cell(event.unit.row, event.unit.col)
+
+    def _on_deploy(self, event: UnitDeployed) -> None:
+        self._write_cell(event.unit.row, event.unit.col)
+        self._hands_stale = True
+
+    def _on_hand(self, event) -> None:
+        self._hands_stale = True
+
+    def _on_restored(self, event) -> None:
+        self.rebuild()
+
+
 class GridsEnv(gym.Env):
-    """Gym-compatible environment wrapping :class:`GameState`."""
+    """Gym-compatible environment wrapping :class:`GameState`.
+
+    ``reset`` and ``step`` report the legal actions of the new state in
+    ``info["action_mask"]`` (see :meth:`valid_action_mask`).
+
+    Observations come from :class:`ObservationBuffers` that the game's
+    events keep up to date. By default every observation holds fresh copies
+    of the arrays; with ``copy_obs=False`` the env returns read-only views of
+    its buffers instead, valid until the next ``step`` or ``reset``.
+
+    With ``obs_mode="flat"`` observations are float32 vectors of length
+    ``FLAT_OBS_SIZE`` (see :func:`flatten_obs`), optionally written into the
+    caller's ``obs_buffer``. ``copy_obs=False`` then returns that buffer
+    itself, which ``torch.from_numpy`` can wrap without copying; it must
+    not be modified.
+
+    With ``record=True`` every game is recorded by a
+    :class:`recording.GameRecorder` kept in :attr:`recorder`, replaced on
+    each ``reset``; ``env.recorder.save(path)`` stores the current game.
+    """
 
     metadata = {"render_modes": ["human"]}
 
-    def __init__(self, render_mode=None, animate=False):
+    def __init__(self, render_mode=None, mask_buffer=None, copy_obs=True,
+                 obs_mode="dict", obs_buffer=None, record=False):
         super().__init__()
         self.render_mode = render_mode
-        self.animate = animate
+        self.copy_obs = copy_obs
+        self.record = record
+        self.recorder = None
+        if obs_mode == "dict":
+            self._obs_buffers = ObservationBuffers()
+        elif obs_mode == "flat":
+            if obs_buffer is None:
+                obs_buffer = np.zeros(FLAT_OBS_SIZE, dtype=np.float32)
+            self._obs_buffers = ObservationBuffers(obs_buffer)
+        else:
+            raise ValueError(f"unknown obs_mode {obs_mode!r}")
+        self.obs_mode = obs_mode
         self.state = GameState()
+        # preallocated legal-action mask, optionally a view into shared memory
+        if mask_buffer is None:
+            mask_buffer = np.zeros(ACTION_SIZE, dtype=bool)
+        self._action_mask = mask_buffer
         self.action_space = spaces.Tuple(
             (
                 spaces.Discrete(len(ActionType)),  # action type
-                spaces.Discrete(20),  # unit or hand index
+                spaces.Discrete(MAX_ACTION_INDEX),  # unit or hand index
                 spaces.Discrete(ROWS),
                 spaces.Discrete(COLUMNS),
             )
@@ -55,30 +364,30 @@ class GridsEnv(gym.Env):
                 "spell_hand": spaces.MultiDiscrete([len(SPELL_TYPES) + 1] * HAND_CAPACITY),
             }
         )
+        if obs_mode == "flat":
+            self.observation_space = spaces.Box(0, 500, (FLAT_OBS_SIZE,), dtype=np.float32)
+
+    @property
+    def state(self) -> GameState:
+        return self._state
+
+    @state.setter
+    def state(self, state: GameState) -> None:
+        self._state = state
+        self._obs_buffers.attach(state)
+        # a state assigned mid-game cannot be recorded from its start
+        self.recorder = None
 
     # ------------------------------------------------------------------
+    def refresh_obs(self) -> None:
+        """Resynchronize the observation after editing :attr:`state` directly."""
+        self._obs_buffers.rebuild()
+
     def _get_obs(self):
-        board_owner = np.zeros((ROWS, COLUMNS), dtype=np.int8)
-        board_health = np.zeros((ROWS, COLUMNS), dtype=np.int16)
-        for unit in self.state.units:
-            board_owner[unit.row, unit.col] = unit.owner
-            board_health[unit.row, unit.col] = unit.health
-        opponent = 2 if self.state.current_player == 1 else 1
-        unit_hand = np.zeros(HAND_CAPACITY, dtype=np.int8)
-        for i, unit_cls in enumerate(self.state.unit_hand[:HAND_CAPACITY]):
-            unit_hand[i] = UNIT_TYPE_TO_ID.get(unit_cls, 0)
-        spell_hand = np.zeros(HAND_CAPACITY, dtype=np.int8)
-        for i, card in enumerate(self.state.spell_hand[:HAND_CAPACITY]):
-            spell_hand[i] = SPELL_TYPE_TO_ID.get(card.__class__, 0)
-        return {
-            "current_player": self.state.current_player,
-            "action_points": self.state.current_action_points,
-            "board_owner": board_owner,
-            "board_health": board_health,
-            "opponent_hand": len(self.state.hands[opponent]),
-            "unit_hand": unit_hand,
-            "spell_hand": spell_hand,
-        }
+        if self.obs_mode == "flat":
+            flat = self._obs_buffers.flat_observation()
+            return flat.copy() if self.copy_obs else flat
+        return self._obs_buffers.observation(self.copy_obs)
 
     def _commander_health(self, player: int) -> int:
         """Return the current health of ``player``'s commander."""
@@ -88,11 +397,24 @@ class GridsEnv(gym.Env):
         return 0
 
     def reset(self, *, seed=None, options=None):
+        """Start a new game.
+
+        The game's RNG is seeded from :attr:`np_random`, so a ``seed`` makes
+        this and every later unseeded reset reproducible.
+        """
         super().reset(seed=seed)
-        self.state = GameState()
-        return self._get_obs(), {}
+        self.state = GameState(int(self.np_random.integers(2**63)))
+        if self.record:
+            self.recorder = GameRecorder(state=self.state)
+        return self._get_obs(), {"action_mask": self.valid_action_mask()}
 
+    @timed("env.step")
     def step(self, action):
+        obs, reward, terminated, truncated, info = self._step(action)
+        info["action_mask"] = self.valid_action_mask()
+        return obs, reward, terminated, truncated, info
+
+    def _step(self, action):
         info = {}
         action_type, idx, row, col = action
         action_type = ActionType(action_type)
@@ -100,68 +422,22 @@ class GridsEnv(gym.Env):
         opponent = 2 if self.state.current_player == 1 else 1
         pre_health = self._commander_health(opponent)
 
-        if action_type == ActionType.MOVE:
-            if idx >= len(self.state.units):
-                return self._get_obs(), -1.0, True, False, {}
-            unit = self.state.units[idx]
-            ok = self.state.move_unit(unit, row, col, animate=self.animate)
-            reward = 0.0 if ok else -1.0
-        elif action_type == ActionType.DEPLOY:
-            if idx >= len(self.state.unit_hand):
-                return self._get_obs(), -1.0, True, False, {}
-            unit_cls = self.state.unit_hand[idx]
-            if (row, col) not in self.state.get_valid_deploy_squares():
-                return self._get_obs(), -1.0, True, False, {}
-            unit = self.state.place_unit(unit_cls, row, col)
-            reward = 0.0 if unit else -1.0
-            if unit:
+        perform = self.recorder.perform if self.recorder else self.state.perform
+        ok, played = perform((action_type, idx, row, col))
+        if ok is None:
+            return self._get_obs(), -1.0, True, False, {}
+        reward = 0.0 if ok else -1.0
+        if ok:
+            if action_type == ActionType.DEPLOY:
                 reward += UNIT_DEPLOY_REWARD
-                info["deployed_unit"] = unit_cls.__name__
-        elif action_type == ActionType.PLAY_CARD:
-            if idx >= len(self.state.spell_hand):
-                return self._get_obs(), -1.0, True, False, {}
-            card = self.state.spell_hand[idx]
-            ok = self.state.play_card(card, (row, col))
-            reward = 0.0 if ok else -1.0
-            if ok:
+                info["deployed_unit"] = played.__name__
+            elif action_type == ActionType.PLAY_CARD:
                 reward += ITEM_USE_REWARD
-                info["used_spell"] = card.__class__.__name__
-        elif action_type == ActionType.ATTACK:
-            if idx >= len(self.state.units):
-                return self._get_obs(), -1.0, True, False, {}
-            attacker = self.state.units[idx]
-            target = next((u for u in self.state.units if u.row == row and u.col == col), None)
-            if target is None:
-                return self._get_obs(), -1.0, True, False, {}
-            ok = self.state.attack_unit(attacker, target)
-            reward = 0.0 if ok else -1.0
-            if ok:
+                info["used_spell"] = played.__class__.__name__
+            elif action_type == ActionType.ATTACK:
                 reward += ATTACK_REWARD
-        elif action_type == ActionType.DRAW_SPELL:
-            before = len(self.state.spell_hand)
-            ok = self.state.draw_cards(
-                self.state.spell_deck, self.state.current_player, num=1, ap_cost=1
-            )
-            reward = 0.0 if ok else -1.0
-            if ok and len(self.state.spell_hand) > before:
-                reward += DRAW_CARD_REWARD
-        elif action_type == ActionType.DRAW_UNIT:
-            before = len(self.state.unit_hand)
-            ok = self.state.draw_cards(
-                self.state.unit_deck, self.state.current_player, num=1, ap_cost=1
-            )
-            reward = 0.0 if ok else -1.0
-            if ok and len(self.state.unit_hand) > before:
+            elif action_type in (ActionType.DRAW_SPELL, ActionType.DRAW_UNIT):
                 reward += DRAW_CARD_REWARD
-        elif action_type == ActionType.END_TURN:
-            self.state.end_turn()
-            reward = 0.0
-        else:
-            # unsupported action type
-            return self._get_obs(), -1.0, True, False, {}
-
-        if self.state.current_action_points <= 0:
-            self.state.end_turn()
 
         post_health = self._commander_health(opponent)
         damage = max(0, pre_health - post_health)
@@ -172,52 +448,18 @@ class GridsEnv(gym.Env):
         truncated = False
         return self._get_obs(), reward, terminated, truncated, info
 
+    @timed("env.valid_action_mask")
+    def valid_action_mask(self) -> np.ndarray:
+        """Return the legal actions as a boolean array of length ``ACTION_SIZE``.
+
+        The same preallocated array is refilled on every call (including the
+        one made by ``step``), so copy it if it must outlive the next step.
+        """
+        return fill_action_mask(self.state, self._action_mask)
+
+    @timed("env.valid_actions")
     def valid_actions(self):
-        actions = []
-        player = self.state.current_player
-        for idx, unit in enumerate(self.state.units):
-            if unit.owner != player:
-                continue
-            for r, c in self.state.get_valid_move_squares(unit):
-                actions.append((ActionType.MOVE, idx, r, c))
-            for target in self.state.get_attackable_units(unit):
-                actions.append((ActionType.ATTACK, idx, target.row, target.col))
-        for idx, unit_cls in enumerate(self.state.unit_hands[player]):
-            for r, c in self.state.get_valid_deploy_squares(player):
-                actions.append((ActionType.DEPLOY, idx, r, c))
-        for idx, card in enumerate(self.state.spell_hands[player]):
-            target_cells = set()
-            for u in self.state.units:
-                for dr in (-1, 0, 1):
-                    for dc in (-1, 0, 1):
-                        r, c = u.row + dr, u.col + dc
-                        if 0 <= r < ROWS and 0 <= c < COLUMNS:
-                            target_cells.add((r, c))
-            for r, c in target_cells:
-                actions.append((ActionType.PLAY_CARD, idx, r, c))
-
-        # drawing cards costs 1 action point and is only available when
-        # the player has remaining AP and space in hand
-        if (
-            self.state.spell_decks[player]
-            and len(self.state.spell_hands[player]) < HAND_CAPACITY
-            and self.state.current_action_points > 0
-        ):
-            actions.append((ActionType.DRAW_SPELL, 0, 0, 0))
-        if (
-            self.state.unit_decks[player]
-            and len(self.state.unit_hands[player]) < HAND_CAPACITY
-            and self.state.current_action_points > 0
-        ):
-            actions.append((ActionType.DRAW_UNIT, 0, 0, 0))
-
-        # Only allow ending the turn early if no other actions are available or
-        # the player has exhausted their action points. This encourages the AI
-        # to use all actions each turn.
-        if not actions or self.state.current_action_points <= 0:
-            actions.append((ActionType.END_TURN, 0, 0, 0))
-
-        return actions
+        return self.state.legal_actions()
 
     def render(self):
         if self.render_mode == "human":
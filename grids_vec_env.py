@@ -0,0 +1,386 @@
+"""Vectorized wrappers stepping several :class:`GridsEnv` games in lockstep."""
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from gym import spaces
+
+from grids_env import GridsEnv, FLAT_OBS_SIZE
+from actions import ACTION_SIZE
+from constants import ROWS, COLUMNS, HAND_CAPACITY
+
+
+def buffer_spec(num_envs: int, obs_mode: str = "dict") -> dict:
+    """Return ``name -> (shape, dtype)`` for every per-step output array.
+
+    Observation entries mirror the keys of :meth:`GridsEnv._get_obs` with a
+    leading batch dimension, or with ``obs_mode="flat"`` form a single
+    ``(num_envs, FLAT_OBS_SIZE)`` float32 matrix named ``obs``. ``reward``,
+    ``terminated`` and ``truncated`` hold the remaining results of
+    :meth:`GridsVecEnv.step` and ``action_mask`` the legal actions of every
+    game.
+    """
+    if obs_mode == "flat":
+        spec = {"obs": ((num_envs, FLAT_OBS_SIZE), np.float32)}
+    elif obs_mode == "dict":
+        spec = {
+            "current_player": ((num_envs,), np.int8),
+            "action_points": ((num_envs,), np.int16),
+            "board_owner": ((num_envs, ROWS, COLUMNS), np.int8),
+            "board_health": ((num_envs, ROWS, COLUMNS), np.int16),
+            "opponent_hand": ((num_envs,), np.int8),
+            "unit_hand": ((num_envs, HAND_CAPACITY), np.int8),
+            "spell_hand": ((num_envs, HAND_CAPACITY), np.int8),
+        }
+    else:
+        raise ValueError(f"unknown obs_mode {obs_mode!r}")
+    return {
+        **spec,
+        "reward": ((num_envs,), np.float32),
+        "terminated": ((num_envs,), np.bool_),
+        "truncated": ((num_envs,), np.bool_),
+        "action_mask": ((num_envs, ACTION_SIZE), np.bool_),
+    }
+
+
+def allocate_buffers(num_envs: int, obs_mode: str = "dict") -> dict:
+    """Allocate zeroed arrays matching :func:`buffer_spec`."""
+    return {
+        name: np.zeros(shape, dtype=dtype)
+        for name, (shape, dtype) in buffer_spec(num_envs, obs_mode).items()
+    }
+
+
+def _buffer_layout(num_envs: int, obs_mode: str = "dict"):
+    """Return ``(layout, total_bytes)`` for packing all buffers in one block.
+
+    ``layout`` maps each buffer name to ``(offset, shape, dtype)``. Offsets
+    are aligned to 64 bytes so every array starts on its own cache line.
+    """
+    layout = {}
+    offset = 0
+    for name, (shape, dtype) in buffer_spec(num_envs, obs_mode).items():
+        layout[name] = (offset, shape, dtype)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset += (nbytes + 63) // 64 * 64
+    return layout, max(offset, 1)
+
+
+def _buffers_from_block(buf, layout) -> dict:
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        for name, (offset, shape, dtype) in layout.items()
+    }
+
+
+OBS_KEYS = (
+    "current_player",
+    "action_points",
+    "board_owner",
+    "board_health",
+    "opponent_hand",
+    "unit_hand",
+    "spell_hand",
+)
+
+
+def current_players(obs) -> np.ndarray:
+    """Return the player to move in each row of stacked observations."""
+    if isinstance(obs, np.ndarray):
+        return obs[:, 0].astype(np.int8)
+    return obs["current_player"]
+
+
+class GridsVecEnv:
+    """Step ``num_envs`` independent games with one call.
+
+    Observations are returned as a dict of stacked arrays (one row per game)
+    and ``step`` takes a batch of ``(action_type, index, row, col)`` actions.
+    Finished games are reset automatically; the last observation of the
+    finished episode is reported in ``infos[i]["final_observation"]`` and
+    episode totals in ``infos[i]["episode"]``. Legal-action masks for the
+    current observations are kept in :attr:`action_masks` rather than in the
+    per-game infos.
+
+    The returned arrays are reused between calls. Pass ``buffers`` (as
+    produced by :func:`allocate_buffers`) to have results written into
+    externally owned memory.
+
+    With ``obs_mode="flat"`` observations are one ``(num_envs,
+    FLAT_OBS_SIZE)`` float32 matrix whose rows the games' event handlers
+    update in place (see :class:`grids_env.ObservationBuffers`), and
+    ``final_observation`` entries are flat vectors.
+    """
+
+    def __init__(self, num_envs: int, max_episode_steps=None, buffers=None,
+                 obs_mode: str = "dict"):
+        self.num_envs = num_envs
+        self.max_episode_steps = max_episode_steps
+        self.obs_mode = obs_mode
+        if buffers is None:
+            buffers = allocate_buffers(num_envs, obs_mode)
+        self.buffers = buffers
+        if obs_mode == "flat":
+            self.obs = self.buffers["obs"]
+        else:
+            self.obs = {key: self.buffers[key] for key in OBS_KEYS}
+        self.rewards = self.buffers["reward"]
+        self.terminated = self.buffers["terminated"]
+        self.truncated = self.buffers["truncated"]
+        self.action_masks = self.buffers["action_mask"]
+
+        # each env fills its own row of the mask buffer in place
+        if obs_mode == "flat":
+            self.envs = [
+                GridsEnv(mask_buffer=self.action_masks[i], copy_obs=False,
+                         obs_mode="flat", obs_buffer=self.obs[i])
+                for i in range(num_envs)
+            ]
+        else:
+            self.envs = [GridsEnv(mask_buffer=self.action_masks[i]) for i in range(num_envs)]
+        self.single_observation_space = self.envs[0].observation_space
+        self.single_action_space = self.envs[0].action_space
+        self.action_space = spaces.Tuple([self.single_action_space] * num_envs)
+
+        self.episode_returns = np.zeros(num_envs, dtype=np.float64)
+        self.episode_lengths = np.zeros(num_envs, dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    def _write_obs(self, i: int, obs: dict) -> None:
+        if self.obs_mode == "flat":
+            return  # the env wrote its row already
+        for key in OBS_KEYS:
+            self.obs[key][i] = obs[key]
+
+    def reset(self, *, seed=None, options=None):
+        infos = []
+        for i, env in enumerate(self.envs):
+            env_seed = None if seed is None else seed + i
+            obs, info = env.reset(seed=env_seed, options=options)
+            info.pop("action_mask", None)
+            self._write_obs(i, obs)
+            infos.append(info)
+        self.episode_returns[:] = 0.0
+        self.episode_lengths[:] = 0
+        self.rewards[:] = 0.0
+        self.terminated[:] = False
+        self.truncated[:] = False
+        return self.obs, infos
+
+    def step(self, actions):
+        """Apply one action per game and return stacked results.
+
+        ``actions`` may be a sequence of tuples or an integer array of shape
+        ``(num_envs, 4)``.
+        """
+        infos = []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            action_type, idx, row, col = (int(a) for a in action)
+            obs, reward, term, trunc, info = env.step((action_type, idx, row, col))
+            info.pop("action_mask", None)
+            self.episode_returns[i] += reward
+            self.episode_lengths[i] += 1
+            if (
+                not term
+                and self.max_episode_steps is not None
+                and self.episode_lengths[i] >= self.max_episode_steps
+            ):
+                trunc = True
+            self.rewards[i] = reward
+            self.terminated[i] = term
+            self.truncated[i] = trunc
+            if term or trunc:
+                # a flat ``obs`` is this game's row, which reset overwrites
+                info["final_observation"] = obs.copy() if self.obs_mode == "flat" else obs
+                info["episode"] = {
+                    "r": float(self.episode_returns[i]),
+                    "l": int(self.episode_lengths[i]),
+                    "winner": env.state.winner,
+                }
+                self.episode_returns[i] = 0.0
+                self.episode_lengths[i] = 0
+                obs, _ = env.reset()
+            self._write_obs(i, obs)
+            infos.append(info)
+        return self.obs, self.rewards, self.terminated, self.truncated, infos
+
+    def valid_actions(self):
+        """Return the list of valid actions for every game."""
+        return [env.valid_actions() for env in self.envs]
+
+    @property
+    def current_players(self) -> np.ndarray:
+        return current_players(self.obs)
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
+def _subproc_worker(remote, parent_remote, shm_name, num_envs, start, count,
+                    max_episode_steps, obs_mode):
+    """Run ``count`` games writing results into rows ``start:start + count``."""
+    parent_remote.close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    layout, _ = _buffer_layout(num_envs, obs_mode)
+    buffers = {
+        name: array[start:start + count]
+        for name, array in _buffers_from_block(shm.buf, layout).items()
+    }
+    vec_env = GridsVecEnv(count, max_episode_steps=max_episode_steps, buffers=buffers,
+                          obs_mode=obs_mode)
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                _, _, _, _, infos = vec_env.step(data)
+                remote.send(infos)
+            elif cmd == "reset":
+                _, infos = vec_env.reset(seed=data)
+                remote.send(infos)
+            elif cmd == "valid_actions":
+                remote.send(vec_env.valid_actions())
+            elif cmd == "close":
+                break
+            else:
+                raise ValueError(f"unknown command {cmd!r}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        vec_env.close()
+        del vec_env, buffers
+        shm.close()
+        remote.close()
+
+
+class SubprocGridsVecEnv:
+    """Multi-process counterpart of :class:`GridsVecEnv`.
+
+    ``num_envs`` games are split across ``num_workers`` processes. Each
+    worker owns a :class:`GridsVecEnv` whose output arrays are rows of one
+    shared-memory block, so observations, rewards and done flags are written
+    in place and never pickled. Pipes only carry the ``(n, 4)`` action
+    arrays and the per-game ``info`` dicts.
+
+    The API matches :class:`GridsVecEnv`; call :meth:`close` (or use the
+    instance as a context manager) to stop the workers and release the
+    shared memory.
+    """
+
+    def __init__(self, num_envs: int, num_workers: int, max_episode_steps=None,
+                 start_method=None, obs_mode: str = "dict"):
+        if not 0 < num_workers <= num_envs:
+            raise ValueError("num_workers must be between 1 and num_envs")
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.max_episode_steps = max_episode_steps
+        self.obs_mode = obs_mode
+
+        layout, nbytes = _buffer_layout(num_envs, obs_mode)
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.buffers = _buffers_from_block(self._shm.buf, layout)
+        for array in self.buffers.values():
+            array.fill(0)
+        if obs_mode == "flat":
+            self.obs = self.buffers["obs"]
+        else:
+            self.obs = {key: self.buffers[key] for key in OBS_KEYS}
+        self.rewards = self.buffers["reward"]
+        self.terminated = self.buffers["terminated"]
+        self.truncated = self.buffers["truncated"]
+        self.action_masks = self.buffers["action_mask"]
+
+        template = GridsEnv(obs_mode=obs_mode)
+        self.single_observation_space = template.observation_space
+        self.single_action_space = template.action_space
+        self.action_space = spaces.Tuple([self.single_action_space] * num_envs)
+
+        sizes = [len(chunk) for chunk in np.array_split(np.arange(num_envs), num_workers)]
+        self._slices = []
+        ctx = mp.get_context(start_method)
+        self.remotes, self.processes = [], []
+        start = 0
+        for count in sizes:
+            remote, work_remote = ctx.Pipe()
+            process = ctx.Process(
+                target=_subproc_worker,
+                args=(work_remote, remote, self._shm.name, num_envs, start, count,
+                      max_episode_steps, obs_mode),
+                daemon=True,
+            )
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+            self._slices.append(slice(start, start + count))
+            start += count
+        self.closed = False
+
+    # ------------------------------------------------------------------
+    def reset(self, *, seed=None, options=None):
+        for remote, chunk in zip(self.remotes, self._slices):
+            remote.send(("reset", None if seed is None else seed + chunk.start))
+        infos = []
+        for remote in self.remotes:
+            infos.extend(remote.recv())
+        return self.obs, infos
+
+    def step_async(self, actions) -> None:
+        actions = np.asarray(actions, dtype=np.int16).reshape(self.num_envs, 4)
+        for remote, chunk in zip(self.remotes, self._slices):
+            remote.send(("step", actions[chunk]))
+
+    def step_wait(self):
+        infos = []
+        for remote in self.remotes:
+            infos.extend(remote.recv())
+        return self.obs, self.rewards, self.terminated, self.truncated, infos
+
+    def step(self, actions):
+        """Apply one action per game and return the shared result arrays."""
+        self.step_async(actions)
+        return self.step_wait()
+
+    def valid_actions(self):
+        for remote in self.remotes:
+            remote.send(("valid_actions", None))
+        actions = []
+        for remote in self.remotes:
+            actions.extend(remote.recv())
+        return actions
+
+    @property
+    def current_players(self) -> np.ndarray:
+        return current_players(self.obs)
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            try:
+                remote.send(("close", None))
+            except (BrokenPipeError, EOFError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for remote in self.remotes:
+            remote.close()
+        # drop our views before releasing the block
+        self.obs = self.buffers = self.rewards = None
+        self.terminated = self.truncated = self.action_masks = None
+        self._shm.close()
+        self._shm.unlink()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
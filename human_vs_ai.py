@@ -1,16 +1,18 @@
+import os
 import time
 import arcade
 from game import GridsGame
 from grids_env import GridsEnv
 from agents import RandomAgent
 from dqn_agent import DQNAgent
+from mcts_agent import MCTSAgent
 
 
 class HumanVsAI(GridsGame):
     """Play against an AI opponent using the regular GUI."""
 
     def __init__(self, agent, ai_player: int = 2, step_delay: float = 0.5):
-        self.env = GridsEnv(animate=True)
+        self.env = GridsEnv()
         self.agent = agent
         if hasattr(self.agent, "env"):
             self.agent.env = self.env
@@ -52,11 +54,15 @@ class HumanVsAI(GridsGame):
         self.last_step = time.time()
 
 
-def main():
-    # Use the trained model when available.
-    agent = DQNAgent(GridsEnv())
-    agent.load("dqn_model.pth")
-    agent.epsilon = 0.0
+def main(model_path="dqn_model.pth", time_limit=1.0):
+    # Search with a fixed time budget per action, guided by the trained
+    # Q-network when available.
+    network = None
+    if os.path.exists(model_path):
+        dqn = DQNAgent(GridsEnv())
+        dqn.load(model_path)
+        network = dqn.policy_net
+    agent = MCTSAgent(network=network, simulations=None, time_limit=time_limit)
     window = HumanVsAI(agent)
     arcade.run()
 
@@ -0,0 +1,208 @@
+"""Shared, batched policy inference for many concurrent games.
+
+:class:`InferenceServer` owns one Q-network and a worker thread. Callers
+submit an observation and its legal-action mask from any thread and receive
+a :class:`concurrent.futures.Future`; the worker gathers pending requests
+into one batch until ``max_batch_size`` is reached or the oldest request has
+waited ``max_latency`` seconds, evaluates them with a single forward pass and
+resolves every future with its greedy legal action.
+
+:class:`InferenceClientAgent` exposes the server through the usual
+``select_action`` interface, so GUI sessions such as ``AIVsAI`` and
+evaluation games can share one model.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from actions import index_to_action
+from dqn_agent import legal_argmax, obs_to_tensor
+from grids_env import GridsEnv
+
+_STOP = object()
+
+
+class InferenceServer:
+    """Evaluate greedy masked actions for many callers in dynamic batches."""
+
+    def __init__(self, network: nn.Module, max_batch_size: int = 64,
+                 max_latency: float = 0.005):
+        self.network = network
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._requests = queue.SimpleQueue()
+        self._thread = None
+        # guards ``_dead`` so no request is queued after the final drain
+        self._lock = threading.Lock()
+        self._dead = False
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+
+    # ------------------------------------------------------------------
+    def start(self) -> "InferenceServer":
+        if self._thread is None:
+            self._dead = False
+            self._thread = threading.Thread(target=self._serve, daemon=True,
+                                            name="inference-server")
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the worker once the requests already queued are answered."""
+        if self._thread is not None:
+            self._requests.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    # ------------------------------------------------------------------
+    def submit(self, obs: dict, mask: np.ndarray) -> Future:
+        """Queue one request and return a future for its action.
+
+        The observation and mask are converted immediately, so the caller
+        may reuse its buffers (e.g. :meth:`GridsEnv.valid_action_mask`) as
+        soon as this returns. Cancelling the future drops the request.
+        Raises :class:`RuntimeError` once the worker thread has stopped.
+        """
+        if self._thread is None:
+            raise RuntimeError("InferenceServer is not running; call start()")
+        future = Future()
+        request = (obs_to_tensor(obs), torch.tensor(mask, dtype=torch.bool), future)
+        with self._lock:
+            if self._dead:
+                raise RuntimeError("InferenceServer worker thread has stopped")
+            self._requests.put(request)
+        return future
+
+    def infer(self, obs: dict, mask: np.ndarray) -> Tuple[int, int, int, int]:
+        """Blocking form of :meth:`submit`."""
+        return self.submit(obs, mask).result()
+
+    # ------------------------------------------------------------------
+    def _serve(self) -> None:
+        try:
+            self._serve_batches()
+        finally:
+            # fail whatever is still queued so no caller waits forever
+            with self._lock:
+                self._dead = True
+            while True:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is not _STOP and request[2].set_running_or_notify_cancel():
+                    request[2].set_exception(RuntimeError("InferenceServer stopped"))
+
+    def _serve_batches(self) -> None:
+        stopping = False
+        while not stopping:
+            request = self._requests.get()
+            if request is _STOP:
+                break
+            batch = [request]
+            deadline = time.perf_counter() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                # after the deadline only requests that are already queued join
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout > 0:
+                        request = self._requests.get(timeout=timeout)
+                    else:
+                        request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                batch.append(request)
+            try:
+                self._evaluate(batch)
+            except BaseException as exc:
+                # an error that escaped one batch fails only that batch
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"InferenceServer failed: {exc!r}"))
+                if not isinstance(exc, Exception):
+                    raise
+
+    def _evaluate(self, batch) -> None:
+        # callers may have cancelled their futures while they were queued
+        batch = [request for request in batch if request[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        states, masks, futures = zip(*batch)
+        try:
+            with torch.no_grad():
+                indices = legal_argmax(self.network(torch.stack(states)),
+                                       torch.stack(masks)).tolist()
+        except Exception as exc:  # hand the failure to every waiting caller
+            for future in futures:
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for future, index in zip(futures, indices):
+            future.set_result(index_to_action(index))
+
+
+class InferenceClientAgent:
+    """Agent that asks an :class:`InferenceServer` for its actions."""
+
+    def __init__(self, server: InferenceServer, env: Optional[GridsEnv] = None):
+        self.server = server
+        self.env = env
+
+    def select_action(self, obs: dict, mask: Optional[np.ndarray] = None
+                      ) -> Tuple[int, int, int, int]:
+        if mask is None:
+            mask = self.env.valid_action_mask()
+        return self.server.infer(obs, mask)
+
+    def act(self, env: GridsEnv) -> Tuple[int, int, int, int]:
+        return self.server.infer(env._get_obs(), env.valid_action_mask())
+
+
+def play_games(server: InferenceServer, num_games: int, max_steps: int = 200):
+    """Play ``num_games`` self-play games concurrently against one server.
+
+    Every game runs in its own thread with an :class:`InferenceClientAgent`
+    for both players. Returns the winner of each game (``None`` for games
+    that hit ``max_steps``).
+    """
+    winners = [None] * num_games
+
+    def play(i):
+        env = GridsEnv()
+        obs, info = env.reset()
+        agent = InferenceClientAgent(server, env)
+        for _ in range(max_steps):
+            obs, _, term, trunc, info = env.step(agent.select_action(obs, info["action_mask"]))
+            if term or trunc:
+                break
+        winners[i] = env.state.winner
+
+    threads = [threading.Thread(target=play, args=(i,)) for i in range(num_games)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return winners
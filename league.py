@@ -0,0 +1,293 @@
+"""Round-robin league between saved DQN checkpoints and ``RandomAgent``.
+
+Every ``*.pth`` file in a directory (as written by :meth:`DQNAgent.save`)
+joins the league together with ``random``. Each pair of players meets once
+per seed in a *pairing*: two headless games on the same seeded start, with
+the seats swapped for the second one. Pairings run on a process pool and
+their results are cached in a JSON file keyed by the pair and the seed.
+Players are identified by their file name and a digest of the weights, so
+adding a checkpoint (or retraining one) only plays the pairings it is part
+of.
+
+Ratings are Elo values fitted to all games at once by maximum likelihood
+(a Bradley-Terry model, draws counting half) and reported with a 95%
+confidence interval relative to ``random``, which is pinned at 0.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import torch
+
+from agents import RandomAgent
+from dqn_agent import DQNAgent
+from grids_env import GridsEnv
+
+RANDOM = "random"
+CACHE_VERSION = 1
+# Games still running after this many actions are scored as draws.
+MAX_PLIES = 1000
+# Curvature added to the log-likelihood so that unbeaten (or winless)
+# players keep finite ratings; about one virtual draw against the average.
+PRIOR_STRENGTH = 0.25
+ELO_SCALE = 400 / math.log(10)
+
+
+class Player(NamedTuple):
+    """A league entrant; ``path`` is ``None`` for ``RandomAgent``."""
+
+    name: str
+    id: str
+    path: Optional[str]
+
+
+class Rating(NamedTuple):
+    elo: float
+    low: float
+    high: float
+    games: int
+    score: float  # points per game, draws counting half
+
+
+def discover_players(directory: str) -> List[Player]:
+    """Return ``random`` followed by every checkpoint in ``directory``."""
+    players = [Player(RANDOM, RANDOM, None)]
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".pth"):
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:10]
+        name = filename[:-len(".pth")]
+        players.append(Player(name, f"{name}@{digest}", path))
+    return players
+
+
+def pairing_key(id_a: str, id_b: str, seed: int) -> str:
+    return f"{id_a}|{id_b}|{seed}"
+
+
+def schedule(players: List[Player], seeds: Iterable[int]) -> List[Tuple[Player, Player, int]]:
+    """Return every ``(a, b, seed)`` pairing of the round robin."""
+    return [(a, b, seed) for a, b in combinations(players, 2) for seed in seeds]
+
+
+# ----------------------------------------------------------------------
+# games (run inside the pool workers)
+
+_agents = {}
+
+
+def _init_worker() -> None:
+    torch.set_num_threads(1)
+
+
+def _load_agent(path: str) -> DQNAgent:
+    """Return a greedy :class:`DQNAgent` for the checkpoint at ``path``."""
+    agent = _agents.get(path)
+    if agent is None:
+        state_dict = torch.load(path, map_location="cpu")
+        network = "branching" if "heads.0.weight" in state_dict else "dense"
+        agent = DQNAgent(GridsEnv(), buffer_size=1, epsilon_start=0.0,
+                         epsilon_end=0.0, network=network)
+        agent.policy_net.load_state_dict(state_dict)
+        agent.policy_net.eval()
+        _agents[path] = agent
+    return agent
+
+
+def play_game(path1: Optional[str], path2: Optional[str], seed: int,
+              max_plies: int = MAX_PLIES) -> Optional[int]:
+    """Play one game between two checkpoints (``None`` plays randomly).
+
+    Returns the winning seat, or ``None`` for a draw.
+    """
+    env = GridsEnv(obs_mode="flat", copy_obs=False)
+    obs, info = env.reset(seed=seed)
+    players = {
+        seat: RandomAgent(random.Random(seed)) if path is None else _load_agent(path)
+        for seat, path in ((1, path1), (2, path2))
+    }
+    for _ in range(max_plies):
+        agent = players[env.state.current_player]
+        if isinstance(agent, RandomAgent):
+            action = agent.act(env)
+        else:
+            action = agent.select_action(obs, info["action_mask"])
+        obs, _, terminated, _, info = env.step(action)
+        if terminated:
+            break
+    return env.state.winner
+
+
+def play_pairing(path_a: Optional[str], path_b: Optional[str], seed: int,
+                 max_plies: int = MAX_PLIES) -> List[Optional[int]]:
+    """Play ``a`` against ``b`` on ``seed`` with both seatings.
+
+    Returns the winning seat of the game with ``a`` moving first and of the
+    mirrored game.
+    """
+    return [play_game(path_a, path_b, seed, max_plies),
+            play_game(path_b, path_a, seed, max_plies)]
+
+
+# ----------------------------------------------------------------------
+# results
+
+def load_cache(path: str) -> Dict[str, List[Optional[int]]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        cache = json.load(f)
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache["pairings"]
+
+
+def save_cache(path: str, pairings: Dict[str, List[Optional[int]]]) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump({"version": CACHE_VERSION, "pairings": pairings}, f, indent=0)
+    os.replace(path + ".tmp", path)
+
+
+def pairing_scores(winners: List[Optional[int]]) -> List[float]:
+    """Return the first player's score in each game of a pairing."""
+    first, mirrored = winners
+    return [
+        0.5 if first is None else float(first == 1),
+        0.5 if mirrored is None else float(mirrored == 2),
+    ]
+
+
+def fit_elo(names: List[str], games: List[Tuple[int, int, float]],
+            anchor: Optional[int] = 0, prior: float = PRIOR_STRENGTH) -> List[Rating]:
+    """Fit Elo ratings to ``games`` of ``(i, j, score of i)``.
+
+    Ratings maximize the Bradley-Terry likelihood of all games plus a
+    Gaussian prior of strength ``prior``. With ``anchor`` that player is
+    shifted to 0 and intervals are for the difference to it; otherwise the
+    ratings are centred on 0.
+    """
+    n = len(names)
+    i = np.array([g[0] for g in games], dtype=np.int64)
+    j = np.array([g[1] for g in games], dtype=np.int64)
+    s = np.array([g[2] for g in games], dtype=np.float64)
+    theta = np.zeros(n)
+    for _ in range(100):
+        p = 1.0 / (1.0 + np.exp(theta[j] - theta[i]))
+        grad = -prior * theta
+        np.add.at(grad, i, s - p)
+        np.add.at(grad, j, p - s)
+        w = p * (1.0 - p)
+        hess = prior * np.eye(n)
+        np.add.at(hess, (i, i), w)
+        np.add.at(hess, (j, j), w)
+        np.add.at(hess, (i, j), -w)
+        np.add.at(hess, (j, i), -w)
+        step = np.linalg.solve(hess, grad)
+        theta += step
+        if np.abs(step).max() < 1e-9:
+            break
+    cov = np.linalg.inv(hess)
+    if anchor is None:
+        centre = theta.mean()
+        var = np.diag(cov)
+    else:
+        centre = theta[anchor]
+        var = np.diag(cov) + cov[anchor, anchor] - 2 * cov[:, anchor]
+    half = 1.96 * np.sqrt(np.maximum(var, 0.0)) * ELO_SCALE
+
+    counts = np.bincount(i, minlength=n) + np.bincount(j, minlength=n)
+    points = np.bincount(i, s, minlength=n) + np.bincount(j, 1.0 - s, minlength=n)
+    ratings = []
+    for k in range(n):
+        elo = (theta[k] - centre) * ELO_SCALE
+        score = points[k] / counts[k] if counts[k] else 0.0
+        ratings.append(Rating(elo, elo - half[k], elo + half[k], int(counts[k]), score))
+    return ratings
+
+
+# ----------------------------------------------------------------------
+def run_league(directory: str, seeds: Iterable[int] = range(4), num_workers: int = 0,
+               cache_path: Optional[str] = None, max_plies: int = MAX_PLIES,
+               start_method=None) -> Dict[str, Rating]:
+    """Play all uncached pairings of the league in ``directory`` and rate it.
+
+    With ``num_workers`` > 0 pairings are spread over that many processes.
+    The cache defaults to ``league.json`` in ``directory`` and is updated
+    after every finished pairing, so an interrupted run loses little.
+    Returns the ratings by player name.
+    """
+    players = discover_players(directory)
+    seeds = list(seeds)
+    if cache_path is None:
+        cache_path = os.path.join(directory, "league.json")
+    pairings = load_cache(cache_path)
+    todo = [
+        (a, b, seed) for a, b, seed in schedule(players, seeds)
+        if pairing_key(a.id, b.id, seed) not in pairings
+    ]
+
+    def record(a, b, seed, winners):
+        pairings[pairing_key(a.id, b.id, seed)] = winners
+        save_cache(cache_path, pairings)
+
+    if num_workers and todo:
+        ctx = mp.get_context(start_method)
+        with ProcessPoolExecutor(num_workers, mp_context=ctx,
+                                 initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(play_pairing, a.path, b.path, seed, max_plies): (a, b, seed)
+                for a, b, seed in todo
+            }
+            for future in as_completed(futures):
+                record(*futures[future], future.result())
+    else:
+        for a, b, seed in todo:
+            record(a, b, seed, play_pairing(a.path, b.path, seed, max_plies))
+
+    index = {player.id: k for k, player in enumerate(players)}
+    games = []
+    for a, b, seed in schedule(players, seeds):
+        for score in pairing_scores(pairings[pairing_key(a.id, b.id, seed)]):
+            games.append((index[a.id], index[b.id], score))
+    ratings = fit_elo([p.name for p in players], games)
+    return {player.name: rating for player, rating in zip(players, ratings)}
+
+
+def format_table(ratings: Dict[str, Rating]) -> str:
+    lines = [f"{'player':<24} {'elo':>7} {'95% CI':>17} {'games':>6} {'score':>6}"]
+    for name, r in sorted(ratings.items(), key=lambda item: -item[1].elo):
+        ci = f"[{r.low:.0f}, {r.high:.0f}]"
+        lines.append(f"{name:<24} {r.elo:>7.0f} {ci:>17} {r.games:>6} {r.score:>6.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Rate saved Grids checkpoints in a round-robin league.")
+    parser.add_argument("directory", help="directory of dqn_model.pth-style checkpoints")
+    parser.add_argument("--seeds", type=int, default=4,
+                        help="mirrored pairings per pair of players")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes playing games (0 plays in this process)")
+    parser.add_argument("--cache", help="results cache (default: DIRECTORY/league.json)")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES,
+                        help="actions after which a game is scored as a draw")
+    args = parser.parse_args(argv)
+    ratings = run_league(args.directory, range(args.seeds), num_workers=args.workers,
+                         cache_path=args.cache, max_plies=args.max_plies)
+    print(format_table(ratings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Monte Carlo tree search agent for the Grids environment.
+
+The search runs on a clone of the environment's state and walks the tree
+in place with :meth:`GameState.apply`/:meth:`GameState.undo`. Leaves reached
+by several simulations are evaluated together: each simulation applies a
+virtual loss along its path so the next one explores elsewhere, and the
+leaves collected this way are scored with a single forward pass.
+"""
+
+import math
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from actions import action_to_index
+from dqn_agent import QNetwork, joint_q, obs_to_tensor
+from grids_env import GridsEnv, observe
+
+# Weight of commander health relative to other units in the heuristic value,
+# and the material difference that maps to a value of tanh(1).
+COMMANDER_WEIGHT = 3
+VALUE_SCALE = 300.0
+
+
+def evaluate_material(state) -> float:
+    """Return a value in ``[-1, 1]`` for ``state`` from player 1's view.
+
+    Used for leaf evaluation when no value network is available.
+    """
+    if state.winner is not None:
+        return 1.0 if state.winner == 1 else -1.0
+    score = 0
+    for unit in state.units:
+        weight = COMMANDER_WEIGHT if unit.unit_type == "Commander" else 1
+        score += unit.health * weight if unit.owner == 1 else -unit.health * weight
+    return math.tanh(score / VALUE_SCALE)
+
+
+class PolicyValueNet(QNetwork):
+    """:class:`QNetwork` with an extra value head.
+
+    ``forward`` returns ``(policy_logits, value)`` where ``value`` lies in
+    ``[-1, 1]`` and is seen from the player to move.
+    """
+
+    def __init__(self, obs_size: int, action_size: int):
+        super().__init__(obs_size, action_size)
+        self.value = nn.Linear(self.fc2.out_features, 1)
+
+    def forward(self, x: torch.Tensor):
+        x = F.relu(self.fc1(x))
+        x = F.relu(self.fc2(x))
+        return self.out(x), torch.tanh(self.value(x)).squeeze(-1)
+
+
+class _Node:
+    """Search tree node.
+
+    Edge statistics live in the parent: ``visits[i]`` and ``values[i]`` are
+    the visit count and summed value of ``actions[i]``, the latter seen from
+    ``player``, who is to move here. ``actions`` is ``None`` until the node
+    has been evaluated; ``terminal`` holds the player-1 value of finished
+    games.
+    """
+
+    __slots__ = ("player", "actions", "priors", "visits", "values", "children", "terminal")
+
+    def __init__(self, player):
+        self.player = player
+        self.actions = None
+        self.priors = None
+        self.visits = None
+        self.values = None
+        self.children = None
+        self.terminal = None
+
+    def expand(self, actions, priors):
+        self.actions = actions
+        self.priors = priors
+        self.visits = np.zeros(len(actions), dtype=np.float64)
+        self.values = np.zeros(len(actions), dtype=np.float64)
+        self.children = [None] * len(actions)
+
+
+class MCTSAgent:
+    """PUCT tree search over :meth:`GridsEnv.valid_actions`.
+
+    ``network`` may be a :class:`PolicyValueNet`, whose policy head gives the
+    move priors and value head the leaf values, or a plain Q-network
+    (:class:`QNetwork` or :class:`BranchingQNetwork`), whose Q-values are
+    turned into priors with a softmax while leaves are scored with
+    :func:`evaluate_material`. Without a network priors are uniform.
+
+    Each move runs ``simulations`` simulations or stops after
+    ``time_limit`` seconds, whichever comes first (at least one must be
+    set). ``batch_size`` leaves are collected with virtual loss before each
+    forward pass.
+    """
+
+    def __init__(self, network: Optional[nn.Module] = None,
+                 simulations: Optional[int] = 400,
+                 time_limit: Optional[float] = None, batch_size: int = 16,
+                 c_puct: float = 1.5, virtual_loss: float = 1.0,
+                 temperature: float = 1.0):
+        if simulations is None and time_limit is None:
+            raise ValueError("set simulations, time_limit or both")
+        self.network = network
+        self.simulations = simulations
+        self.time_limit = time_limit
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        # softmax temperature applied to Q-values of a plain QNetwork
+        self.temperature = temperature
+        self.last_search = {}
+
+    # ------------------------------------------------------------------
+    def act(self, env: GridsEnv) -> Tuple[int, int, int, int]:
+        """Search from ``env``'s state and return the most visited action."""
+        return self.search(env.state)
+
+    def search(self, state) -> Tuple[int, int, int, int]:
+        start = time.perf_counter()
+        deadline = None if self.time_limit is None else start + self.time_limit
+        state = state.clone()
+        root = _Node(state.current_player)
+        self._evaluate([self._leaf(state, root)])
+        simulations = batches = 0
+        while len(root.actions) > 1:
+            if self.simulations is not None and simulations >= self.simulations:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            count = self.batch_size
+            if self.simulations is not None:
+                count = min(count, self.simulations - simulations)
+            self._run_batch(state, root, count)
+            simulations += count
+            batches += 1
+        self.last_search = {
+            "simulations": simulations,
+            "batches": batches,
+            "seconds": time.perf_counter() - start,
+            "root_visits": root.visits.copy(),
+        }
+        return root.actions[int(np.argmax(root.visits))]
+
+    # ------------------------------------------------------------------
+    def _select(self, node: _Node) -> int:
+        visits = node.visits
+        q = np.divide(node.values, visits, out=np.zeros_like(visits), where=visits > 0)
+        u = self.c_puct * node.priors * math.sqrt(visits.sum() + 1) / (1 + visits)
+        return int(np.argmax(q + u))
+
+    def _leaf(self, state, node: _Node, paths=None):
+        """Capture what evaluating ``node`` needs before ``state`` moves on."""
+        obs = observe(state) if self.network is not None else None
+        return [node, [] if paths is None else paths, state.legal_actions(), obs,
+                evaluate_material(state)]
+
+    def _run_batch(self, state, root: _Node, count: int) -> None:
+        pending = {}
+        for _ in range(count):
+            node = root
+            path = []
+            records = []
+            while node.actions is not None and node.terminal is None:
+                i = self._select(node)
+                path.append((node, i))
+                node.visits[i] += self.virtual_loss
+                node.values[i] -= self.virtual_loss
+                records.append(state.apply(node.actions[i]))
+                child = node.children[i]
+                if child is None:
+                    child = node.children[i] = _Node(state.current_player)
+                    if state.winner is not None:
+                        child.terminal = 1.0 if state.winner == 1 else -1.0
+                node = child
+            if node.terminal is not None:
+                self._backup(path, node.terminal)
+            elif id(node) in pending:
+                # another simulation already waits on this leaf
+                pending[id(node)][1].append(path)
+            else:
+                pending[id(node)] = self._leaf(state, node, [path])
+            for record in reversed(records):
+                state.undo(record)
+        if pending:
+            self._evaluate(list(pending.values()))
+
+    def _evaluate(self, leaves) -> None:
+        """Expand ``[node, paths, actions, obs, material]`` leaves.
+
+        All leaves share one forward pass; their values are then backed up
+        along every waiting path.
+        """
+        logits = values = None
+        if self.network is not None:
+            batch = torch.stack([obs_to_tensor(leaf[3]) for leaf in leaves])
+            with torch.no_grad():
+                output = self.network(batch)
+            if isinstance(self.network, PolicyValueNet):
+                logits, values = output[0].numpy(), output[1].tolist()
+            else:
+                logits = (joint_q(output) / self.temperature).numpy()
+        for k, (node, paths, actions, _, material) in enumerate(leaves):
+            if logits is None:
+                priors = np.full(len(actions), 1.0 / len(actions))
+            else:
+                scores = logits[k, [action_to_index(a) for a in actions]]
+                priors = np.exp(scores - scores.max())
+                priors /= priors.sum()
+            node.expand(actions, priors)
+            if values is None:
+                value = material
+            else:
+                # network values are seen from the player to move
+                value = values[k] if node.player == 1 else -values[k]
+            for path in paths:
+                self._backup(path, value)
+
+    def _backup(self, path, value: float) -> None:
+        """Add player-1 ``value`` along ``path`` and remove its virtual loss."""
+        for node, i in path:
+            node.visits[i] += 1 - self.virtual_loss
+            node.values[i] += self.virtual_loss + (value if node.player == 1 else -value)
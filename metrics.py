@@ -0,0 +1,338 @@
+"""Counters, latency histograms and timed spans for the hot paths.
+
+Instrumented code reports into the process-wide :data:`registry`, which is
+disabled by default. Functions wrapped with :func:`timed` then cost a single
+attribute check per call, and other reporting sites guard with
+``if metrics.registry:`` as event emitters do with their bus. Enable it with
+:func:`enable` or by setting the ``GRIDS_METRICS`` environment variable to a
+directory before starting Python; every process (actors and env workers
+included) then records spans with their start times and writes its results
+to that directory when it exits. Forked :mod:`multiprocessing`
+children leave through ``os._exit``, which skips :mod:`atexit`, so they
+dump from a :class:`multiprocessing.util.Finalize` registered when the
+child starts instead.
+
+Histograms bucket values logarithmically, eight buckets per power of two, so
+percentiles are within about 9% and memory stays constant however many
+values are recorded. Span durations are in nanoseconds.
+
+:meth:`Registry.dump` writes ``metrics-<pid>.jsonl`` (one counter or
+histogram per line) and ``trace-<pid>.json`` in the Chrome trace-event
+format. ``python -m metrics DIR`` merges the files of all processes, prints
+the histogram percentiles and with ``--trace out.json`` writes one trace for
+``chrome://tracing`` or Perfetto. Timestamps come from
+:func:`time.perf_counter_ns`, the system-wide monotonic clock on Linux, so
+spans of different processes line up.
+"""
+
+import argparse
+import atexit
+import functools
+import glob
+import json
+import math
+import multiprocessing as mp
+import multiprocessing.util
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+ENV_VAR = "GRIDS_METRICS"
+BUCKETS_PER_OCTAVE = 8
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """Count, sum, extremes and log-spaced buckets of recorded values."""
+
+    __slots__ = ("unit", "count", "total", "min", "max", "buckets")
+
+    def __init__(self, unit: Optional[str] = None):
+        self.unit = unit
+        self.count = 0
+        self.total = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets: Dict[int, int] = {}
+
+    def record(self, value) -> None:
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        index = int(math.log2(value) * BUCKETS_PER_OCTAVE) if value >= 1 else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Return the upper bound of the bucket holding quantile ``q``."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                bound = 2.0 ** ((index + 1) / BUCKETS_PER_OCTAVE)
+                return float(min(max(bound, self.min), self.max))
+        return float(self.max)
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def to_dict(self) -> dict:
+        data = {"unit": self.unit, "count": self.count, "sum": self.total,
+                "min": self.min, "max": self.max, "mean": self.mean}
+        for q in PERCENTILES:
+            data[f"p{q * 100:g}"] = self.percentile(q)
+        data["buckets"] = {str(index): count for index, count in sorted(self.buckets.items())}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls(data.get("unit"))
+        histogram.count = data["count"]
+        histogram.total = data["sum"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.buckets = {int(index): count for index, count in data["buckets"].items()}
+        return histogram
+
+
+class Registry:
+    """Metrics of one process; falsy while disabled.
+
+    With ``trace`` enabled every span is also kept as a trace event, up to
+    ``max_events`` per process (later ones are only counted in
+    ``dropped_events``).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace = False
+        self.directory: Optional[str] = None
+        self.max_events = 1_000_000
+        self.reset()
+
+    def __bool__(self):
+        return self.enabled
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.events = []
+        self.dropped_events = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value, unit: Optional[str] = None) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(unit)
+            histogram.record(value)
+
+    def record_span(self, name: str, start_ns: int, end_ns: int) -> None:
+        """Record a span that ran from ``start_ns`` to ``end_ns``."""
+        self.observe(name, end_ns - start_ns, "ns")
+        if self.trace:
+            if len(self.events) < self.max_events:
+                self.events.append((name, start_ns, end_ns - start_ns, threading.get_ident()))
+            else:
+                self.dropped_events += 1
+
+    # ------------------------------------------------------------------
+    def trace_events(self) -> list:
+        """Return the recorded spans as Chrome trace events."""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid,
+                   "args": {"name": f"{mp.current_process().name} ({pid})"}}]
+        for name, start, duration, tid in self.events:
+            events.append({"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid,
+                           "tid": tid, "ts": start / 1000, "dur": duration / 1000})
+        return events
+
+    def write_jsonl(self, path: str) -> None:
+        pid = os.getpid()
+        with open(path, "w") as f:
+            for name, value in sorted(self.counters.items()):
+                f.write(json.dumps({"kind": "counter", "name": name, "pid": pid,
+                                    "value": value}) + "\n")
+            for name, histogram in sorted(self.histograms.items()):
+                f.write(json.dumps({"kind": "histogram", "name": name, "pid": pid,
+                                    **histogram.to_dict()}) + "\n")
+            if self.dropped_events:
+                f.write(json.dumps({"kind": "counter", "name": "metrics.dropped_events",
+                                    "pid": pid, "value": self.dropped_events}) + "\n")
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+    def dump(self, directory: Optional[str] = None) -> None:
+        """Write this process's metrics and trace into ``directory``.
+
+        Defaults to the directory given to :func:`enable`; does nothing when
+        there is none or the registry is disabled.
+        """
+        directory = directory or self.directory
+        if not self.enabled or directory is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        pid = os.getpid()
+        self.write_jsonl(os.path.join(directory, f"metrics-{pid}.jsonl"))
+        if self.trace:
+            self.write_trace(os.path.join(directory, f"trace-{pid}.json"))
+
+
+def _after_process_fork(registry: Registry) -> None:
+    # runs in every multiprocessing child before its target, after inherited
+    # finalizers were cleared; the finalizer replaces the atexit handler,
+    # which forked children never run
+    atexit.unregister(registry.dump)
+    multiprocessing.util.Finalize(registry, registry.dump, exitpriority=0)
+
+
+registry = Registry()
+# a forked child reports only its own work
+os.register_at_fork(after_in_child=registry.reset)
+multiprocessing.util.register_after_fork(registry, _after_process_fork)
+
+
+def enable(trace: bool = False, directory: Optional[str] = None) -> Registry:
+    """Start recording; ``trace`` also keeps every span for trace export."""
+    registry.enabled = True
+    registry.trace = trace
+    registry.directory = directory
+    return registry
+
+
+def disable() -> None:
+    registry.enabled = False
+
+
+def timed(name: str):
+    """Decorator recording every call of the function as span ``name``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.record_span(name, start, time.perf_counter_ns())
+        return wrapper
+    return decorate
+
+
+class span:
+    """Context manager recording its body as span ``name``."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if registry.enabled:
+            self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            registry.record_span(self.name, self.start, time.perf_counter_ns())
+
+
+def count(name: str, value: int = 1) -> None:
+    if registry.enabled:
+        registry.count(name, value)
+
+
+def observe(name: str, value, unit: Optional[str] = None) -> None:
+    if registry.enabled:
+        registry.observe(name, value, unit)
+
+
+# ----------------------------------------------------------------------
+def load(paths: Iterable[str]):
+    """Merge ``metrics-*.jsonl`` files into ``(counters, histograms)``."""
+    counters: Dict[str, int] = {}
+    histograms: Dict[str, Histogram] = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                name = record["name"]
+                if record["kind"] == "counter":
+                    counters[name] = counters.get(name, 0) + record["value"]
+                elif name in histograms:
+                    histograms[name].merge(Histogram.from_dict(record))
+                else:
+                    histograms[name] = Histogram.from_dict(record)
+    return counters, histograms
+
+
+def merge_traces(paths: Iterable[str]) -> dict:
+    """Combine ``trace-*.json`` files of several processes into one trace."""
+    events = []
+    for path in paths:
+        with open(path) as f:
+            events.extend(json.load(f)["traceEvents"])
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def format_summary(counters: dict, histograms: dict) -> str:
+    """Return a table of counters and histogram percentiles (spans in µs)."""
+    lines = [f"{'name':<28} {'count':>9} {'mean':>10} {'p50':>10} {'p90':>10} "
+             f"{'p99':>10} {'p99.9':>10} {'max':>10}"]
+    for name, histogram in sorted(histograms.items()):
+        scale = 1e-3 if histogram.unit == "ns" else 1.0
+        values = [histogram.mean] + [histogram.percentile(q) for q in PERCENTILES]
+        values.append(histogram.max)
+        lines.append(f"{name:<28} {histogram.count:9d} "
+                     + " ".join(f"{value * scale:10.1f}" for value in values))
+    for name, value in sorted(counters.items()):
+        lines.append(f"{name:<28} {value:9d}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Summarize metrics written by GRIDS_METRICS.")
+    parser.add_argument("directory")
+    parser.add_argument("--trace", help="write the merged Chrome trace here")
+    args = parser.parse_args(argv)
+    counters, histograms = load(sorted(glob.glob(os.path.join(args.directory, "metrics-*.jsonl"))))
+    print(format_summary(counters, histograms))
+    if args.trace:
+        traces = sorted(glob.glob(os.path.join(args.directory, "trace-*.json")))
+        with open(args.trace, "w") as f:
+            json.dump(merge_traces(traces), f)
+        print(f"merged {len(traces)} trace(s) into {args.trace}")
+
+
+if os.environ.get(ENV_VAR) and __name__ != "__main__":
+    enable(trace=True, directory=os.environ[ENV_VAR])
+    atexit.register(registry.dump)
+
+
+if __name__ == "__main__":
+    main()
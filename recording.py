@@ -0,0 +1,370 @@
+"""Compact binary recordings of games and deterministic replay.
+
+A game is fully determined by the seed of its :class:`GameState` and the
+sequence of actions performed on it, so a recording stores just that: a
+16-byte header, one ``uint16`` action index per ply and, every
+``checkpoint_every`` plies, the encoded state for seeking. The file ends
+with a digest of the final state so replays can verify that they reproduced
+the game exactly.
+
+Layout (little endian)::
+
+    header      "GRDR" version:u8 pad:u8 checkpoint_every:u16 seed:u64
+    blocks      b"A" count:u16 action:u16 * count
+                b"C" ply:u32 size:u32 state:bytes[size]
+    end         b"E" plies:u32 digest:bytes[16]
+
+:func:`encode_state` is the checkpoint format: every unit, scalar, fire,
+deck and hand plus the RNG state, packed with :mod:`struct`. Decoding it
+gives a state that continues exactly like the original.
+"""
+
+import hashlib
+import random
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from actions import action_to_index, index_to_action
+from events import EventBus
+from game_state import GameState, SCALAR_FIELDS
+from units import Unit, Warrior, Archer, Healer, Trebuchet, Viking
+from zobrist import CARD_TYPES, CARD_TYPE_IDS, UNIT_TYPES, UNIT_TYPE_IDS
+
+MAGIC = b"GRDR"
+VERSION = 1
+HEADER = struct.Struct("<4sBxHQ")
+ACTION_BLOCK = 4096
+
+_COUNT = struct.Struct("<H")
+_CHECKPOINT = struct.Struct("<II")
+_END = struct.Struct("<I16s")
+
+_SCALARS = struct.Struct("<hBBBBhB")
+_UNIT = struct.Struct("<BBbbhhhhhhhBBBBB")
+_FIRE = struct.Struct("<BBB")
+_RNG_STATE = struct.Struct("<625I")
+_GAUSS = struct.Struct("<Bd")
+
+UNIT_CLASSES = {
+    "Commander": Unit,
+    "Warrior": Warrior,
+    "Archer": Archer,
+    "Healer": Healer,
+    "Trebuchet": Trebuchet,
+    "Viking": Viking,
+}
+
+
+def new_game(seed: int) -> GameState:
+    """Return the initial state of the game recorded with ``seed``."""
+    return GameState(seed)
+
+
+# ----------------------------------------------------------------------
+# State checkpoints
+
+
+def encode_state(state: GameState) -> bytes:
+    """Pack the logical state of ``state`` into bytes.
+
+    Attack targets that are no longer on the board are dropped; they can
+    never be attacked again.
+    """
+    units = list(state.units)
+    index = {unit: i for i, unit in enumerate(units)}
+    out = bytearray()
+    selected = index.get(state.selected_unit, -1)
+    out += _SCALARS.pack(
+        state.current_action_points,
+        state.current_player,
+        state.player1BlockedTurnsTimer,
+        state.player2BlockedTurnsTimer,
+        state.winner or 0,
+        selected,
+        len(units),
+    )
+    for unit in units:
+        targets = [index[t] for t in unit.attacked_targets if t in index]
+        out += _UNIT.pack(
+            UNIT_TYPE_IDS[unit.unit_type],
+            unit.owner,
+            unit.row,
+            unit.col,
+            unit.health,
+            unit.max_health,
+            unit.attack,
+            unit.move_range,
+            unit.attack_range,
+            unit.cost,
+            unit.deploy_cost,
+            unit.frozen_turns,
+            unit.burn_turns,
+            unit.action_blocked,
+            unit.has_attacked,
+            len(targets),
+        )
+        out += bytes(sorted(targets))
+    out.append(len(state.fires))
+    for (row, col), turns in state.fires.items():
+        out += _FIRE.pack(row, col, turns)
+    out.append(len(state.obstacles))
+    for row, col in state.obstacles:
+        out += bytes((row, col))
+    for player in (1, 2):
+        for pile in (state.unit_decks[player], state.spell_decks[player],
+                     state.unit_hands[player], state.spell_hands[player]):
+            out.append(len(pile))
+            out += bytes(
+                CARD_TYPE_IDS[card if isinstance(card, type) else card.__class__]
+                for card in pile
+            )
+        # the mixed hand refers to the cards of the unit and spell hands
+        units_hand, spells_hand = state.unit_hands[player], state.spell_hands[player]
+        out.append(len(state.hands[player]))
+        for card in state.hands[player]:
+            if isinstance(card, type):
+                out.append(units_hand.index(card))
+            else:
+                out.append(0x80 | next(i for i, c in enumerate(spells_hand) if c is card))
+    _, internal, gauss = state.rng.getstate()
+    out += _RNG_STATE.pack(*internal)
+    out += _GAUSS.pack(gauss is not None, gauss or 0.0)
+    return bytes(out)
+
+
+def decode_state(data: bytes, seed: Optional[int] = None) -> GameState:
+    """Rebuild a :class:`GameState` from :func:`encode_state` bytes.
+
+    The encoding does not hold the seed the game started from; pass it as
+    ``seed`` to set :attr:`GameState.seed`.
+    """
+    state = GameState.__new__(GameState)
+    state.seed = seed
+    offset = 0
+
+    def take(fmt):
+        nonlocal offset
+        values = fmt.unpack_from(data, offset)
+        offset += fmt.size
+        return values
+
+    def take_bytes(count):
+        nonlocal offset
+        offset += count
+        return data[offset - count:offset]
+
+    ap, player, blocked1, blocked2, winner, selected, num_units = take(_SCALARS)
+    for name, value in zip(SCALAR_FIELDS, (ap, player, blocked1, blocked2, winner or None, None)):
+        setattr(state, name, value)
+
+    units, targets = [], []
+    for _ in range(num_units):
+        (type_id, owner, row, col, health, max_health, attack, move_range, attack_range,
+         cost, deploy_cost, frozen, burn, blocked, attacked, num_targets) = take(_UNIT)
+        unit_type = UNIT_TYPES[type_id]
+        unit = Unit.__new__(UNIT_CLASSES[unit_type])
+        # same attribute order as ``Unit.__init__``
+        unit.__dict__.update(
+            row=row, col=col, unit_type=unit_type, owner=owner, health=health,
+            max_health=max_health, attack=attack, move_range=move_range,
+            attack_range=attack_range, cost=cost, deploy_cost=deploy_cost,
+            frozen_turns=frozen, burn_turns=burn, action_blocked=bool(blocked),
+            has_attacked=bool(attacked), attacked_targets=set(),
+        )
+        units.append(unit)
+        targets.append(take_bytes(num_targets))
+    for unit, indices in zip(units, targets):
+        unit.attacked_targets.update(units[i] for i in indices)
+    state.units = units
+    state.selected_unit = units[selected] if selected >= 0 else None
+
+    state.fires = {}
+    for _ in range(take_bytes(1)[0]):
+        row, col, turns = take(_FIRE)
+        state.fires[(row, col)] = turns
+    obstacles = take_bytes(2 * take_bytes(1)[0])
+    state.obstacles = [(obstacles[i], obstacles[i + 1]) for i in range(0, len(obstacles), 2)]
+
+    piles = {name: {} for name in ("unit_decks", "spell_decks", "unit_hands", "spell_hands",
+                                   "hands")}
+    for player in (1, 2):
+        for name in ("unit_decks", "spell_decks", "unit_hands", "spell_hands"):
+            pile = []
+            for card_id in take_bytes(take_bytes(1)[0]):
+                card = CARD_TYPES[card_id]
+                pile.append(card if issubclass(card, Unit) else card())
+            piles[name][player] = pile
+        hand = []
+        for entry in take_bytes(take_bytes(1)[0]):
+            if entry & 0x80:
+                hand.append(piles["spell_hands"][player][entry & 0x7F])
+            else:
+                hand.append(piles["unit_hands"][player][entry])
+        piles["hands"][player] = hand
+    for name, pile in piles.items():
+        setattr(state, name, pile)
+
+    internal = take(_RNG_STATE)
+    has_gauss, gauss = take(_GAUSS)
+    state.rng = random.Random()
+    state.rng.setstate((3, internal, gauss if has_gauss else None))
+    state.events = EventBus()
+    state.refresh_player_hands()
+    return state
+
+
+def state_digest(state: GameState) -> bytes:
+    """Return a 16-byte digest of the encoded state."""
+    return hashlib.blake2b(encode_state(state), digest_size=16).digest()
+
+
+# ----------------------------------------------------------------------
+# Recording
+
+
+class GameRecorder:
+    """Play a game on :attr:`state` while recording its actions.
+
+    The recorder starts a new game from ``seed``, or attaches to ``state``,
+    which must not have been played yet (e.g. the state of a freshly reset
+    :class:`GridsEnv`; ``GridsEnv(record=True)`` does this on every reset).
+    Use :meth:`perform` instead of :meth:`GameState.perform`; any other
+    change to :attr:`state` would not be replayed. ``checkpoint_every``
+    plies (0 disables) the state is encoded so replays can seek.
+    """
+
+    def __init__(self, seed: Optional[int] = None, checkpoint_every: int = 128,
+                 state: Optional[GameState] = None):
+        if state is None:
+            state = new_game(seed)
+        elif seed is not None and seed != state.seed:
+            raise ValueError(f"state was started with seed {state.seed}, not {seed}")
+        elif encode_state(state) != encode_state(new_game(state.seed)):
+            raise ValueError("can only record a state that has not been played yet")
+        self.seed = state.seed
+        self.checkpoint_every = checkpoint_every
+        self.state = state
+        self.actions: List[int] = []
+        self.checkpoints: Dict[int, bytes] = {}
+
+    def perform(self, action):
+        """Record ``action`` and perform it; returns :meth:`GameState.perform`'s result."""
+        self.actions.append(action_to_index(action))
+        result = self.state.perform(action)
+        if self.checkpoint_every and len(self.actions) % self.checkpoint_every == 0:
+            self.checkpoints[len(self.actions)] = encode_state(self.state)
+        return result
+
+    def write(self, f: BinaryIO) -> None:
+        f.write(HEADER.pack(MAGIC, VERSION, self.checkpoint_every, self.seed))
+        start = 0
+        for ply in sorted(self.checkpoints) + [len(self.actions)]:
+            while start < ply:
+                block = self.actions[start:min(ply, start + ACTION_BLOCK)]
+                f.write(b"A" + _COUNT.pack(len(block)))
+                f.write(struct.pack(f"<{len(block)}H", *block))
+                start += len(block)
+            if ply in self.checkpoints:
+                data = self.checkpoints[ply]
+                f.write(b"C" + _CHECKPOINT.pack(ply, len(data)) + data)
+        f.write(b"E" + _END.pack(len(self.actions), state_digest(self.state)))
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            self.write(f)
+
+
+def _read(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("recording is truncated")
+    return data
+
+
+class GameRecording:
+    """A recording loaded by :meth:`load`, ready to be replayed."""
+
+    def __init__(self, seed: int, actions: List[int], checkpoints: Dict[int, bytes],
+                 digest: bytes, checkpoint_every: int = 0):
+        self.seed = seed
+        self.actions = actions
+        self.checkpoints = checkpoints
+        self.digest = digest
+        self.checkpoint_every = checkpoint_every
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> "GameRecording":
+        magic, version, checkpoint_every, seed = HEADER.unpack(_read(f, HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("not a Grids recording")
+        if version != VERSION:
+            raise ValueError(f"unsupported recording version {version}")
+        actions, checkpoints = [], {}
+        while True:
+            tag = _read(f, 1)
+            if tag == b"A":
+                (count,) = _COUNT.unpack(_read(f, _COUNT.size))
+                actions.extend(struct.unpack(f"<{count}H", _read(f, 2 * count)))
+            elif tag == b"C":
+                ply, size = _CHECKPOINT.unpack(_read(f, _CHECKPOINT.size))
+                checkpoints[ply] = _read(f, size)
+            elif tag == b"E":
+                plies, digest = _END.unpack(_read(f, _END.size))
+                if plies != len(actions):
+                    raise ValueError(f"recording is truncated: {len(actions)} of {plies} plies")
+                return cls(seed, actions, checkpoints, digest, checkpoint_every)
+            else:
+                raise ValueError(f"corrupt recording: unknown block {tag!r}")
+
+    @classmethod
+    def load(cls, path: str) -> "GameRecording":
+        with open(path, "rb") as f:
+            return cls.read(f)
+
+    # ------------------------------------------------------------------
+    def action(self, ply: int) -> Tuple[int, int, int, int]:
+        """Return the action performed at ``ply`` (0-based)."""
+        return index_to_action(self.actions[ply])
+
+    def state_at(self, ply: int) -> GameState:
+        """Return the state after ``ply`` actions, starting from the nearest checkpoint."""
+        if not 0 <= ply <= len(self.actions):
+            raise IndexError(f"ply {ply} outside 0..{len(self.actions)}")
+        start = max((p for p in self.checkpoints if p <= ply), default=0)
+        if start:
+            state = decode_state(self.checkpoints[start], self.seed)
+        else:
+            state = new_game(self.seed)
+        for index in self.actions[start:ply]:
+            state.perform(index_to_action(index))
+        return state
+
+    def replay(self, verify: bool = True) -> Iterator[Tuple[GameState, Tuple[int, int, int, int]]]:
+        """Yield ``(state, action)`` before each action is performed.
+
+        The same state object is advanced after every yield; copy or observe
+        it before resuming. With ``verify`` every checkpoint and the final
+        state are compared with the recording and a :class:`RuntimeError`
+        is raised on divergence.
+        """
+        state = new_game(self.seed)
+        for ply, index in enumerate(self.actions):
+            action = index_to_action(index)
+            yield state, action
+            state.perform(action)
+            if verify and ply + 1 in self.checkpoints:
+                if encode_state(state) != self.checkpoints[ply + 1]:
+                    raise RuntimeError(f"replay diverged from the recording at ply {ply + 1}")
+        if verify and state_digest(state) != self.digest:
+            raise RuntimeError("replay did not reproduce the recorded final state")
+
+    def final_state(self, verify: bool = True) -> GameState:
+        if not verify:
+            return self.state_at(len(self.actions))
+        state = new_game(self.seed)
+        for state, _ in self.replay():
+            pass
+        return state
@@ -0,0 +1,454 @@
+"""Preallocated replay memory for :class:`DQNAgent`.
+
+Observations are flattened into a pool of compact frames: one int8 row
+(current player, action points, opponent hand size, board owners and both
+hands) and one int16 row (board health). Transitions store indices into the
+pool together with the action index, reward and done flag, so sampling is a
+handful of vectorized gathers that produce the float32 layout of
+:func:`dqn_agent.obs_to_tensor` directly.
+
+In a trajectory the ``next_obs`` of one transition is usually the ``obs`` of
+the next one. Each transition remembers the frame of its ``next_obs`` per
+``stream`` (e.g. the game slot of a vectorized env), and the following
+``obs`` of that stream reuses the frame when the contents match. Frames are
+reference counted and return to a free list once no stored transition uses
+them.
+
+:meth:`ReplayMemory.save` writes every array as a ``.npy`` file, and
+:meth:`ReplayMemory.load` maps them back copy-on-write, so checkpoints of
+large memories load instantly and pages are only read when sampled. Saving
+again to the same directory only rewrites the rows that changed since the
+previous save or load, so periodic checkpoints cost I/O proportional to the
+transitions added in between rather than to the capacity.
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+
+from actions import ACTION_SIZE, action_to_index
+from constants import ROWS, COLUMNS, HAND_CAPACITY
+
+BOARD_CELLS = ROWS * COLUMNS
+# Column layout of the int8 frame row; board health lives in the int16 row.
+# The flattened feature vector is ``int8[:HEALTH_AT] + int16 + int8[HEALTH_AT:]``.
+SMALL_SIZE = 3 + BOARD_CELLS + 2 * HAND_CAPACITY
+HEALTH_AT = 3 + BOARD_CELLS
+OBS_SIZE = SMALL_SIZE + BOARD_CELLS
+# Smallest integer type holding every action index.
+ACTION_DTYPE = np.min_scalar_type(ACTION_SIZE - 1)
+
+
+def encode_obs(obs, small: np.ndarray, health: np.ndarray) -> None:
+    """Write the observation dict or flat observation ``obs`` into one frame's rows."""
+    if isinstance(obs, np.ndarray):
+        small[:HEALTH_AT] = obs[:HEALTH_AT]
+        health[:] = obs[HEALTH_AT:HEALTH_AT + BOARD_CELLS]
+        small[HEALTH_AT:] = obs[HEALTH_AT + BOARD_CELLS:]
+        return
+    small[0] = obs["current_player"]
+    small[1] = obs["action_points"]
+    small[2] = obs["opponent_hand"]
+    small[3:HEALTH_AT] = np.ravel(obs["board_owner"])
+    small[HEALTH_AT:HEALTH_AT + HAND_CAPACITY] = obs["unit_hand"]
+    small[HEALTH_AT + HAND_CAPACITY:] = obs["spell_hand"]
+    health[:] = np.ravel(obs["board_health"])
+
+
+def _write_npy(path: str, array: np.ndarray) -> None:
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+class ReplayMemory:
+    """Fixed-capacity ring buffer of ``(obs, action, reward, next_obs, done)``.
+
+    ``action`` may be an ``(action_type, index, row, col)`` tuple or an action
+    index. :meth:`sample` returns ``(states, actions, rewards, next_states,
+    dones)`` tensors ready for the DQN update.
+    """
+
+    def __init__(self, capacity: int, seed: Optional[int] = None):
+        self.capacity = capacity
+        # Shared frames make about one frame per transition the norm; the
+        # pool grows towards the worst case of two when sharing fails.
+        num_frames = capacity + 2
+        self.small = np.zeros((num_frames, SMALL_SIZE), dtype=np.int8)
+        self.health = np.zeros((num_frames, BOARD_CELLS), dtype=np.int16)
+        self.refcount = np.zeros(num_frames, dtype=np.int32)
+        self._free = list(range(num_frames - 1, -1, -1))
+        self._scratch_small = np.zeros((2, SMALL_SIZE), dtype=np.int8)
+        self._scratch_health = np.zeros((2, BOARD_CELLS), dtype=np.int16)
+
+        self.obs_frame = np.zeros(capacity, dtype=np.int32)
+        self.next_frame = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=ACTION_DTYPE)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+
+        self.pos = 0
+        self.size = 0
+        self._last_frame = {}
+        self.rng = np.random.default_rng(seed)
+        # what changed since the files in ``_saved_to`` were written
+        self._saved_to = None
+        self._dirty_frames = set()
+        self._unsaved = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.small, self.health, self.refcount, self.obs_frame,
+                  self.next_frame, self.actions, self.rewards, self.dones)
+        return sum(array.nbytes for array in arrays)
+
+    # ------------------------------------------------------------------
+    def _release(self, frame: int) -> None:
+        self._dirty_frames.add(frame)
+        self.refcount[frame] -= 1
+        if self.refcount[frame] == 0:
+            self._free.append(frame)
+
+    def _grow(self) -> None:
+        old = len(self.refcount)
+        new = min(2 * self.capacity, old + max(self.capacity // 4, 16))
+        self.small = np.concatenate([self.small, np.zeros((new - old, SMALL_SIZE), np.int8)])
+        self.health = np.concatenate([self.health, np.zeros((new - old, BOARD_CELLS), np.int16)])
+        self.refcount = np.concatenate([self.refcount, np.zeros(new - old, np.int32)])
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _frame_for(self, small: np.ndarray, health: np.ndarray,
+                   reuse: Optional[int]) -> int:
+        """Return a frame holding the encoded rows, sharing ``reuse`` if equal."""
+        if (
+            reuse is not None
+            and self.refcount[reuse] > 0
+            and np.array_equal(small, self.small[reuse])
+            and np.array_equal(health, self.health[reuse])
+        ):
+            frame = reuse
+        else:
+            if not self._free:
+                self._grow()
+            frame = self._free.pop()
+            self.small[frame] = small
+            self.health[frame] = health
+        self._dirty_frames.add(frame)
+        self.refcount[frame] += 1
+        return frame
+
+    def store(self, obs: dict, action, reward: float, next_obs: dict, done: bool,
+              stream=0) -> None:
+        """Append a transition, evicting the oldest one when full."""
+        small, health = self._scratch_small, self._scratch_health
+        encode_obs(obs, small[0], health[0])
+        encode_obs(next_obs, small[1], health[1])
+        if not isinstance(action, (int, np.integer)):
+            action = action_to_index(action)
+        self._store_encoded(small[0], health[0], action, reward, small[1], health[1],
+                            done, stream)
+
+    def store_encoded(self, small, health, actions, rewards, next_small, next_health,
+                      dones, streams) -> None:
+        """Append a batch of transitions whose observations are already encoded.
+
+        ``small``/``health`` (and their ``next_`` counterparts) hold one row
+        per transition as written by :func:`encode_obs`; ``actions`` are action
+        indices. This is how transitions produced in other processes are
+        added without rebuilding observation dicts.
+        """
+        for k in range(len(actions)):
+            self._store_encoded(small[k], health[k], actions[k], rewards[k],
+                                next_small[k], next_health[k], dones[k], streams[k])
+
+    def _store_encoded(self, small, health, action, reward, next_small, next_health,
+                       done, stream) -> None:
+        i = self.pos
+        if self.size == self.capacity:
+            self._release(self.obs_frame[i])
+            self._release(self.next_frame[i])
+
+        self.obs_frame[i] = self._frame_for(small, health, self._last_frame.get(stream))
+        frame = self._frame_for(next_small, next_health, None)
+        self.next_frame[i] = frame
+        self._last_frame[stream] = None if done else frame
+
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self._unsaved += 1
+
+    # ------------------------------------------------------------------
+    def _arrays(self) -> dict:
+        return {
+            "small": self.small,
+            "health": self.health,
+            "refcount": self.refcount,
+            "obs_frame": self.obs_frame,
+            "next_frame": self.next_frame,
+            "actions": self.actions,
+            "rewards": self.rewards,
+            "dones": self.dones,
+        }
+
+    def _set_arrays(self, arrays: dict) -> None:
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def _dirty_rows(self) -> dict:
+        """Return the rows of each array changed since the last save or load."""
+        frames = np.fromiter(self._dirty_frames, dtype=np.int64,
+                             count=len(self._dirty_frames))
+        count = min(self._unsaved, self.capacity)
+        slots = (self.pos - count + np.arange(count)) % self.capacity
+        rows = dict.fromkeys(("small", "health", "refcount"), frames)
+        rows.update(dict.fromkeys(("obs_frame", "next_frame", "actions", "rewards", "dones"),
+                                  slots))
+        return rows
+
+    def _mark_saved(self, directory: str) -> None:
+        self._saved_to = os.path.realpath(directory)
+        self._dirty_frames = set()
+        self._unsaved = 0
+
+    def _meta(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "pos": self.pos,
+            "size": self.size,
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def _set_meta(self, meta: dict) -> None:
+        self.pos = meta["pos"]
+        self.size = meta["size"]
+        self.rng.bit_generator.state = meta["rng"]
+
+    def save(self, directory: str) -> None:
+        """Write the memory to ``directory`` as ``.npy`` files and ``meta.json``.
+
+        The first save to a directory writes each array under a temporary
+        name and renames it, so a memory loaded from there keeps reading its
+        old mapping. Later saves to the directory this memory was saved to
+        or loaded from write only the changed rows in place; ``meta.json``
+        is removed first and written last, so an interrupted save fails to
+        load instead of loading inconsistent arrays. Streams must be
+        integers.
+        """
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        if self._saved_to == os.path.realpath(directory) and os.path.exists(meta_path):
+            os.remove(meta_path)
+            rows = self._dirty_rows()
+        else:
+            rows = {}
+        for name, array in self._arrays().items():
+            path = os.path.join(directory, name + ".npy")
+            if name in rows:
+                stored = np.lib.format.open_memmap(path, mode="r+")
+                same_shape = stored.shape == array.shape
+                if same_shape:
+                    # unmapping leaves the pages to the OS like np.save does
+                    stored[rows[name]] = array[rows[name]]
+                del stored
+                if same_shape:
+                    continue
+            _write_npy(path, array)
+        _write_npy(os.path.join(directory, "free.npy"), np.array(self._free, dtype=np.int64))
+        last_frame = [(stream, -1 if frame is None else frame)
+                      for stream, frame in self._last_frame.items()]
+        _write_npy(os.path.join(directory, "last_frame.npy"),
+                   np.array(last_frame, dtype=np.int64).reshape(-1, 2))
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(self._meta(), f)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._mark_saved(directory)
+
+    def load(self, directory: str, mmap_mode: Optional[str] = "c") -> None:
+        """Restore a memory written by :meth:`save` with the same capacity.
+
+        With the default ``mmap_mode="c"`` arrays are memory-mapped
+        copy-on-write: nothing is read up front and changes never reach the
+        files. Pass ``None`` to read everything into RAM.
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["capacity"] != self.capacity:
+            raise ValueError(
+                f"checkpoint holds a memory of capacity {meta['capacity']}, "
+                f"not {self.capacity}"
+            )
+        self._set_arrays({
+            name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+            for name in self._arrays()
+        })
+        self._set_meta(meta)
+        self._free = np.load(os.path.join(directory, "free.npy")).tolist()
+        self._last_frame = {
+            stream: None if frame < 0 else frame
+            for stream, frame in np.load(os.path.join(directory, "last_frame.npy")).tolist()
+        }
+        self._mark_saved(directory)
+
+    # ------------------------------------------------------------------
+    def frames_to_array(self, frames: np.ndarray) -> np.ndarray:
+        """Return the float32 feature rows of ``frames``."""
+        out = np.empty((len(frames), OBS_SIZE), dtype=np.float32)
+        small = self.small[frames]
+        out[:, :HEALTH_AT] = small[:, :HEALTH_AT]
+        out[:, HEALTH_AT:HEALTH_AT + BOARD_CELLS] = self.health[frames]
+        out[:, HEALTH_AT + BOARD_CELLS:] = small[:, HEALTH_AT:]
+        return out
+
+    def sample_indices(self, batch_size: int) -> np.ndarray:
+        return self.rng.integers(0, self.size, size=batch_size)
+
+    def sample(self, batch_size: int, indices: Optional[np.ndarray] = None):
+        """Return a uniformly sampled batch of tensors."""
+        if indices is None:
+            indices = self.sample_indices(batch_size)
+        return (
+            torch.from_numpy(self.frames_to_array(self.obs_frame[indices])),
+            torch.from_numpy(self.actions[indices].astype(np.int64)),
+            torch.from_numpy(self.rewards[indices]),
+            torch.from_numpy(self.frames_to_array(self.next_frame[indices])),
+            torch.from_numpy(self.dones[indices].astype(np.float32)),
+        )
+
+
+class SumTree:
+    """Array-backed binary tree whose internal nodes hold sums of priorities.
+
+    Leaves sit at ``tree[size:2 * size]`` with the root at ``tree[1]``;
+    ``size`` is ``capacity`` rounded up to a power of two. Updates and
+    lookups work on whole batches, one tree level per NumPy operation.
+    """
+
+    def __init__(self, capacity: int):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def __getitem__(self, indices):
+        return self.tree[np.asarray(indices) + self.size]
+
+    def update(self, indices, priorities) -> None:
+        """Set the priorities of leaves ``indices`` and refresh their sums."""
+        nodes = np.asarray(indices, dtype=np.int64) + self.size
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            # duplicate parents simply write the same sum twice
+            nodes //= 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values) -> np.ndarray:
+        """Return the leaf whose prefix-sum interval contains each value."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            nodes *= 2
+            left_sum = self.tree[nodes]
+            right = values > left_sum
+            values -= left_sum * right
+            nodes += right
+        return nodes - self.size
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """:class:`ReplayMemory` that samples transitions by TD-error priority.
+
+    Transition ``i`` is drawn with probability ``p_i ** alpha / sum``, where
+    new transitions get the largest priority seen so far. Importance
+    sampling weights ``(N * P(i)) ** -beta``, normalised by the batch
+    maximum, correct the bias; ``beta`` rises linearly from ``beta_start``
+    to 1 over ``beta_steps`` sampled batches.
+    """
+
+    def __init__(self, capacity: int, alpha: float = 0.6, beta_start: float = 0.4,
+                 beta_steps: int = 100_000, epsilon: float = 1e-3,
+                 seed: Optional[int] = None):
+        super().__init__(capacity, seed=seed)
+        self.alpha = alpha
+        self.beta_start = beta_start
+        self.beta_steps = beta_steps
+        self.epsilon = epsilon
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+        self.batches_sampled = 0
+        self._dirty_leaves = []
+
+    @property
+    def beta(self) -> float:
+        fraction = min(1.0, self.batches_sampled / self.beta_steps)
+        return self.beta_start + fraction * (1.0 - self.beta_start)
+
+    def _store_encoded(self, *transition) -> None:
+        i = self.pos
+        super()._store_encoded(*transition)
+        self.tree.update([i], self.max_priority)
+
+    def _arrays(self) -> dict:
+        return {**super()._arrays(), "priorities": self.tree.tree}
+
+    def _set_arrays(self, arrays: dict) -> None:
+        self.tree.tree = arrays.pop("priorities")
+        super()._set_arrays(arrays)
+
+    def _dirty_rows(self) -> dict:
+        # leaves of new and re-prioritized transitions and every sum above them
+        rows = super()._dirty_rows()
+        nodes = np.unique(np.concatenate([rows["actions"], *self._dirty_leaves]))
+        nodes = nodes + self.tree.size
+        changed = [nodes]
+        for _ in range(self.tree.depth):
+            nodes = np.unique(nodes // 2)
+            changed.append(nodes)
+        return {**rows, "priorities": np.concatenate(changed)}
+
+    def _mark_saved(self, directory: str) -> None:
+        super()._mark_saved(directory)
+        self._dirty_leaves = []
+
+    def _meta(self) -> dict:
+        return {**super()._meta(), "max_priority": self.max_priority,
+                "batches_sampled": self.batches_sampled}
+
+    def _set_meta(self, meta: dict) -> None:
+        super()._set_meta(meta)
+        self.max_priority = meta["max_priority"]
+        self.batches_sampled = meta["batches_sampled"]
+
+    def sample_indices(self, batch_size: int) -> np.ndarray:
+        """Draw one index from each of ``batch_size`` equal priority segments."""
+        total = self.tree.total
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+        indices = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+        self.batches_sampled += 1
+        return np.minimum(indices, self.size - 1)
+
+    def importance_weights(self, indices: np.ndarray) -> np.ndarray:
+        probs = self.tree[indices] / self.tree.total
+        weights = (self.size * probs) ** -self.beta
+        return (weights / weights.max()).astype(np.float32)
+
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray) -> None:
+        """Set priorities from absolute TD errors for a sampled batch."""
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        self.tree.update(indices, priorities)
+        self._dirty_leaves.append(np.asarray(indices, dtype=np.int64))
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -1,22 +1,33 @@
-from grids_env import GridsEnv
+import numpy as np
+
+from grids_vec_env import GridsVecEnv
 from agents import RandomAgent
 
 
-def self_play(num_episodes=5, max_steps=50):
-    env = GridsEnv()
+def self_play(num_episodes=5, max_steps=50, num_envs=4):
+    vec_env = GridsVecEnv(num_envs, max_episode_steps=max_steps)
     agents = {1: RandomAgent(), 2: RandomAgent()}
-    for ep in range(num_episodes):
-        obs, _ = env.reset()
-        for step in range(max_steps):
-            player = env.state.current_player
-            action = agents[player].act(env)
-            obs, reward, term, trunc, _ = env.step(action)
-            if term or trunc:
-                break
-        if env.state.winner:
-            print(f"Episode {ep+1} finished - Player {env.state.winner} wins")
-        else:
-            print(f"Episode {ep+1} finished - Draw")
+    vec_env.reset()
+    finished = 0
+    while finished < num_episodes:
+        players = vec_env.current_players.copy()
+        valid_actions = vec_env.valid_actions()
+        actions = [None] * num_envs
+        for player, agent in agents.items():
+            slots = np.flatnonzero(players == player)
+            chosen = agent.act_batch([valid_actions[i] for i in slots])
+            for i, action in zip(slots, chosen):
+                actions[i] = action
+        _, _, _, _, infos = vec_env.step(actions)
+        for info in infos:
+            if "episode" not in info or finished >= num_episodes:
+                continue
+            finished += 1
+            winner = info["episode"]["winner"]
+            if winner:
+                print(f"Episode {finished} finished - Player {winner} wins")
+            else:
+                print(f"Episode {finished} finished - Draw")
 
 
 if __name__ == "__main__":
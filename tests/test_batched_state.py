@@ -0,0 +1,164 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import random
+import numpy as np
+import pytest
+from grids_env import GridsEnv
+from batched_state import BatchedGameState, UNIT_DECK, SPELL_DECK
+from cards import Teleport
+from units import Warrior, Archer, Healer, Trebuchet, Viking
+from constants import ROWS, COLUMNS
+
+
+def unit_records(state):
+    return [
+        (u.unit_type, u.owner, u.row, u.col, u.health, u.frozen_turns,
+         u.burn_turns, bool(u.has_attacked))
+        for u in state.units
+    ]
+
+
+def assert_same(envs, batch, results, rewards, terminated):
+    obs = batch.observations()
+    for i, (env_obs, reward, term, _, _) in enumerate(results):
+        assert reward == pytest.approx(rewards[i], abs=1e-5)
+        assert term == terminated[i]
+        for key, value in env_obs.items():
+            np.testing.assert_array_equal(np.asarray(value), obs[key][i], err_msg=key)
+        assert unit_records(envs[i].state) == batch.unit_records(i)
+
+
+def play_parity(envs, seed, steps, noise=0.1):
+    rng = random.Random(seed)
+    batch = BatchedGameState.from_game_states([env.state for env in envs])
+    for _ in range(steps):
+        actions = []
+        for env in envs:
+            if rng.random() < noise:
+                # raw actions exercise the failure and early-termination paths
+                actions.append((rng.randrange(7), rng.randrange(6),
+                                rng.randrange(ROWS), rng.randrange(COLUMNS)))
+            else:
+                actions.append(tuple(int(a) for a in rng.choice(env.valid_actions())))
+        results = [env.step(action) for env, action in zip(envs, actions)]
+        rewards, terminated = batch.step(np.array(actions))
+        assert_same(envs, batch, results, rewards, terminated)
+        for i, env in enumerate(envs):
+            if terminated[i]:
+                env.reset()
+                batch.load_game_state(i, env.state)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_play_matches_game_state(seed):
+    envs = [GridsEnv() for _ in range(8)]
+    for i, env in enumerate(envs):
+        env.reset(seed=100 * seed + i)
+    play_parity(envs, seed, steps=250)
+
+
+def test_status_effects_and_healers_match_game_state():
+    envs = []
+    for i in range(6):
+        env = GridsEnv()
+        env.reset(seed=300 + i)
+        state = env.state
+        healer = Healer(1, 1, owner=1)
+        ally = Warrior(1, 2, owner=1)
+        ally.health = 30
+        frozen = Viking(2, 5, owner=2)
+        frozen.frozen_turns = 2
+        burning = Archer(5, 5, owner=2)
+        burning.burn_turns = 2
+        treb = Trebuchet(5, 1, owner=1)
+        state.units.extend([healer, ally, frozen, burning, treb])
+        state.fires[(5, 5)] = 2
+        state.fires[(2, 6)] = 4
+        state.player2BlockedTurnsTimer = 1 + i % 2
+        state.unit_hands[1].append(Healer)
+        state.hands[1].append(Healer)
+        env.refresh_obs()
+        envs.append(env)
+    play_parity(envs, seed=4, steps=150, noise=0.05)
+
+
+def test_reset_deals_fresh_games():
+    batch = BatchedGameState(5, seed=0)
+    batch.reset()
+    obs = batch.observations()
+    assert (obs["current_player"] == 1).all()
+    assert (obs["action_points"] == 7).all()
+    assert (obs["board_owner"][:, ROWS // 2, 0] == 1).all()
+    assert (obs["board_owner"][:, ROWS // 2, COLUMNS - 1] == 2).all()
+    assert (obs["board_health"].sum(axis=(1, 2)) == 300).all()
+    assert (obs["opponent_hand"] == 6).all()
+    for deck, reference in ((batch.unit_deck, UNIT_DECK), (batch.spell_deck, SPELL_DECK)):
+        np.testing.assert_array_equal(np.sort(deck, axis=2),
+                                      np.broadcast_to(np.sort(reference), deck.shape))
+    np.testing.assert_array_equal(batch.unit_hand[:, :, :3], batch.unit_deck[:, :, :3])
+
+
+def test_trebuchet_splash_and_knockback():
+    env = GridsEnv()
+    state = env.state
+    treb = Trebuchet(0, 0, owner=1)
+    target = Warrior(3, 4, owner=2)
+    neighbour = Viking(3, 5, owner=2)
+    state.units = [treb, target, neighbour]
+    batch = BatchedGameState.from_game_states([state])
+    rewards, _ = batch.step(np.array([[4, 0, 3, 4]]))
+    env.step((4, 0, 3, 4))
+    assert unit_records(state) == batch.unit_records(0)
+    # splash hit the neighbour; the target was pushed diagonally away
+    assert ("Viking", 2, 3, 5, 80, 0, 0, False) in batch.unit_records(0)
+    assert ("Warrior", 2, 4, 5, 80, 0, 0, False) in batch.unit_records(0)
+
+
+def _give_teleports(state, count=2):
+    for player in (1, 2):
+        for _ in range(count):
+            card = Teleport()
+            state.spell_hands[player].append(card)
+            state.hands[player].append(card)
+    state.refresh_player_hands()
+
+
+def test_teleport_matches_game_state():
+    envs = []
+    for i in range(4):
+        env = GridsEnv()
+        env.reset(seed=500 + i)
+        env.state.units.extend([Warrior(1, 1, owner=1), Archer(5, 1, owner=1),
+                                Viking(2, 8, owner=2)])
+        _give_teleports(env.state)
+        env.refresh_obs()
+        envs.append(env)
+    batch = BatchedGameState.from_game_states([env.state for env in envs])
+    # play the first Teleport; every game picks its unit with its own RNG
+    actions = [(2, len(env.state.spell_hand) - 2, 0, 4 + i) for i, env in enumerate(envs)]
+    results = [env.step(action) for env, action in zip(envs, actions)]
+    rewards, terminated = batch.step(np.array(actions))
+    assert_same(envs, batch, results, rewards, terminated)
+    assert all(info["used_spell"] == "Teleport" for *_, info in results)
+    assert [env.state.unit_at(0, 4 + i) is not None for i, env in enumerate(envs)] == [True] * 4
+
+    # a selected friendly unit is teleported instead of a random one
+    env = envs[0]
+    env.step((3, 0, 0, 0))
+    state = env.state
+    state.selected_unit = next(u for u in state.units if u.owner == state.current_player)
+    batch = BatchedGameState.from_game_states([state])
+    action = (2, len(state.spell_hand) - 1, 6, 5)
+    result = env.step(action)
+    rewards, terminated = batch.step(np.array([action]))
+    assert_same([env], batch, [result], rewards, terminated)
+    assert state.selected_unit.row == 6 and state.selected_unit.col == 5
+
+
+def test_random_play_with_teleports_matches_game_state():
+    envs = [GridsEnv() for _ in range(8)]
+    for i, env in enumerate(envs):
+        env.reset(seed=700 + i)
+        _give_teleports(env.state)
+        env.refresh_obs()
+    play_parity(envs, seed=7, steps=250)
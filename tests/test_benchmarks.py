@@ -0,0 +1,65 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+
+import pytest
+
+pytest.importorskip("torch")
+
+from actions import ActionType
+from benchmarks import engine
+
+
+def test_engine_benchmark_covers_every_density():
+    results = engine.run(samples=3, pattern="[")
+    names = results["results"]
+    for density in engine.DENSITIES:
+        assert f"valid_actions[{density}]" in names
+        for action_type in ActionType:
+            assert f"step.{action_type.name}[{density}]" in names
+    stats = names["a_star_pathfinding[crowded]"]
+    assert stats["p50_us"] <= stats["p90_us"] <= stats["p99_us"]
+    assert stats["ops_per_sec"] > 0
+    json.dumps(results)
+
+
+def test_compare_flags_slower_medians_and_missing_cases():
+    def results(**p50):
+        return {"results": {name: {"p50_us": us} for name, us in p50.items()}}
+
+    baseline = results(fast=10.0, slow=10.0, gone=10.0)
+    current = results(fast=5.0, slow=13.0, new=1.0)
+    assert engine.compare(current, baseline, tolerance=0.25) == [
+        ("gone", 10.0, None), ("slow", 10.0, 13.0)]
+    assert engine.compare(current, baseline, tolerance=0.5) == [("gone", 10.0, None)]
+    # cases the run's filter excluded are not missing
+    current["meta"] = {"filter": "s"}
+    assert engine.compare(current, baseline, tolerance=0.5) == []
+
+
+def test_main_fails_on_regression(tmp_path):
+    baseline = engine.run(samples=3, pattern="_get_obs[empty]")
+    for stats in baseline["results"].values():
+        stats["p50_us"] /= 100
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(baseline))
+    argv = ["--samples", "3", "--filter", "_get_obs[empty]", "--baseline", str(path)]
+    assert engine.main(argv) == 1
+    assert engine.main(argv + ["--tolerance", "1000"]) == 0
+
+
+def test_training_benchmark_is_deterministic_and_splits_time(tmp_path):
+    from benchmarks import training
+
+    profile = tmp_path / "train.prof"
+    first = training.run(steps=3, num_envs=4, warmup=35, seed=1, profile=str(profile))
+    second = training.run(steps=3, num_envs=4, warmup=35, seed=1)
+    stats = first["results"]
+    assert stats["updates"] > 0 and stats["updates"] == second["results"]["updates"]
+    assert set(stats["seconds"]) == set(training.PHASES)
+    assert abs(sum(stats["seconds"].values()) - stats["wall_seconds"]) < 1e-6
+    assert profile.stat().st_size > 0
+
+    baseline = json.loads(json.dumps(first))
+    baseline["results"]["updates_per_sec"] *= 10
+    assert [name for name, *_ in training.compare(first, baseline)] == ["updates_per_sec"]
@@ -0,0 +1,155 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from grids_env import GridsEnv, observe
+from grids_vec_env import GridsVecEnv
+from dqn_agent import DQNAgent, obs_to_tensor, batch_obs_to_tensor
+
+
+def test_batch_obs_matches_single_obs_layout():
+    vec_env = GridsVecEnv(2)
+    obs, _ = vec_env.reset()
+    batch = batch_obs_to_tensor(obs)
+    single = obs_to_tensor(vec_env.envs[1]._get_obs())
+    assert batch.shape == (2, len(single))
+    assert torch.equal(batch[1], single)
+
+
+def test_flat_obs_are_wrapped_without_copy():
+    vec_env = GridsVecEnv(2, obs_mode="flat")
+    obs, _ = vec_env.reset(seed=0)
+    batch = batch_obs_to_tensor(obs)
+    assert batch.data_ptr() == obs.ctypes.data
+    single = obs_to_tensor(vec_env.envs[1]._get_obs())
+    assert torch.equal(batch[1], single)
+    assert torch.equal(single, obs_to_tensor(observe(vec_env.envs[1].state)))
+
+
+def test_select_actions_returns_valid_action_per_game():
+    vec_env = GridsVecEnv(3)
+    obs, _ = vec_env.reset()
+    agent = DQNAgent(GridsEnv())
+    agent.epsilon = 0.0
+    valid = vec_env.valid_actions()
+    actions = agent.select_actions(obs, vec_env.action_masks)
+    assert len(actions) == 3
+    for action, choices in zip(actions, valid):
+        assert tuple(int(a) for a in action) in {
+            tuple(int(a) for a in c) for c in choices
+        }
+
+
+@pytest.mark.parametrize("epsilon", [0.0, 1.0])
+def test_masked_selection_only_picks_legal_actions(epsilon):
+    from actions import action_to_index
+
+    env = GridsEnv()
+    obs, info = env.reset()
+    agent = DQNAgent(env)
+    agent.epsilon = epsilon
+    legal = {action_to_index(a) for a in env.valid_actions()}
+    for _ in range(20):
+        assert action_to_index(agent.select_action(obs, info["action_mask"])) in legal
+
+    vec_env = GridsVecEnv(4)
+    obs, _ = vec_env.reset()
+    for action, mask in zip(agent.select_actions(obs, vec_env.action_masks),
+                            vec_env.action_masks):
+        assert mask[action_to_index(action)]
+
+
+def test_branching_q_helpers_agree_with_joint_values():
+    from actions import ACTION_SIZE
+    from dqn_agent import BranchingQNetwork, QNetwork, joint_q, gather_q, argmax_q
+
+    obs_size = 163
+    net = BranchingQNetwork(obs_size)
+    dense = QNetwork(obs_size, ACTION_SIZE)
+    assert sum(p.numel() for p in net.parameters()) * 20 < sum(p.numel() for p in dense.parameters())
+
+    out = net(torch.randn(5, obs_size))
+    joint = joint_q(out)
+    assert joint.shape == (5, ACTION_SIZE)
+    actions = torch.randint(0, ACTION_SIZE, (5,))
+    assert torch.allclose(gather_q(out, actions), joint[torch.arange(5), actions], atol=1e-5)
+    assert torch.equal(argmax_q(out), joint.argmax(1))
+
+
+def test_legal_argmax_matches_masked_joint_argmax():
+    from actions import ACTION_SIZE
+    from dqn_agent import BranchingQNetwork, joint_q, legal_argmax
+
+    net = BranchingQNetwork(163)
+    out = net(torch.randn(6, 163))
+    masks = torch.rand(6, ACTION_SIZE) < 0.01
+    masks[0] = False
+    masks[0, 17] = True
+    expected = joint_q(out).masked_fill(~masks, float("-inf")).argmax(1)
+    assert torch.equal(legal_argmax(out, masks), expected)
+    assert torch.equal(legal_argmax(joint_q(out), masks), expected)
+
+
+@pytest.mark.parametrize("epsilon", [0.0, 1.0])
+def test_branching_agent_selects_legal_actions_and_learns(epsilon):
+    from actions import action_to_index
+
+    env = GridsEnv()
+    obs, info = env.reset()
+    agent = DQNAgent(env, batch_size=4, network="branching")
+    agent.epsilon = epsilon
+    legal = {action_to_index(a) for a in env.valid_actions()}
+    assert action_to_index(agent.select_action(obs, info["action_mask"])) in legal
+
+    vec_env = GridsVecEnv(3)
+    obs, _ = vec_env.reset()
+    for action, mask in zip(agent.select_actions(obs, vec_env.action_masks),
+                            vec_env.action_masks):
+        assert mask[action_to_index(action)]
+
+    obs = env._get_obs()
+    for _ in range(4):
+        action = agent.select_action(obs)
+        next_obs, reward, term, _, _ = env.step(action)
+        agent.store(obs, action, reward, next_obs, term)
+        obs = next_obs
+    before = [p.clone() for p in agent.policy_net.parameters()]
+    agent.update()
+    assert any(not torch.equal(a, b) for a, b in zip(before, agent.policy_net.parameters()))
+
+
+def test_checkpoint_restores_training_state(tmp_path):
+    env = GridsEnv()
+    agent = DQNAgent(env, batch_size=4)
+    obs = env._get_obs()
+    for _ in range(8):
+        action = agent.select_action(obs)
+        next_obs, reward, term, _, _ = env.step(action)
+        agent.store(obs, action, reward, next_obs, term)
+        obs = next_obs
+    agent.update()
+    agent.decay_epsilon()
+    agent.save_checkpoint(str(tmp_path))
+    expected = torch.rand(3)
+
+    resumed = DQNAgent(GridsEnv(), batch_size=4)
+    resumed.load_checkpoint(str(tmp_path))
+    assert torch.equal(torch.rand(3), expected)
+    assert resumed.epsilon == agent.epsilon
+    assert resumed.steps_done == agent.steps_done == 1
+    assert len(resumed.buffer) == len(agent.buffer) == 8
+    assert resumed.optimizer.state_dict()["state"].keys() == agent.optimizer.state_dict()["state"].keys()
+    for a, b in zip(agent.target_net.parameters(), resumed.target_net.parameters()):
+        assert torch.equal(a, b)
+
+    torch.manual_seed(0)
+    agent.update()
+    torch.manual_seed(0)
+    resumed.update()
+    for a, b in zip(agent.policy_net.parameters(), resumed.policy_net.parameters()):
+        assert torch.equal(a, b)
+
+    with pytest.raises(ValueError):
+        DQNAgent(GridsEnv(), network="branching").load_checkpoint(str(tmp_path))
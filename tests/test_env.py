@@ -1,16 +1,22 @@
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import gym
+from unittest.mock import patch
+import numpy as np
 from grids_env import (
     GridsEnv,
     UNIT_DEPLOY_REWARD,
     ATTACK_REWARD,
     DRAW_CARD_REWARD,
     ITEM_USE_REWARD,
+    observe,
+    flatten_obs,
+    FLAT_OBS_SIZE,
 )
 from actions import ActionType
 from game_state import GameState
 from units import Warrior
+from constants import ROWS, COLUMNS
 
 
 def test_observation_contains_hand_info():
@@ -85,3 +91,126 @@ def test_draw_spell_action():
     assert env.state.current_action_points == ap_before - 1
     assert reward == DRAW_CARD_REWARD
 
+
+
+def test_headless_units_do_not_load_sprites():
+    with patch("arcade.Sprite") as MockSprite:
+        env = GridsEnv()
+        env.reset()
+        square = env.state.get_valid_deploy_squares()[0]
+        env.step((ActionType.DEPLOY, 0, square[0], square[1]))
+    assert not MockSprite.called
+    assert all(not hasattr(u, "sprite") for u in env.state.units)
+
+
+def test_action_mask_matches_valid_actions():
+    import random
+    from actions import action_to_index, ACTION_SIZE
+
+    random.seed(5)
+    env = GridsEnv()
+    obs, info = env.reset(seed=5)
+    mask = info["action_mask"]
+    assert mask.shape == (ACTION_SIZE,) and mask.dtype == bool
+    for _ in range(200):
+        valid = env.valid_actions()
+        expected = {action_to_index(a) for a in valid}
+        assert set(np.flatnonzero(env.valid_action_mask())) == expected
+        obs, reward, term, trunc, info = env.step(random.choice(valid))
+        assert info["action_mask"] is mask
+        if term:
+            obs, info = env.reset()
+
+
+def test_occupancy_index_tracks_units():
+    env = GridsEnv()
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        actions = env.valid_actions()
+        _, _, term, trunc, _ = env.step(actions[rng.integers(len(actions))])
+        grid = {(u.row, u.col): u for u in env.state.units}
+        for row in range(ROWS):
+            for col in range(COLUMNS):
+                assert env.state.unit_at(row, col) is grid.get((row, col))
+        if term or trunc:
+            env.reset()
+
+
+def test_seeded_reset_reproduces_games():
+    def play(seed):
+        env = GridsEnv()
+        env.reset(seed=seed)
+        decks = [list(map(type, env.state.spell_decks[p])) for p in (1, 2)]
+        rng = np.random.default_rng(0)
+        history = []
+        for _ in range(150):
+            actions = env.valid_actions()
+            action = actions[rng.integers(len(actions))]
+            obs, reward, term, trunc, _ = env.step(action)
+            history.append((action, reward, obs["board_health"].tobytes()))
+            if term or trunc:
+                env.reset()
+        return decks, history
+
+    assert play(7) == play(7)
+    assert play(7)[0] != play(8)[0]
+
+
+def _assert_obs_equal(obs, expected):
+    assert obs.keys() == expected.keys()
+    for key, value in expected.items():
+        np.testing.assert_array_equal(obs[key], value, err_msg=key)
+
+
+def test_incremental_observation_matches_full_rebuild():
+    env = GridsEnv()
+    env.reset(seed=3)
+    rng = np.random.default_rng(3)
+    for i in range(400):
+        actions = env.valid_actions()
+        if i % 7 == 0:
+            record = env.state.apply(actions[rng.integers(len(actions))])
+            env.state.undo(record)
+            _assert_obs_equal(env._get_obs(), observe(env.state))
+        obs, _, term, trunc, _ = env.step(actions[rng.integers(len(actions))])
+        _assert_obs_equal(obs, observe(env.state))
+        if term or trunc:
+            env.reset()
+
+
+def test_view_observations_are_read_only_and_live():
+    env = GridsEnv(copy_obs=False)
+    obs, _ = env.reset(seed=0)
+    assert not obs["board_health"].flags.writeable
+    square = env.state.get_valid_deploy_squares()[0]
+    env.step((ActionType.DEPLOY, 0, square[0], square[1]))
+    # the earlier observation's arrays follow the env
+    _assert_obs_equal(env._get_obs(), observe(env.state))
+    assert obs["board_owner"][square] == 1
+
+
+def test_flat_observation_matches_dict_layout():
+    env = GridsEnv()
+    flat_env = GridsEnv(obs_mode="flat")
+    obs, _ = env.reset(seed=5)
+    flat, _ = flat_env.reset(seed=5)
+    assert flat.shape == (FLAT_OBS_SIZE,) and flat.dtype == np.float32
+    assert flat_env.observation_space.contains(flat)
+    rng = np.random.default_rng(5)
+    for _ in range(200):
+        np.testing.assert_array_equal(flat, flatten_obs(obs))
+        actions = env.valid_actions()
+        action = actions[rng.integers(len(actions))]
+        obs, _, term, _, _ = env.step(action)
+        flat, _, _, _, _ = flat_env.step(action)
+        if term:
+            obs, _ = env.reset()
+            flat, _ = flat_env.reset()
+
+
+def test_flat_observation_writes_into_given_buffer():
+    buffer = np.zeros(FLAT_OBS_SIZE, dtype=np.float32)
+    env = GridsEnv(obs_mode="flat", obs_buffer=buffer, copy_obs=False)
+    obs, _ = env.reset(seed=0)
+    assert obs is buffer
+    np.testing.assert_array_equal(buffer, flatten_obs(observe(env.state)))
@@ -0,0 +1,104 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import copy
+import io
+import pickle
+import random
+
+from cards import Fireball
+from events import (
+    CardPlayed,
+    Damage,
+    Death,
+    EventBus,
+    Knockback,
+    Move,
+    PrintSink,
+    TurnEnded,
+    format_event,
+)
+from game_state import GameState
+from grids_env import GridsEnv
+from units import Warrior
+
+
+def test_bus_is_falsy_until_subscribed_and_filters_types():
+    bus = EventBus()
+    assert not bus
+    seen, moves = [], []
+    bus.subscribe(seen.append)
+    bus.subscribe(moves.append, (Move,))
+    assert bus
+    bus.emit(TurnEnded(1, 2))
+    bus.emit(Move(None, (0, 0), [(0, 1)]))
+    assert len(seen) == 2 and len(moves) == 1
+    bus.unsubscribe(seen.append)
+    bus.unsubscribe(moves.append)
+    assert not bus
+
+
+def test_attack_emits_damage_and_knockback_then_death():
+    state = GameState()
+    attacker = Warrior(2, 2, owner=1)
+    target = Warrior(2, 3, owner=2)
+    state.units = [u for u in state.units] + [attacker, target]
+    events = []
+    state.events.subscribe(events.append)
+
+    state.attack_unit(attacker, target)
+    assert events[0] == Damage(target, attacker.attack, target.health, attacker)
+    assert events[1] == Knockback(target, (2, 3), (2, 4))
+
+    events.clear()
+    target.health = 1
+    attacker.attacked_targets.clear()
+    state.attack_unit(attacker, target)
+    assert [type(e) for e in events] == [Damage, Death]
+    assert events[1].unit is target
+
+
+def test_actions_report_moves_cards_and_turns():
+    state = GameState()
+    events = []
+    state.events.subscribe(events.append)
+    commander = state.units[0]
+    origin = (commander.row, commander.col)
+    assert state.move_unit(commander, origin[0] + 1, origin[1])
+    assert events[-1] == Move(commander, origin, [(origin[0] + 1, origin[1])])
+
+    fireball = Fireball()
+    state.spell_hands[1].append(fireball)
+    enemy = state.units[1]
+    state.play_card(fireball, enemy)
+    assert events[-2] == CardPlayed(1, fireball, enemy)
+    assert events[-1].source is fireball
+
+    state.end_turn()
+    assert events[-1] == TurnEnded(1, 2)
+    for event in events:
+        assert isinstance(format_event(event), str)
+
+
+def test_copies_start_with_an_empty_bus():
+    state = GameState()
+    state.events.subscribe(lambda event: None)
+    assert not state.clone().events
+    assert not copy.deepcopy(state).events
+    assert not pickle.loads(pickle.dumps(state)).events
+    assert state.events
+
+
+def test_headless_play_is_silent_and_sinks_print(capsys):
+    random.seed(0)
+    env = GridsEnv()
+    env.reset(seed=0)
+    for _ in range(300):
+        _, _, term, _, _ = env.step(random.choice(env.valid_actions()))
+        if term:
+            env.reset()
+    assert capsys.readouterr().out == ""
+
+    out = io.StringIO()
+    env.state.events.subscribe(PrintSink(out))
+    env.state.end_turn()
+    assert "ended the turn" in out.getvalue()
@@ -0,0 +1,134 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import random
+import numpy as np
+from grids_env import GridsEnv
+from game_state import GameState
+from constants import ROWS, COLUMNS
+
+
+def _random_env(seed, steps):
+    random.seed(seed)
+    env = GridsEnv()
+    for _ in range(steps):
+        _, _, term, trunc, _ = env.step(random.choice(env.valid_actions()))
+        if term or trunc:
+            env.reset()
+    return env
+
+
+def _assert_same_obs(a, b):
+    for key in a:
+        assert np.array_equal(a[key], b[key]), key
+
+
+def test_clone_is_independent_and_plays_identically():
+    env = _random_env(3, 40)
+    twin = GridsEnv()
+    twin.state = env.state.clone()
+    assert all(u not in env.state.units for u in twin.state.units)
+    _assert_same_obs(env._get_obs(), twin._get_obs())
+
+    for _ in range(60):
+        action = random.choice(env.valid_actions())
+        obs, reward, term, _, _ = env.step(action)
+        twin_obs, twin_reward, twin_term, _, _ = twin.step(action)
+        _assert_same_obs(obs, twin_obs)
+        assert reward == twin_reward and term == twin_term
+        if term:
+            break
+
+
+def test_clone_leaves_original_untouched():
+    state = GameState()
+    before = [(u.row, u.col, u.health) for u in state.units]
+    hand = list(state.spell_hands[1])
+    copy = state.clone()
+    copy.units[0].health = 1
+    copy.move_unit(copy.units[0], copy.units[0].row - 1, copy.units[0].col)
+    copy.spell_hands[1].clear()
+    assert [(u.row, u.col, u.health) for u in state.units] == before
+    assert state.spell_hands[1] == hand
+    assert state.unit_at(before[0][0], before[0][1]) is state.units[0]
+
+
+def test_snapshot_restore_round_trip():
+    env = _random_env(4, 30)
+    state = env.state
+    units = list(state.units)
+    expected = env._get_obs()
+    snapshot = state.snapshot()
+    for _ in range(2):
+        for _ in range(50):
+            _, _, term, _, _ = env.step(random.choice(env.valid_actions()))
+            if term:
+                break
+        state.restore(snapshot)
+        assert state.units == units
+        assert all(state.unit_at(u.row, u.col) is u for u in units)
+        _assert_same_obs(env._get_obs(), expected)
+
+
+def _fingerprint(state):
+    units = [
+        (id(u), u.__class__, dict(u.__dict__, attacked_targets={id(t) for t in u.attacked_targets}))
+        for u in state.units
+    ]
+    grid = [id(state.unit_at(r, c)) for r in range(ROWS) for c in range(COLUMNS)]
+    piles = [
+        [list(p[player]) for player in (1, 2)]
+        for p in (state.hands, state.unit_hands, state.spell_hands, state.unit_decks, state.spell_decks)
+    ]
+    scalars = (
+        state.current_player,
+        state.current_action_points,
+        state.player1BlockedTurnsTimer,
+        state.player2BlockedTurnsTimer,
+        state.winner,
+        list(state.spell_hand),
+        list(state.unit_hand),
+    )
+    return units, grid, piles, dict(state.fires), scalars
+
+
+def test_apply_undo_restores_state_exactly():
+    rng = random.Random(7)
+    env = _random_env(7, 20)
+    state = env.state
+    checked = 0
+    for _ in range(40):
+        # walk a few plies deep, then unwind
+        stack = []
+        for _ in range(4):
+            if state.winner is not None:
+                break
+            before = _fingerprint(state)
+            action = rng.choice(state.legal_actions())
+            stack.append((before, state.apply(action)))
+        while stack:
+            before, record = stack.pop()
+            state.undo(record)
+            assert _fingerprint(state) == before
+            checked += 1
+        action = rng.choice(state.legal_actions())
+        state.perform(action)
+        if state.winner is not None:
+            env.reset()
+            state = env.state
+    assert checked > 100
+
+
+def test_apply_matches_env_step():
+    env = _random_env(8, 10)
+    twin = env.state.clone()
+    for _ in range(50):
+        action = random.choice(env.valid_actions())
+        _, _, term, _, _ = env.step(action)
+        record = twin.apply(action)
+        assert record.ok is not None
+        assert [(u.row, u.col, u.health) for u in twin.units] == [
+            (u.row, u.col, u.health) for u in env.state.units
+        ]
+        assert twin.current_player == env.state.current_player
+        if term:
+            break
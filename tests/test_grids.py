@@ -197,3 +197,24 @@ def test_trebuchet_adjacent_half_damage():
     before = enemy.health
     state.attack_unit(treb, enemy)
     assert before - enemy.health == treb.attack // 2
+
+
+def test_unit_views_follow_logical_units(game):
+    unit = next(u for u in game.units if u.owner == game.current_player)
+    dest = (unit.row - 1, unit.col)
+    game.on_update(0)
+    view = game.unit_views[unit]
+    assert game.move_unit(unit, *dest)
+    # logical position updates immediately, the view animates towards it
+    assert (unit.row, unit.col) == dest
+    game.on_update(0)
+    assert view.is_animating
+    for _ in range(20):
+        game.on_update(0.05)
+    assert (view.row, view.col) == dest
+    assert not view.is_animating
+
+    # knockback/teleport style jumps snap the view
+    game.state.relocate_unit(unit, 0, 0)
+    game.on_update(0)
+    assert (view.row, view.col) == (0, 0)
@@ -0,0 +1,124 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import threading
+import time
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from actions import ACTION_SIZE, action_to_index
+from dqn_agent import BranchingQNetwork, QNetwork, obs_to_tensor
+from grids_env import GridsEnv
+from inference_server import InferenceServer, InferenceClientAgent, play_games
+
+
+def _network(env, branching=False):
+    obs_size = len(obs_to_tensor(env._get_obs()))
+    return BranchingQNetwork(obs_size) if branching else QNetwork(obs_size, ACTION_SIZE)
+
+
+@pytest.mark.parametrize("branching", [False, True])
+def test_concurrent_requests_are_batched(branching):
+    envs = [GridsEnv() for _ in range(8)]
+    for env in envs:
+        env.reset()
+    server = InferenceServer(_network(envs[0], branching), max_batch_size=8, max_latency=0.2)
+    barrier = threading.Barrier(len(envs))
+    results = [None] * len(envs)
+
+    def request(i):
+        agent = InferenceClientAgent(server, envs[i])
+        barrier.wait()
+        results[i] = agent.select_action(envs[i]._get_obs())
+
+    with server:
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(len(envs))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    for env, action in zip(envs, results):
+        assert env.valid_action_mask()[action_to_index(action)]
+    assert server.requests == 8 and server.max_batch_seen > 1
+
+
+def test_lone_request_waits_at_most_the_deadline():
+    env = GridsEnv()
+    obs, info = env.reset()
+    with InferenceServer(_network(env), max_batch_size=64, max_latency=0.02) as server:
+        start = time.perf_counter()
+        server.infer(obs, info["action_mask"])
+        assert time.perf_counter() - start < 0.5
+    assert server.batches == 1
+
+
+def test_errors_reach_every_caller():
+    env = GridsEnv()
+    obs, info = env.reset()
+    broken = torch.nn.Linear(3, 3)  # wrong input size
+    with InferenceServer(broken) as server:
+        future = server.submit(obs, info["action_mask"])
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_submit_copies_flat_observations_from_reused_buffers():
+    env = GridsEnv(obs_mode="flat", copy_obs=False)
+    obs, info = env.reset(seed=0)
+    submitted = obs.copy()
+    seen = []
+
+    class Recorder(torch.nn.Module):
+        def __init__(self, network):
+            super().__init__()
+            self.network = network
+
+        def forward(self, x):
+            seen.append(x.clone())
+            return self.network(x)
+
+    # the batch is only evaluated once the second request arrives
+    with InferenceServer(Recorder(_network(env)), max_batch_size=2, max_latency=10) as server:
+        first = server.submit(obs, info["action_mask"])
+        obs, _, _, _, info = env.step(env.valid_actions()[0])
+        assert not (obs == submitted).all()
+        server.submit(obs, info["action_mask"]).result()
+        first.result()
+    assert torch.equal(seen[0][0], torch.from_numpy(submitted))
+
+
+def test_play_games_shares_one_server():
+    env = GridsEnv()
+    with InferenceServer(_network(env), max_latency=0.01) as server:
+        winners = play_games(server, num_games=4, max_steps=30)
+    assert len(winners) == 4
+    assert server.requests >= 4 * 1 and server.mean_batch_size >= 1
+
+
+def test_cancelled_request_does_not_stop_the_server():
+    env = GridsEnv()
+    obs, info = env.reset()
+    with InferenceServer(_network(env), max_latency=0.05) as server:
+        cancelled = server.submit(obs, info["action_mask"])
+        assert cancelled.cancel()
+        action = server.submit(obs, info["action_mask"]).result(timeout=5)
+        assert info["action_mask"][action_to_index(action)]
+        assert server.infer(obs, info["action_mask"]) == action
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_submit_fails_once_the_worker_has_died(monkeypatch):
+    env = GridsEnv()
+    obs, info = env.reset()
+    server = InferenceServer(_network(env), max_latency=0.01)
+
+    def crash(batch):
+        raise SystemExit  # not an Exception, so it ends the worker thread
+
+    monkeypatch.setattr(server, "_evaluate", crash)
+    with server:
+        with pytest.raises(RuntimeError):
+            server.infer(obs, info["action_mask"])  # drained when the thread exits
+        server._thread.join(timeout=5)
+        with pytest.raises(RuntimeError):
+            server.submit(obs, info["action_mask"])
@@ -0,0 +1,73 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import league
+from league import fit_elo, pairing_scores, run_league, play_pairing
+from dqn_agent import DQNAgent
+from grids_env import GridsEnv
+
+
+def test_fit_elo_orders_players_and_anchors_the_first():
+    # 0 beats 1 three times in four, 1 beats 2 three times in four
+    games = [(0, 1, 1.0)] * 30 + [(0, 1, 0.0)] * 10 + [(1, 2, 1.0)] * 30 + [(1, 2, 0.0)] * 10
+    ratings = fit_elo(["a", "b", "c"], games)
+    assert ratings[0].elo == 0.0 and ratings[0].low == ratings[0].high == 0.0
+    assert ratings[0].elo > ratings[1].elo > ratings[2].elo
+    # a 75% score is worth about 190 Elo
+    assert ratings[1].elo == pytest.approx(-190, abs=25)
+    assert ratings[1].low < ratings[1].elo < ratings[1].high
+    assert ratings[2].high - ratings[2].low > ratings[1].high - ratings[1].low
+    assert ratings[1].games == 80 and ratings[1].score == pytest.approx(0.5)
+
+
+def test_unbeaten_player_keeps_a_finite_rating():
+    ratings = fit_elo(["a", "b"], [(0, 1, 1.0)] * 5, anchor=None)
+    assert 0 < ratings[0].elo < 1000
+    assert ratings[0].elo == pytest.approx(-ratings[1].elo)
+
+
+def test_pairing_scores_follow_the_seats():
+    assert pairing_scores([1, 1]) == [1.0, 0.0]
+    assert pairing_scores([2, None]) == [0.0, 0.5]
+
+
+def test_mirrored_games_use_the_same_start():
+    assert play_pairing(None, None, seed=3, max_plies=60) == \
+        play_pairing(None, None, seed=3, max_plies=60)
+
+
+def test_league_caches_pairings_and_only_plays_new_ones(tmp_path, monkeypatch):
+    torch.manual_seed(0)
+    DQNAgent(GridsEnv(), buffer_size=1).save(str(tmp_path / "a.pth"))
+    ratings = run_league(str(tmp_path), seeds=range(2), max_plies=40)
+    assert set(ratings) == {"random", "a"}
+    assert ratings["a"].games == 4
+    with open(tmp_path / "league.json") as f:
+        assert len(json.load(f)["pairings"]) == 2
+
+    DQNAgent(GridsEnv(), buffer_size=1, network="branching").save(str(tmp_path / "b.pth"))
+    played = []
+    original = league.play_pairing
+
+    def counting(*args):
+        played.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(league, "play_pairing", counting)
+    ratings = run_league(str(tmp_path), seeds=range(2), max_plies=40)
+    assert set(ratings) == {"random", "a", "b"}
+    assert len(played) == 4
+    assert all(str(tmp_path / "b.pth") in args[:2] for args in played)
+
+
+def test_league_runs_on_a_process_pool(tmp_path):
+    DQNAgent(GridsEnv(), buffer_size=1).save(str(tmp_path / "a.pth"))
+    pooled = run_league(str(tmp_path), seeds=range(2), num_workers=2, max_plies=40,
+                        cache_path=str(tmp_path / "pooled.json"))
+    inline = run_league(str(tmp_path), seeds=range(2), max_plies=40,
+                        cache_path=str(tmp_path / "inline.json"))
+    assert pooled == inline
@@ -0,0 +1,63 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from actions import ActionType, ACTION_SIZE
+from dqn_agent import obs_to_tensor
+from grids_env import GridsEnv
+from mcts_agent import MCTSAgent, PolicyValueNet
+from units import Viking
+
+
+def _obs_size(env):
+    return len(obs_to_tensor(env._get_obs()))
+
+
+def test_search_returns_legal_action_without_touching_env():
+    env = GridsEnv()
+    env.reset()
+    before = env.state.compute_hash()
+    agent = MCTSAgent(simulations=64, batch_size=8)
+    action = agent.act(env)
+    assert action in env.valid_actions()
+    assert env.state.compute_hash() == before
+    assert agent.last_search["root_visits"].sum() == 64
+
+
+def test_search_finds_winning_attack():
+    env = GridsEnv()
+    env.reset()
+    state = env.state
+    enemy = next(u for u in state.units if u.owner == 2)
+    enemy.health = 30
+    state.units.append(Viking(enemy.row, enemy.col - 1, owner=1))
+    state.invalidate_hash()
+    agent = MCTSAgent(simulations=200)
+    action = agent.act(env)
+    assert action[0] == ActionType.ATTACK
+    assert (action[2], action[3]) == (enemy.row, enemy.col)
+
+
+def test_leaves_are_evaluated_in_batches():
+    env = GridsEnv()
+    env.reset()
+    net = PolicyValueNet(_obs_size(env), ACTION_SIZE)
+    calls = []
+    net.register_forward_hook(lambda module, inputs, output: calls.append(len(inputs[0])))
+    agent = MCTSAgent(network=net, simulations=96, batch_size=16)
+    action = agent.act(env)
+    assert action in env.valid_actions()
+    # one call for the root and one per batch of simulations
+    assert len(calls) == 1 + agent.last_search["batches"] == 7
+    assert max(calls) > 1
+
+
+def test_time_budget_bounds_search():
+    env = GridsEnv()
+    env.reset()
+    agent = MCTSAgent(simulations=None, time_limit=0.05)
+    agent.act(env)
+    assert agent.last_search["simulations"] > 0
+    assert agent.last_search["seconds"] < 0.5
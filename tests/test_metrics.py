@@ -0,0 +1,115 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+import metrics
+from grids_env import GridsEnv
+
+
+@pytest.fixture
+def registry():
+    metrics.registry.reset()
+    yield metrics.enable(trace=True)
+    metrics.disable()
+    metrics.registry.reset()
+
+
+def test_histogram_percentiles_are_close():
+    values = np.random.default_rng(0).lognormal(10, 1, 20000)
+    histogram = metrics.Histogram()
+    for value in values:
+        histogram.record(value)
+    for q in metrics.PERCENTILES:
+        exact = np.quantile(values, q)
+        assert exact <= histogram.percentile(q) <= exact * 1.1
+    assert histogram.max == values.max() and histogram.count == len(values)
+
+    merged = metrics.Histogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    merged.merge(histogram)
+    assert merged.count == 2 * len(values)
+    assert merged.percentile(0.5) == histogram.percentile(0.5)
+
+
+def test_disabled_registry_records_nothing():
+    metrics.registry.reset()
+    env = GridsEnv()
+    env.reset(seed=0)
+    env.step(env.valid_actions()[0])
+    with metrics.span("idle"):
+        pass
+    metrics.count("idle")
+    assert not metrics.registry.histograms and not metrics.registry.counters
+
+
+def test_env_step_and_valid_actions_report_spans(registry):
+    env = GridsEnv()
+    env.reset(seed=0)
+    for _ in range(20):
+        _, _, term, _, _ = env.step(env.valid_actions()[0])
+        if term:
+            env.reset()
+    assert registry.histograms["env.step"].count == 20
+    assert registry.histograms["env.valid_actions"].count == 20
+    assert registry.histograms["game_state.perform"].count == 20
+    assert registry.histograms["env.step"].unit == "ns"
+    names = {event[0] for event in registry.events}
+    assert {"env.step", "env.valid_actions", "game_state.legal_actions"} <= names
+
+
+def _child(directory):
+    with metrics.span("child.work"):
+        metrics.count("child.items", 3)
+    metrics.registry.dump(directory)
+
+
+def _child_work():
+    with metrics.span("child.work"):
+        metrics.count("child.items")
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn"])
+def test_children_dump_when_they_exit(registry, tmp_path, method):
+    if method == "spawn":
+        # spawned children import metrics afresh and enable it from the variable
+        os.environ[metrics.ENV_VAR] = str(tmp_path)
+    registry.directory = str(tmp_path)
+    try:
+        process = mp.get_context(method).Process(target=_child_work)
+        process.start()
+        process.join()
+    finally:
+        os.environ.pop(metrics.ENV_VAR, None)
+    assert process.exitcode == 0
+    paths = list(tmp_path.glob("metrics-*.jsonl"))
+    assert [path.name for path in paths] == [f"metrics-{process.pid}.jsonl"]
+    counters, histograms = metrics.load(paths)
+    assert counters == {"child.items": 1} and histograms["child.work"].count == 1
+
+
+def test_dump_merges_processes(registry, tmp_path):
+    metrics.count("child.items")
+    with metrics.span("parent.work"):
+        process = mp.get_context("fork").Process(target=_child, args=(str(tmp_path),))
+        process.start()
+        process.join()
+    registry.dump(str(tmp_path))
+
+    paths = sorted(tmp_path.glob("metrics-*.jsonl"))
+    assert len(paths) == 2
+    counters, histograms = metrics.load(paths)
+    # the child starts empty after the fork instead of repeating the parent's count
+    assert counters["child.items"] == 4
+    assert histograms["child.work"].count == 1 and histograms["parent.work"].count == 1
+
+    trace = metrics.merge_traces(sorted(tmp_path.glob("trace-*.json")))
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert {event["name"] for event in spans} == {"child.work", "parent.work"}
+    assert len({event["pid"] for event in spans}) == 2
+
+    out = tmp_path / "merged.json"
+    metrics.main([str(tmp_path), "--trace", str(out)])
+    assert len(json.loads(out.read_text())["traceEvents"]) == len(trace["traceEvents"])
@@ -0,0 +1,119 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import io
+import random
+from unittest.mock import patch
+
+import pytest
+
+from cards import Teleport
+from recording import (
+    GameRecorder,
+    GameRecording,
+    decode_state,
+    encode_state,
+    new_game,
+)
+
+
+def _record(seed=3, plies=300, checkpoint_every=32):
+    recorder = GameRecorder(seed, checkpoint_every=checkpoint_every)
+    rng = random.Random(seed)
+    for _ in range(plies):
+        recorder.perform(rng.choice(recorder.state.legal_actions()))
+        if recorder.state.winner is not None:
+            break
+    return recorder
+
+
+def _round_trip(recorder):
+    buf = io.BytesIO()
+    recorder.write(buf)
+    return GameRecording.read(io.BytesIO(buf.getvalue())), buf.getvalue()
+
+
+def test_replay_reproduces_the_recorded_game():
+    recorder = _record()
+    recording, data = _round_trip(recorder)
+    assert recording.actions == recorder.actions
+    assert sorted(recording.checkpoints) == list(range(32, len(recorder.actions) + 1, 32))
+    assert encode_state(recording.final_state()) == encode_state(recorder.state)
+
+    # seeking from a checkpoint agrees with replaying from the start
+    ply = 32 * 2 + 5
+    states = [encode_state(state) for state, _ in recording.replay()]
+    assert encode_state(recording.state_at(ply)) == states[ply]
+
+    bare, bare_data = _round_trip(_record(checkpoint_every=0))
+    assert len(bare_data) == 16 + 3 + 2 * len(bare) + 21
+
+
+def test_decoded_state_continues_identically():
+    state = new_game(11)
+    rng = random.Random(0)
+    for _ in range(60):
+        state.perform(rng.choice(state.legal_actions()))
+    # Teleport without a selected unit picks its unit with the state's RNG
+    state.spell_hands[state.current_player].append(Teleport())
+    state.hands[state.current_player].append(state.spell_hands[state.current_player][-1])
+    state.refresh_player_hands()
+    copy = decode_state(encode_state(state))
+    assert copy.zobrist_hash == state.zobrist_hash
+    assert copy.legal_actions() == state.legal_actions()
+    for _ in range(60):
+        action = rng.choice(state.legal_actions())
+        state.perform(action)
+        copy.perform(action)
+        assert encode_state(copy) == encode_state(state)
+
+
+def test_recorder_attaches_to_an_env_game():
+    from grids_env import GridsEnv
+
+    env = GridsEnv(record=True)
+    env.reset(seed=5)
+    assert env.recorder.state is env.state
+    assert env.recorder.seed == env.state.seed
+    rng = random.Random(5)
+    for _ in range(80):
+        _, _, terminated, _, _ = env.step(rng.choice(env.state.legal_actions()))
+        if terminated:
+            break
+    recording, _ = _round_trip(env.recorder)
+    assert encode_state(recording.final_state()) == encode_state(env.state)
+
+    # states that were already played cannot be recorded from their start
+    with pytest.raises(ValueError):
+        GameRecorder(state=env.state)
+    # a fresh state keeps the seed it drew and clones keep it too
+    state = new_game(None)
+    assert GameRecorder(state=state).seed == state.seed == state.clone().seed
+
+
+def test_corrupt_or_diverging_recordings_are_detected():
+    recorder = _record(plies=80)
+    _, data = _round_trip(recorder)
+    with pytest.raises(ValueError):
+        GameRecording.read(io.BytesIO(b"XXXX" + data[4:]))
+    with pytest.raises(ValueError):
+        GameRecording.read(io.BytesIO(data[:-5]))
+
+    recording = GameRecording.read(io.BytesIO(data))
+    recording.actions[3] = recorder.actions[4]
+    with pytest.raises(RuntimeError):
+        recording.final_state()
+
+
+def test_replay_viewer_steps_and_seeks():
+    from watch_replay import ReplayViewer
+
+    recorder = _record(plies=100)
+    recording, _ = _round_trip(recorder)
+    with patch("arcade.Window.__init__", return_value=None), patch("arcade.Sprite"):
+        viewer = ReplayViewer(recording, step_delay=0)
+        while viewer.step():
+            viewer.on_update(0.05)
+        assert encode_state(viewer.state) == encode_state(recorder.state)
+        viewer.seek(40)
+        assert encode_state(viewer.state) == encode_state(recording.state_at(40))
+        assert viewer.units is viewer.state.units
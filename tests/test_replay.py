@@ -0,0 +1,230 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import random
+from collections import deque
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from actions import action_to_index
+from dqn_agent import obs_to_tensor
+from grids_vec_env import GridsVecEnv
+from actions import ACTION_SIZE
+from replay import (
+    BOARD_CELLS,
+    SMALL_SIZE,
+    PrioritizedReplayMemory,
+    ReplayMemory,
+    SumTree,
+    encode_obs,
+)
+
+
+def _collect(num_envs=3, steps=150, seed=0):
+    """Return ``(stream, obs, action, reward, next_obs, done)`` from random play."""
+    random.seed(seed)
+    env = GridsVecEnv(num_envs, max_episode_steps=40)
+    obs, _ = env.reset(seed=seed)
+    transitions = []
+    for _ in range(steps):
+        actions = [random.choice(valid) for valid in env.valid_actions()]
+        prev = {key: value.copy() for key, value in obs.items()}
+        obs, rewards, terms, truncs, infos = env.step(actions)
+        for i, info in enumerate(infos):
+            next_obs = info.get("final_observation") or {
+                key: value[i].copy() for key, value in obs.items()
+            }
+            transitions.append((
+                i,
+                {key: value[i] for key, value in prev.items()},
+                actions[i],
+                float(rewards[i]),
+                next_obs,
+                bool(terms[i] or truncs[i]),
+            ))
+    return transitions
+
+
+def test_sample_matches_reference_buffer_after_wraparound():
+    transitions = _collect()
+    memory = ReplayMemory(100, seed=0)
+    reference = deque(maxlen=100)
+    for stream, *transition in transitions:
+        memory.store(*transition, stream=stream)
+        reference.append(transition)
+    assert len(memory) == len(reference) == 100
+
+    # transition ``k`` of the reference lives in ring slot ``(pos + k) % capacity``
+    indices = np.arange(100)
+    states, actions, rewards, next_states, dones = memory.sample(100, (memory.pos + indices) % 100)
+    for k, (obs, action, reward, next_obs, done) in enumerate(reference):
+        assert torch.equal(states[k], obs_to_tensor(obs))
+        assert torch.equal(next_states[k], obs_to_tensor(next_obs))
+        assert actions[k] == action_to_index(action)
+        assert rewards[k] == pytest.approx(reward)
+        assert dones[k] == float(done)
+    assert states.dtype == torch.float32 and actions.dtype == torch.int64
+
+
+def test_consecutive_observations_share_frames():
+    transitions = _collect(num_envs=2, steps=100, seed=1)
+    memory = ReplayMemory(1000)
+    for stream, *transition in transitions:
+        memory.store(*transition, stream=stream)
+    frames_in_use = int((memory.refcount > 0).sum())
+    assert frames_in_use < 1.5 * len(memory)
+    assert memory.refcount.sum() == 2 * len(memory)
+
+
+def test_store_encoded_matches_store():
+    transitions = _collect(num_envs=2, steps=40, seed=3)
+    memory = ReplayMemory(200)
+    encoded = ReplayMemory(200)
+    n = len(transitions)
+    small = np.zeros((2, n, SMALL_SIZE), dtype=np.int8)
+    health = np.zeros((2, n, BOARD_CELLS), dtype=np.int16)
+    for k, (stream, obs, action, reward, next_obs, done) in enumerate(transitions):
+        memory.store(obs, action, reward, next_obs, done, stream=stream)
+        encode_obs(obs, small[0, k], health[0, k])
+        encode_obs(next_obs, small[1, k], health[1, k])
+    encoded.store_encoded(
+        small[0], health[0], [action_to_index(t[2]) for t in transitions],
+        [t[3] for t in transitions], small[1], health[1],
+        [t[5] for t in transitions], [t[0] for t in transitions],
+    )
+    indices = np.arange(n)
+    for a, b in zip(memory.sample(n, indices), encoded.sample(n, indices)):
+        assert torch.equal(a, b)
+    assert np.array_equal(memory.refcount, encoded.refcount)
+
+
+def test_flat_observations_encode_like_dicts():
+    from grids_env import flatten_obs
+
+    for _, obs, _, _, next_obs, _ in _collect(num_envs=2, steps=10, seed=4):
+        rows = np.zeros((2, SMALL_SIZE), dtype=np.int8), np.zeros((2, BOARD_CELLS), dtype=np.int16)
+        encode_obs(obs, rows[0][0], rows[1][0])
+        encode_obs(flatten_obs(obs), rows[0][1], rows[1][1])
+        assert np.array_equal(rows[0][0], rows[0][1])
+        assert np.array_equal(rows[1][0], rows[1][1])
+
+
+def test_pool_grows_when_frames_cannot_be_shared():
+    transitions = _collect(num_envs=2, steps=60, seed=2)
+    memory = ReplayMemory(50)
+    for k, (_, *transition) in enumerate(transitions):
+        memory.store(*transition, stream=k)
+    assert len(memory.refcount) <= 2 * memory.capacity
+    assert int((memory.refcount > 0).sum()) == 2 * len(memory)
+    obs, action, *_ = transitions[-1][1:]
+    states, actions, *_ = memory.sample(1, np.array([(memory.pos - 1) % 50]))
+    assert torch.equal(states[0], obs_to_tensor(obs))
+    assert actions[0] == action_to_index(action)
+
+
+def test_sum_tree_batch_updates_and_proportional_lookup():
+    tree = SumTree(5)
+    tree.update([0, 1, 2, 3, 4], [1.0, 0.0, 3.0, 2.0, 4.0])
+    assert tree.total == 10.0
+    assert list(tree.find([0.5, 1.0, 1.5, 3.99, 4.5, 6.0, 6.5, 9.9])) == [0, 0, 2, 2, 3, 3, 4, 4]
+    tree.update([2, 2, 4], [0.0, 5.0, 1.0])
+    assert tree.total == 9.0
+    # every internal node is the sum of its children
+    for node in range(1, tree.size):
+        assert tree.tree[node] == tree.tree[2 * node] + tree.tree[2 * node + 1]
+
+
+def test_prioritized_sampling_follows_priorities():
+    transitions = _collect(num_envs=1, steps=20, seed=3)
+    memory = PrioritizedReplayMemory(20, alpha=1.0, epsilon=0.0, seed=0)
+    for stream, *transition in transitions:
+        memory.store(*transition, stream=stream)
+    n = len(memory)
+    memory.update_priorities(np.arange(n), np.where(np.arange(n) == 7, 9.0, 1.0 / (n - 1)))
+    counts = np.bincount(
+        np.concatenate([memory.sample_indices(10) for _ in range(500)]), minlength=n
+    )
+    assert counts[7] / counts.sum() == pytest.approx(0.9, abs=0.03)
+    weights = memory.importance_weights(np.array([7, 0]))
+    assert weights.max() == 1.0 and weights[0] < weights[1]
+
+
+def test_prioritized_agent_update_refreshes_priorities():
+    from grids_env import GridsEnv
+    from dqn_agent import DQNAgent
+
+    agent = DQNAgent(GridsEnv(), batch_size=8, prioritized=True)
+    for stream, *transition in _collect(num_envs=2, steps=10, seed=4):
+        agent.store(*transition, stream=stream)
+    before = agent.buffer.tree[np.arange(len(agent.buffer))].copy()
+    agent.update()
+    after = agent.buffer.tree[np.arange(len(agent.buffer))]
+    assert not np.array_equal(before, after)
+    assert agent.buffer.batches_sampled == 1
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_save_and_load_round_trip_memory_mapped(tmp_path, prioritized):
+    make = PrioritizedReplayMemory if prioritized else ReplayMemory
+    memory = make(60, seed=5)
+    transitions = _collect(num_envs=2, steps=40, seed=5)
+    for stream, *transition in transitions[:50]:
+        memory.store(*transition, stream=stream)
+    if prioritized:
+        memory.update_priorities(np.arange(10), np.linspace(0.1, 5.0, 10))
+    memory.save(str(tmp_path))
+
+    restored = make(60)
+    restored.load(str(tmp_path))
+    assert isinstance(restored.small, np.memmap)
+    assert (restored.pos, restored.size) == (memory.pos, memory.size)
+    indices = memory.sample_indices(16)
+    assert np.array_equal(restored.sample_indices(16), indices)
+    for a, b in zip(memory.sample(16, indices), restored.sample(16, indices)):
+        assert torch.equal(a, b)
+
+    # both memories keep evolving identically; the files stay untouched
+    for stream, *transition in transitions[50:]:
+        memory.store(*transition, stream=stream)
+        restored.store(*transition, stream=stream)
+    assert np.array_equal(memory.refcount, restored.refcount)
+    assert np.load(tmp_path / "refcount.npy").sum() == 2 * 50
+    restored.save(str(tmp_path))
+    assert np.array_equal(np.load(tmp_path / "actions.npy"), memory.actions)
+
+    with pytest.raises(ValueError):
+        make(30).load(str(tmp_path))
+
+
+def test_largest_action_index_round_trips():
+    (_, obs, _, _, next_obs, _), = _collect(num_envs=1, steps=1)
+    memory = ReplayMemory(4)
+    memory.store(obs, ACTION_SIZE - 1, 0.0, next_obs, False)
+    assert int(memory.sample(1, np.array([0]))[1][0]) == ACTION_SIZE - 1
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_repeated_saves_only_rewrite_changed_rows(tmp_path, prioritized):
+    make = PrioritizedReplayMemory if prioritized else ReplayMemory
+    memory = make(60, seed=6)
+    transitions = _collect(num_envs=2, steps=60, seed=6)
+    for stream, *transition in transitions[:40]:
+        memory.store(*transition, stream=stream)
+    memory.save(str(tmp_path))
+    inode = os.stat(tmp_path / "actions.npy").st_ino
+    # wrap around the ring and reprioritize between saves
+    for stream, *transition in transitions[40:]:
+        memory.store(*transition, stream=stream)
+    if prioritized:
+        memory.update_priorities(np.arange(0, 60, 7), np.linspace(0.1, 3.0, 9))
+    memory.save(str(tmp_path))
+    assert os.stat(tmp_path / "actions.npy").st_ino == inode
+
+    restored = make(60)
+    restored.load(str(tmp_path), mmap_mode=None)
+    for name, array in memory._arrays().items():
+        assert np.array_equal(getattr(restored, name) if name != "priorities"
+                              else restored.tree.tree, array), name
+    assert restored._free == memory._free
+    assert restored._last_frame == memory._last_frame
@@ -0,0 +1,67 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import json
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from dqn_agent import QNetwork
+from train_dqn import SharedWeights, apex_epsilons, train_async
+
+
+def test_apex_epsilons_span_from_base_to_greedy():
+    epsilons = apex_epsilons(4)
+    assert epsilons[0] == pytest.approx(0.4)
+    assert epsilons[-1] == pytest.approx(0.4 ** 8)
+    assert epsilons == sorted(epsilons, reverse=True)
+    assert apex_epsilons(1) == [0.4]
+
+
+def test_shared_weights_round_trip():
+    source, target = QNetwork(8, 5), QNetwork(8, 5)
+    num_params = sum(p.numel() for p in source.parameters())
+    weights = SharedWeights(num_params)
+    reader = SharedWeights(num_params, name=weights.name)
+    try:
+        assert reader.pull(target, -1) == -1  # nothing published yet
+        weights.publish(source)
+        version = reader.pull(target, -1)
+        assert version == weights.version and version % 2 == 0
+        for a, b in zip(source.parameters(), target.parameters()):
+            assert torch.equal(a, b)
+        with torch.no_grad():
+            next(target.parameters()).zero_()
+        # an unchanged version is not copied again
+        assert reader.pull(target, version) == version
+        assert not torch.equal(next(source.parameters()), next(target.parameters()))
+    finally:
+        reader.close()
+        weights.close()
+
+
+def test_train_async_learns_from_actor_transitions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = train_async(num_episodes=3, max_steps=20, num_actors=2, envs_per_actor=2,
+                        chunk_size=8, report=False)
+    assert len(agent.buffer) >= agent.batch_size
+    assert agent.steps_done > 0
+    assert (tmp_path / "dqn_model.pth").exists()
+
+
+def test_train_resumes_from_checkpoint(tmp_path, monkeypatch):
+    from train_dqn import train
+
+    monkeypatch.chdir(tmp_path)
+    checkpoint = str(tmp_path / "run")
+    train(num_episodes=2, max_steps=10, num_envs=2, checkpoint_dir=checkpoint,
+          checkpoint_every=1)
+    with open(tmp_path / "run" / "training.json") as f:
+        first = json.load(f)
+    assert len(first["episode_rewards"]) == 2
+    assert (tmp_path / "run" / "agent1" / "replay" / "small.npy").exists()
+
+    train(num_episodes=4, max_steps=10, num_envs=2, checkpoint_dir=checkpoint)
+    with open(tmp_path / "run" / "training.json") as f:
+        second = json.load(f)
+    assert second["episode_rewards"][:2] == first["episode_rewards"]
+    assert len(second["episode_rewards"]) == 4
@@ -0,0 +1,100 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import numpy as np
+from grids_vec_env import GridsVecEnv, SubprocGridsVecEnv
+from actions import ActionType
+from constants import ROWS, COLUMNS, HAND_CAPACITY
+
+
+def test_reset_returns_stacked_observations():
+    vec_env = GridsVecEnv(3)
+    obs, infos = vec_env.reset()
+    assert obs["board_owner"].shape == (3, ROWS, COLUMNS)
+    assert obs["board_health"].shape == (3, ROWS, COLUMNS)
+    assert obs["unit_hand"].shape == (3, HAND_CAPACITY)
+    assert list(obs["current_player"]) == [1, 1, 1]
+    assert len(infos) == 3
+
+
+def test_step_applies_one_action_per_game():
+    vec_env = GridsVecEnv(2)
+    vec_env.reset()
+    actions = [
+        (ActionType.DRAW_SPELL, 0, 0, 0),
+        (ActionType.END_TURN, 0, 0, 0),
+    ]
+    obs, rewards, terms, truncs, infos = vec_env.step(actions)
+    assert obs["action_points"][0] == 6
+    assert obs["current_player"][1] == 2
+    assert rewards.shape == (2,)
+    assert not terms.any() and not truncs.any()
+
+
+def test_finished_games_reset_automatically():
+    vec_env = GridsVecEnv(2, max_episode_steps=2)
+    vec_env.reset()
+    end_turn = np.array([[ActionType.END_TURN, 0, 0, 0]] * 2)
+    vec_env.step(end_turn)
+    obs, rewards, terms, truncs, infos = vec_env.step(end_turn)
+    assert truncs.all()
+    for info in infos:
+        assert info["episode"]["l"] == 2
+        assert info["final_observation"]["current_player"] == 1
+    # new episodes start with player 1 again after two end turns
+    assert list(obs["current_player"]) == [1, 1]
+    assert list(vec_env.episode_lengths) == [0, 0]
+
+
+def test_invalid_action_terminates_only_its_game():
+    vec_env = GridsVecEnv(2)
+    vec_env.reset()
+    actions = [
+        (ActionType.MOVE, 19, 0, 0),
+        (ActionType.DRAW_UNIT, 0, 0, 0),
+    ]
+    _, rewards, terms, _, infos = vec_env.step(actions)
+    assert list(terms) == [True, False]
+    assert rewards[0] == -1.0
+    assert "episode" in infos[0] and "episode" not in infos[1]
+
+
+def test_subproc_env_writes_into_shared_buffers():
+    with SubprocGridsVecEnv(3, num_workers=2, max_episode_steps=2) as vec_env:
+        obs, infos = vec_env.reset()
+        assert len(infos) == 3
+        assert obs["board_owner"].shape == (3, ROWS, COLUMNS)
+        assert len(vec_env.valid_actions()) == 3
+        actions = np.array([[ActionType.DRAW_SPELL, 0, 0, 0]] * 3)
+        same_obs, rewards, terms, truncs, _ = vec_env.step(actions)
+        assert same_obs is obs
+        assert list(obs["action_points"]) == [6, 6, 6]
+        _, _, _, truncs, infos = vec_env.step(actions)
+        assert truncs.all()
+        assert all(info["episode"]["l"] == 2 for info in infos)
+        assert list(obs["action_points"]) == [7, 7, 7]
+    assert vec_env.closed
+
+
+def test_flat_obs_mode_fills_rows_of_one_matrix():
+    from grids_env import FLAT_OBS_SIZE, flatten_obs, observe
+
+    vec_env = GridsVecEnv(2, max_episode_steps=2, obs_mode="flat")
+    obs, _ = vec_env.reset(seed=0)
+    assert obs.shape == (2, FLAT_OBS_SIZE) and obs.flags.c_contiguous
+    end_turn = [(ActionType.END_TURN, 0, 0, 0)] * 2
+    same_obs, _, _, _, _ = vec_env.step(end_turn)
+    assert same_obs is obs
+    assert list(vec_env.current_players) == [2, 2]
+    for i, env in enumerate(vec_env.envs):
+        np.testing.assert_array_equal(obs[i], flatten_obs(observe(env.state)))
+    _, _, _, truncs, infos = vec_env.step(end_turn)
+    assert truncs.all()
+    assert infos[0]["final_observation"][0] == 1
+    assert infos[0]["final_observation"] is not obs[0]
+
+
+def test_subproc_flat_obs_mode():
+    with SubprocGridsVecEnv(2, num_workers=2, obs_mode="flat") as vec_env:
+        obs, _ = vec_env.reset()
+        vec_env.step(np.array([[ActionType.DRAW_SPELL, 0, 0, 0]] * 2))
+        assert list(obs[:, 1]) == [6, 6]
@@ -0,0 +1,80 @@
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import random
+from actions import ActionType
+from game_state import GameState
+from units import Warrior, Archer
+from zobrist import TranspositionTable
+
+
+def test_incremental_hash_matches_full_recompute():
+    rng = random.Random(11)
+    state = GameState()
+    for _ in range(300):
+        before = state.zobrist_hash
+        records = []
+        for _ in range(3):
+            records.append(state.apply(rng.choice(state.legal_actions())))
+            assert state._zobrist is not None
+            assert state._zobrist == state.compute_hash()
+            if state.winner is not None:
+                break
+        while records:
+            state.undo(records.pop())
+        assert state.zobrist_hash == before == state.compute_hash()
+        state.apply(rng.choice(state.legal_actions()))
+        if state.winner is not None:
+            state = GameState()
+
+
+def test_move_orders_reaching_same_position_share_hash():
+    state = GameState()
+    state.units = state.units[:2] + [Warrior(1, 1, owner=1), Archer(5, 1, owner=1)]
+    start = state.zobrist_hash
+    first = (ActionType.MOVE, 2, 1, 2)
+    second = (ActionType.MOVE, 3, 5, 2)
+
+    records = [state.apply(first), state.apply(second)]
+    forward = state.zobrist_hash
+    assert forward != start
+    for record in reversed(records):
+        state.undo(record)
+    assert state.zobrist_hash == start
+
+    state.apply(second)
+    state.apply(first)
+    assert state.zobrist_hash == forward
+
+
+def test_direct_mutation_marks_hash_stale():
+    state = GameState()
+    before = state.zobrist_hash
+    commander = state.units[0]
+    state.move_unit(commander, commander.row - 1, commander.col)
+    assert state.zobrist_hash != before
+    assert state.zobrist_hash == state.compute_hash()
+
+
+def test_transposition_table_bounds_and_statistics():
+    table = TranspositionTable(capacity=8, ways=2)
+    assert table.capacity == 8
+    table.store(1, "a", depth=3)
+    assert table.get(1).value == "a"
+    assert table.get(1, min_depth=4) is None
+    assert table.get(2) is None
+    assert table.stats()["hits"] == 1 and table.hit_rate == 1 / 3
+
+    # a shallower result from the same search does not overwrite a deeper one
+    table.store(1, "b", depth=1)
+    assert table.get(1).value == "a"
+
+    # keys 1, 5 and 9 share a bucket; the oldest generation is evicted first
+    table.store(5, "c", depth=9)
+    table.new_search()
+    table.store(9, "d", depth=0)
+    assert 1 not in table and 5 in table and 9 in table
+
+    for key in range(100):
+        table.store(key, key)
+    assert len(table) <= table.capacity
+    assert table.stats()["replacements"] > 0
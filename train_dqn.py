@@ -1,16 +1,40 @@
 """Simple DQN self-play training loop for GridsEnv.
 
+Several games are stepped together through :class:`GridsVecEnv` so action
+selection can be batched across them.
+
+:func:`train_async` instead runs self-play in separate actor processes that
+stream transitions to a learner training continuously in the main process.
+
 After training completes a progress graph and some statistics are
-displayed. The learned weights of ``agent1`` are saved to ``dqn_model.pth``.
+displayed. The learned weights of ``agent1`` (or of the learner) are saved
+to ``dqn_model.pth``.
 """
 
-from typing import List, Optional
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+from collections import Counter
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
 
 import numpy as np
+import torch
 import matplotlib.pyplot as plt
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
 
 from grids_env import GridsEnv, UNIT_TYPES, SPELL_TYPES
+from grids_vec_env import GridsVecEnv, SubprocGridsVecEnv
 from dqn_agent import DQNAgent
+from actions import action_to_index
+from replay import ACTION_DTYPE, BOARD_CELLS, SMALL_SIZE, encode_obs
+
+# Ape-X exploration schedule: actor i of N explores with
+# APEX_EPSILON ** (1 + APEX_ALPHA * i / (N - 1)).
+APEX_EPSILON = 0.4
+APEX_ALPHA = 7.0
 
 
 def _print_table(rows: List[List[str]], title: str) -> None:
@@ -21,59 +45,189 @@ def _print_table(rows: List[List[str]], title: str) -> None:
         print(f"{name:<{col_width}}{value}")
 
 
-def train(num_episodes: int = 600, max_steps: int = 115) -> None:
-    env = GridsEnv()
-    agent1 = DQNAgent(env)
-    agent2 = DQNAgent(env)
+def _new_progress() -> dict:
+    """Return empty per-episode statistics as collected by the training loops."""
+    return {
+        "episode_rewards": [],
+        "episode_lengths": [],
+        "winners": [],
+        "unit_usage": {cls.__name__: 0 for cls in UNIT_TYPES},
+        "spell_usage": {cls.__name__: 0 for cls in SPELL_TYPES},
+    }
+
+
+def save_training(directory: str, agents: dict, progress: dict) -> None:
+    """Checkpoint every agent of ``agents`` (name -> agent) and ``progress``.
+
+    ``training.json`` is replaced last, so an interrupted save leaves the
+    previous checkpoint's statistics in place.
+    """
+    for name, agent in agents.items():
+        agent.save_checkpoint(os.path.join(directory, str(name)))
+    path = os.path.join(directory, "training.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(progress, f)
+    os.replace(path + ".tmp", path)
+    print(f"Checkpoint saved to {directory} "
+          f"after {len(progress['episode_rewards'])} episodes")
+
+
+def load_training(directory: str, agents: dict) -> dict:
+    """Restore ``agents`` from :func:`save_training` and return the progress.
+
+    Returns fresh statistics when ``directory`` holds no checkpoint yet.
+    """
+    path = os.path.join(directory, "training.json")
+    if not os.path.exists(path):
+        return _new_progress()
+    for name, agent in agents.items():
+        agent.load_checkpoint(os.path.join(directory, str(name)))
+    with open(path) as f:
+        progress = json.load(f)
+    print(f"Resumed from {directory} after {len(progress['episode_rewards'])} episodes")
+    return progress
+
+
+def self_play_step(vec_env, agents: Dict[int, DQNAgent], obs: np.ndarray):
+    """Advance every game of ``vec_env`` by one action and learn from it.
+
+    Each agent of ``agents`` (player -> agent) picks the actions of the
+    games in which it is to move with one batched forward pass, every
+    transition is stored in the replay memory of the agent that acted, and
+    each agent that acted performs one update. ``obs`` are the flat
+    observations returned by the last ``reset`` or ``step``; returns the
+    new observations and the env's infos.
+    """
+    players = vec_env.current_players.copy()
+    actions: List = [None] * len(players)
+    for player, agent in agents.items():
+        slots = np.flatnonzero(players == player)
+        if len(slots) == 0:
+            continue
+        chosen = agent.select_actions(obs[slots], vec_env.action_masks[slots])
+        for i, action in zip(slots, chosen):
+            actions[i] = action
+
+    # the vectorized env overwrites its buffers in place
+    prev_obs = obs.copy()
+    obs, rewards, terms, _, infos = vec_env.step(actions)
+
+    for i, info in enumerate(infos):
+        if "final_observation" in info:
+            next_obs = info["final_observation"]
+        else:
+            next_obs = obs[i].copy()
+        agents[players[i]].store(
+            prev_obs[i],
+            actions[i],
+            float(rewards[i]),
+            next_obs,
+            bool(terms[i]),
+            stream=i,
+        )
 
-    unit_usage = {cls.__name__: 0 for cls in UNIT_TYPES}
-    spell_usage = {cls.__name__: 0 for cls in SPELL_TYPES}
+    for player in np.unique(players):
+        agents[int(player)].update()
+    return obs, infos
 
-    episode_rewards: List[float] = []
-    episode_lengths: List[int] = []
-    winners: List[Optional[int]] = []
 
-    for ep in range(num_episodes):
-        obs, _ = env.reset()
-        total_reward = 0.0
-        step_count = 0
-        winner: Optional[int] = None
+def train(num_episodes: int = 600, max_steps: int = 115, num_envs: int = 8,
+          num_workers: int = 0, prioritized: bool = False,
+          network: str = "dense", checkpoint_dir: Optional[str] = None,
+          checkpoint_every: int = 50) -> None:
+    """Train two agents in self-play on ``num_envs`` games at once.
 
-        for step in range(max_steps):
-            current = env.state.current_player
-            agent = agent1 if current == 1 else agent2
-            action = agent.select_action(obs)
-            next_obs, reward, term, trunc, info = env.step(action)
+    Every vectorized step is one :func:`self_play_step`: actions for all
+    games controlled by the same agent are chosen with a single batched
+    forward pass and each agent performs one update per step in which it
+    acted. With ``num_workers`` > 0 the games
+    are stepped in that many subprocesses via :class:`SubprocGridsVecEnv`.
+    ``prioritized`` switches both agents to prioritized experience replay
+    and ``network`` selects their Q-network (see :class:`DQNAgent`).
+
+    With ``checkpoint_dir`` both agents (replay memories included) and the
+    statistics are saved there every ``checkpoint_every`` episodes and at
+    the end, and training resumes from an existing checkpoint. Games that
+    were in progress when the checkpoint was taken are not restored.
+    """
+    if num_workers:
+        vec_env = SubprocGridsVecEnv(num_envs, num_workers, max_episode_steps=max_steps,
+                                     obs_mode="flat")
+    else:
+        vec_env = GridsVecEnv(num_envs, max_episode_steps=max_steps, obs_mode="flat")
+    agent1 = DQNAgent(GridsEnv(), prioritized=prioritized, network=network)
+    agent2 = DQNAgent(GridsEnv(), prioritized=prioritized, network=network)
+    agents = {1: agent1, 2: agent2}
+    checkpoint_agents = {"agent1": agent1, "agent2": agent2}
+
+    if checkpoint_dir is not None:
+        progress = load_training(checkpoint_dir, checkpoint_agents)
+    else:
+        progress = _new_progress()
+    unit_usage = progress["unit_usage"]
+    spell_usage = progress["spell_usage"]
+    episode_rewards: List[float] = progress["episode_rewards"]
+    episode_lengths: List[int] = progress["episode_lengths"]
+    winners: List[Optional[int]] = progress["winners"]
+
+    obs, _ = vec_env.reset()
+    checkpoint_due = False
+    while len(episode_rewards) < num_episodes:
+        obs, infos = self_play_step(vec_env, agents, obs)
+
+        for info in infos:
             if "deployed_unit" in info:
                 unit_usage[info["deployed_unit"]] += 1
             if "used_spell" in info:
                 spell_usage[info["used_spell"]] += 1
-            agent.store(obs, action, reward, next_obs, term or trunc)
-            agent.update()
-            obs = next_obs
-            total_reward += reward
-            step_count += 1
-            if term or trunc:
-                winner = env.state.winner
-                break
 
-        episode_rewards.append(total_reward)
-        episode_lengths.append(step_count)
-        winners.append(winner)
+            if "episode" in info and len(episode_rewards) < num_episodes:
+                episode = info["episode"]
+                winner = episode["winner"]
+                episode_rewards.append(episode["r"])
+                episode_lengths.append(episode["l"])
+                winners.append(winner)
 
-        agent1.decay_epsilon()
-        agent2.decay_epsilon()
-        if winner is None:
-            outcome = "Draw"
-        else:
-            outcome = f"Agent {winner} wins"
-        print(f"Episode {ep+1}: reward={total_reward:.2f} - {outcome}")
+                agent1.decay_epsilon()
+                agent2.decay_epsilon()
+                if winner is None:
+                    outcome = "Draw"
+                else:
+                    outcome = f"Agent {winner} wins"
+                print(
+                    f"Episode {len(episode_rewards)}: "
+                    f"reward={episode['r']:.2f} - {outcome}"
+                )
+                checkpoint_due |= len(episode_rewards) % checkpoint_every == 0
+
+        if checkpoint_dir is not None and checkpoint_due:
+            save_training(checkpoint_dir, checkpoint_agents, progress)
+            checkpoint_due = False
+    vec_env.close()
+    if checkpoint_dir is not None:
+        save_training(checkpoint_dir, checkpoint_agents, progress)
 
     # persist the learned policy for later use
     agent1.save("dqn_model.pth")
     print("Model saved to dqn_model.pth")
 
-    # ------------------------------------------------------------------
+    _report(
+        episode_rewards,
+        episode_lengths,
+        winners,
+        unit_usage,
+        spell_usage,
+        [
+            ["Final Epsilon (Agent1)", f"{agent1.epsilon:.2f}"],
+            ["Final Epsilon (Agent2)", f"{agent2.epsilon:.2f}"],
+        ],
+    )
+
+
+def _report(episode_rewards, episode_lengths, winners, unit_usage, spell_usage,
+            epsilon_rows) -> None:
+    """Plot the reward curve and print the statistics tables."""
+    num_episodes = len(episode_rewards)
     # Display progress graph
     episodes = np.arange(1, num_episodes + 1)
     plt.figure(figsize=(8, 4))
@@ -115,8 +269,7 @@ def train(num_episodes: int = 600, max_steps: int = 115) -> None:
     worst_item = min(spell_usage, key=spell_usage.get)
     fun_rows = [
         ["Episode with Highest Reward", highest_ep],
-        ["Final Epsilon (Agent1)", f"{agent1.epsilon:.2f}"],
-        ["Final Epsilon (Agent2)", f"{agent2.epsilon:.2f}"],
+        *epsilon_rows,
         ["Total Steps", total_steps],
         ["Best Unit", best_unit],
         ["Worst Unit", worst_unit],
@@ -126,5 +279,318 @@ def train(num_episodes: int = 600, max_steps: int = 115) -> None:
     _print_table(fun_rows, "Fun Statistics")
 
 
+
+# ----------------------------------------------------------------------
+# Asynchronous actor-learner training
+
+
+def apex_epsilons(num_actors: int, epsilon: float = APEX_EPSILON,
+                  alpha: float = APEX_ALPHA) -> List[float]:
+    """Return the fixed exploration rate of each of ``num_actors`` actors."""
+    if num_actors == 1:
+        return [epsilon]
+    return [epsilon ** (1 + alpha * i / (num_actors - 1)) for i in range(num_actors)]
+
+
+class SharedWeights:
+    """Network parameters published through one shared-memory block.
+
+    The block holds an int64 version counter followed by the flattened
+    float32 parameters. :meth:`publish` makes the version odd while it
+    writes, so :meth:`pull` can copy without a lock and retry when it
+    raced with a write.
+    """
+
+    def __init__(self, num_params: int, name: Optional[str] = None):
+        self.num_params = num_params
+        nbytes = 8 + 4 * num_params
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = name is None
+        self._version = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf)
+        self._params = np.ndarray((num_params,), dtype=np.float32, buffer=self._shm.buf,
+                                  offset=8)
+        if self._owner:
+            self._version[0] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def version(self) -> int:
+        return int(self._version[0])
+
+    def publish(self, module: torch.nn.Module) -> None:
+        flat = parameters_to_vector(module.parameters()).detach().numpy()
+        self._version[0] += 1
+        self._params[:] = flat
+        self._version[0] += 1
+
+    def pull(self, module: torch.nn.Module, version: int) -> int:
+        """Load the weights into ``module`` if newer than ``version``.
+
+        Returns the version now held by ``module``.
+        """
+        while True:
+            start = self.version
+            if start == version or start == 0:
+                return version
+            if start % 2:
+                continue
+            flat = self._params.copy()
+            if self.version == start:
+                break
+        vector_to_parameters(torch.from_numpy(flat), module.parameters())
+        return start
+
+    def close(self) -> None:
+        self._version = self._params = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _actor(actor_id: int, epsilon: float, weights_name: str, num_params: int,
+           transitions, stop, num_envs: int, max_steps: int, network: str,
+           seed: int, chunk_size: int, pull_every: int) -> None:
+    """Self-play loop of one actor process.
+
+    Both players are driven by the same local copy of the learner's
+    network. Transitions are encoded into replay frames and sent in chunks
+    of ``chunk_size``; finished episodes are reported individually.
+    """
+    torch.set_num_threads(1)
+    torch.manual_seed(seed)
+    weights = SharedWeights(num_params, name=weights_name)
+    agent = DQNAgent(GridsEnv(), buffer_size=1, epsilon_start=epsilon, network=network)
+    version = weights.pull(agent.policy_net, -1)
+    vec_env = GridsVecEnv(num_envs, max_episode_steps=max_steps, obs_mode="flat")
+
+    small = np.zeros((2, chunk_size, SMALL_SIZE), dtype=np.int8)
+    health = np.zeros((2, chunk_size, BOARD_CELLS), dtype=np.int16)
+    actions = np.zeros(chunk_size, dtype=ACTION_DTYPE)
+    rewards = np.zeros(chunk_size, dtype=np.float32)
+    dones = np.zeros(chunk_size, dtype=np.bool_)
+    streams = np.zeros(chunk_size, dtype=np.int32)
+    unit_usage, spell_usage = Counter(), Counter()
+    count = 0
+
+    def send(message) -> bool:
+        while not stop.is_set():
+            try:
+                transitions.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    try:
+        obs, _ = vec_env.reset(seed=seed)
+        steps = 0
+        while not stop.is_set():
+            chosen = agent.select_actions(obs, vec_env.action_masks)
+            for i in range(num_envs):
+                encode_obs(obs[i], small[0, count + i], health[0, count + i])
+            obs, step_rewards, terms, _, infos = vec_env.step(chosen)
+            for i, info in enumerate(infos):
+                k = count + i
+                next_obs = info.get("final_observation")
+                if next_obs is None:
+                    next_obs = obs[i]
+                encode_obs(next_obs, small[1, k], health[1, k])
+                actions[k] = action_to_index(chosen[i])
+                rewards[k] = step_rewards[i]
+                dones[k] = terms[i]
+                streams[k] = actor_id * num_envs + i
+                if "deployed_unit" in info:
+                    unit_usage[info["deployed_unit"]] += 1
+                if "used_spell" in info:
+                    spell_usage[info["used_spell"]] += 1
+                if "episode" in info:
+                    episode = info["episode"]
+                    if not send(("episode", actor_id, episode["r"], episode["l"],
+                                 episode["winner"], unit_usage, spell_usage)):
+                        return
+                    unit_usage, spell_usage = Counter(), Counter()
+            count += num_envs
+            if count + num_envs > chunk_size:
+                chunk = (small[0, :count].copy(), health[0, :count].copy(),
+                         actions[:count].copy(), rewards[:count].copy(),
+                         small[1, :count].copy(), health[1, :count].copy(),
+                         dones[:count].copy(), streams[:count].copy())
+                if not send(("transitions", actor_id, chunk)):
+                    return
+                count = 0
+            steps += 1
+            if steps % pull_every == 0:
+                version = weights.pull(agent.policy_net, version)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        vec_env.close()
+        del agent
+        weights.close()
+
+
+def train_async(num_episodes: int = 600, max_steps: int = 115, num_actors: int = 4,
+                envs_per_actor: int = 4, prioritized: bool = False,
+                network: str = "dense", chunk_size: int = 64,
+                publish_every: int = 50, pull_every: int = 20, seed: int = 0,
+                start_method: Optional[str] = None, report: bool = True,
+                checkpoint_dir: Optional[str] = None,
+                checkpoint_every: int = 50) -> DQNAgent:
+    """Train one shared policy with asynchronous actors and a central learner.
+
+    ``num_actors`` processes each play ``envs_per_actor`` self-play games
+    with a local copy of the policy and a fixed Ape-X exploration rate (see
+    :func:`apex_epsilons`). They send transitions as encoded replay frames
+    in chunks of about ``chunk_size`` through a queue. The main process
+    stores them with :meth:`ReplayMemory.store_encoded` and calls
+    :meth:`DQNAgent.update` after every drained batch of messages, so
+    learning never waits for a full vectorized step. Every
+    ``publish_every`` updates the weights are published through
+    :class:`SharedWeights`; actors pull them every ``pull_every`` steps.
+
+    Returns the learner's agent after saving its weights to
+    ``dqn_model.pth``. ``report=False`` skips the plot and tables.
+    ``checkpoint_dir`` and ``checkpoint_every`` checkpoint and resume the
+    learner as in :func:`train`.
+    """
+    if chunk_size < envs_per_actor:
+        raise ValueError("chunk_size must be at least envs_per_actor")
+    learner = DQNAgent(GridsEnv(), prioritized=prioritized, network=network)
+    if checkpoint_dir is not None:
+        progress = load_training(checkpoint_dir, {"learner": learner})
+    else:
+        progress = _new_progress()
+    num_params = sum(p.numel() for p in learner.policy_net.parameters())
+    weights = SharedWeights(num_params)
+    weights.publish(learner.policy_net)
+
+    ctx = mp.get_context(start_method)
+    transitions = ctx.Queue(maxsize=4 * num_actors)
+    stop = ctx.Event()
+    epsilons = apex_epsilons(num_actors)
+    actors = []
+    for actor_id, epsilon in enumerate(epsilons):
+        process = ctx.Process(
+            target=_actor,
+            args=(actor_id, epsilon, weights.name, num_params, transitions, stop,
+                  envs_per_actor, max_steps, network, seed + 1000 * actor_id,
+                  chunk_size, pull_every),
+            daemon=True,
+        )
+        process.start()
+        actors.append(process)
+
+    unit_usage = progress["unit_usage"]
+    spell_usage = progress["spell_usage"]
+    episode_rewards: List[float] = progress["episode_rewards"]
+    episode_lengths: List[int] = progress["episode_lengths"]
+    winners: List[Optional[int]] = progress["winners"]
+    checkpoint_due = False
+
+    def handle(message) -> None:
+        nonlocal checkpoint_due
+        kind, actor_id, *payload = message
+        if kind == "transitions":
+            learner.buffer.store_encoded(*payload[0])
+        elif len(episode_rewards) < num_episodes:
+            reward, length, winner, units, spells = payload
+            episode_rewards.append(reward)
+            episode_lengths.append(length)
+            winners.append(winner)
+            for name, count in units.items():
+                unit_usage[name] += count
+            for name, count in spells.items():
+                spell_usage[name] += count
+            outcome = "Draw" if winner is None else f"Player {winner} wins"
+            print(
+                f"Episode {len(episode_rewards)} (actor {actor_id}): "
+                f"reward={reward:.2f} - {outcome}"
+            )
+            checkpoint_due |= len(episode_rewards) % checkpoint_every == 0
+
+    try:
+        while len(episode_rewards) < num_episodes:
+            try:
+                if len(learner.buffer) < learner.batch_size:
+                    # nothing to learn from yet: wait for the actors
+                    handle(transitions.get(timeout=1.0))
+                while True:
+                    handle(transitions.get_nowait())
+            except queue.Empty:
+                pass
+            if not all(actor.is_alive() for actor in actors):
+                raise RuntimeError("an actor process exited unexpectedly")
+            if len(learner.buffer) >= learner.batch_size:
+                learner.update()
+                if learner.steps_done % publish_every == 0:
+                    weights.publish(learner.policy_net)
+            if checkpoint_dir is not None and checkpoint_due:
+                save_training(checkpoint_dir, {"learner": learner}, progress)
+                checkpoint_due = False
+    finally:
+        stop.set()
+        for actor in actors:
+            # keep draining so actors blocked on a full queue can exit
+            while actor.is_alive():
+                try:
+                    transitions.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            actor.join()
+        transitions.close()
+        weights.close()
+
+    if checkpoint_dir is not None:
+        save_training(checkpoint_dir, {"learner": learner}, progress)
+    learner.save("dqn_model.pth")
+    print(f"Model saved to dqn_model.pth after {learner.steps_done} updates")
+    if report:
+        _report(
+            episode_rewards,
+            episode_lengths,
+            winners,
+            unit_usage,
+            spell_usage,
+            [[f"Epsilon (Actor {i})", f"{eps:.3f}"] for i, eps in enumerate(epsilons)],
+        )
+    return learner
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Train a DQN agent for Grids.")
+    parser.add_argument("--episodes", type=int, default=600)
+    parser.add_argument("--max-steps", type=int, default=115)
+    parser.add_argument("--network", choices=("dense", "branching"), default="dense")
+    parser.add_argument("--prioritized", action="store_true",
+                        help="use prioritized experience replay")
+    parser.add_argument("--envs", type=int, default=8,
+                        help="games per vectorized env (per actor with --actors)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="subprocesses stepping the games of synchronous training")
+    parser.add_argument("--actors", type=int, default=0,
+                        help="train asynchronously with this many actor processes")
+    parser.add_argument("--checkpoint-dir",
+                        help="save checkpoints here and resume from the latest one")
+    parser.add_argument("--checkpoint-every", type=int, default=50,
+                        help="episodes between checkpoints")
+    args = parser.parse_args(argv)
+    if args.actors:
+        train_async(args.episodes, args.max_steps, num_actors=args.actors,
+                    envs_per_actor=args.envs, prioritized=args.prioritized,
+                    network=args.network, checkpoint_dir=args.checkpoint_dir,
+                    checkpoint_every=args.checkpoint_every)
+    else:
+        train(args.episodes, args.max_steps, num_envs=args.envs,
+              num_workers=args.workers, prioritized=args.prioritized,
+              network=args.network, checkpoint_dir=args.checkpoint_dir,
+              checkpoint_every=args.checkpoint_every)
+
+
 if __name__ == "__main__":
-    train()
+    main()
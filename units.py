@@ -1,28 +1,14 @@
-import arcade
-import math
+class Unit:
+    """Pure game-logic representation of a unit on the board.
 
-from constants import CELL_SIZE
-from entities import GameEntity
+    Units carry no rendering state so :class:`GameState` can create them
+    cheaply when running headless. Sprites and animation data are attached
+    separately by :class:`game.UnitView` when a window exists.
+    """
 
-class Unit(GameEntity):
-    SPRITE_PATHS = {
-        "Commander": "sprites/units/commander.png",
-        "Warrior": "sprites/units/warrior.png",
-        "Archer": "sprites/units/archer.png",
-        "Healer": "sprites/units/healer.png",
-        "Trebuchet": "sprites/units/trebuchet.png",
-        "Viking": "sprites/units/viking.png",
-    }
     def __init__(self, row, col, unit_type, owner, health, attack, move_range, attack_range, cost, deploy_cost=1):
-        color = arcade.color.BLUE if owner == 1 else arcade.color.RED
-        sprite_path = self.SPRITE_PATHS.get(unit_type, "sprites/units/commander.png")
-        # Original unit artwork is extremely large (1024x1536 pixels). Scaling
-        # based on the larger dimension ensures the sprite fits inside a single
-        # grid cell regardless of the cell size. 1536 corresponds to the
-        # original sprite height.
-        sprite = arcade.Sprite(sprite_path, scale=CELL_SIZE / 1536)
-        sprite.color = color
-        super().__init__(row, col, sprite)
+        self.row = row
+        self.col = col
         self.unit_type = unit_type
         self.owner = owner  # e.g., player 1 or 2
         self.health = health
@@ -41,15 +27,16 @@ class Unit(GameEntity):
         # Track which targets this unit has attacked during the current turn
         self.attacked_targets = set()
 
-        # Animation attributes
-        self.pixel_x = self.col * CELL_SIZE + CELL_SIZE / 2
-        self.pixel_y = self.row * CELL_SIZE + CELL_SIZE / 2
-        self.target_pixel_x = self.pixel_x
-        self.target_pixel_y = self.pixel_y
-        self.start_pixel_x = self.pixel_x
-        self.start_pixel_y = self.pixel_y
-        self.animation_timer = 0.0
-        self.move_queue = []
+    def copy(self):
+        """Return an independent copy of this unit.
+
+        ``attacked_targets`` is copied as a new set that still refers to the
+        original target objects; :meth:`GameState.clone` remaps them.
+        """
+        unit = self.__class__.__new__(self.__class__)
+        unit.__dict__ = self.__dict__.copy()
+        unit.attacked_targets = set(self.attacked_targets)
+        return unit
 
     def describe(self):
         """Return a human-readable summary of the unit's key stats."""
@@ -59,63 +46,6 @@ class Unit(GameEntity):
             f"Move: {self.move_range}, Range: {self.attack_range}"
         )
 
-    def draw(self):
-        """Render the unit sprite."""
-        self.sprite.center_x = self.pixel_x
-        self.sprite.center_y = self.pixel_y
-        arcade.draw_sprite(self.sprite)
-        if self.frozen_turns > 0:
-            arcade.draw_text(
-                "F",
-                self.pixel_x - CELL_SIZE / 4,
-                self.pixel_y + CELL_SIZE / 4,
-                arcade.color.CYAN,
-                12,
-            )
-        if self.burn_turns > 0:
-            arcade.draw_text(
-                "B",
-                self.pixel_x + CELL_SIZE / 4 - 8,
-                self.pixel_y + CELL_SIZE / 4,
-                arcade.color.RED,
-                12,
-            )
-
-    def start_move(self, path):
-        """Begin moving along the provided path."""
-        # Copy the path so callers retain the original list. This prevents side
-        # effects such as the move list being emptied by the first step which
-        # previously caused index errors for the caller when they accessed the
-        # path after calling ``start_move``.
-        self.move_queue = list(path)
-        if self.move_queue:
-            self._begin_next_step()
-
-    def _begin_next_step(self):
-        next_row, next_col = self.move_queue.pop(0)
-        self.start_pixel_x = self.pixel_x
-        self.start_pixel_y = self.pixel_y
-        self.target_pixel_x = next_col * CELL_SIZE + CELL_SIZE / 2
-        self.target_pixel_y = next_row * CELL_SIZE + CELL_SIZE / 2
-        self.animation_timer = 0.0
-
-    def update_animation(self, delta_time):
-        if self.pixel_x != self.target_pixel_x or self.pixel_y != self.target_pixel_y:
-            self.animation_timer += delta_time
-            progress = min(self.animation_timer / 0.2, 1.0)
-            hop = math.sin(progress * math.pi) * 10
-            self.pixel_x = (self.target_pixel_x - self.start_pixel_x) * progress + self.start_pixel_x
-            self.pixel_y = (self.target_pixel_y - self.start_pixel_y) * progress + self.start_pixel_y + hop
-            if progress >= 1.0:
-                self.pixel_x = self.target_pixel_x
-                self.pixel_y = self.target_pixel_y
-                self.row = int(self.target_pixel_y // CELL_SIZE)
-                self.col = int(self.target_pixel_x // CELL_SIZE)
-                if self.move_queue:
-                    self._begin_next_step()
-        self.sprite.center_x = self.pixel_x
-        self.sprite.center_y = self.pixel_y
-
 class Warrior(Unit):
     def __init__(self, row, col, owner):
         super().__init__(row, col, "Warrior", owner, health=100, attack=40, move_range=2, attack_range=1, cost=2)
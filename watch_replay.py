@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import arcade
+
+from game import GridsGame
+from recording import GameRecording
+
+
+class ReplayViewer(GridsGame):
+    """Replay a recorded game in the regular GUI.
+
+    Actions are performed every ``step_delay`` seconds. Space pauses, the
+    right arrow steps once, the left arrow goes back one ply and Home
+    restarts; going back seeks from the nearest checkpoint.
+    """
+
+    def __init__(self, recording: GameRecording, step_delay: float = 0.5, start: int = 0):
+        self.recording = recording
+        self.step_delay = step_delay
+        self.paused = False
+        super().__init__()
+        self.seek(start)
+
+    def _sync_ui(self):
+        self.current_action_points = self.state.current_action_points
+        self.current_player = self.state.current_player
+        self.units = self.state.units
+        self.obstacles = self.state.obstacles
+        self.sync_hands()
+
+    def seek(self, ply: int) -> None:
+        """Jump to the state after ``ply`` actions."""
+        self.ply = max(0, min(ply, len(self.recording)))
+        self.state = self.recording.state_at(self.ply)
+        self.unit_views = {}
+        self._sync_ui()
+        self.last_step = time.time()
+
+    def step(self) -> bool:
+        """Perform the next recorded action; ``False`` once the replay is over."""
+        if self.ply >= len(self.recording):
+            return False
+        self.state.perform(self.recording.action(self.ply))
+        self.ply += 1
+        self._sync_ui()
+        self.last_step = time.time()
+        return True
+
+    def on_update(self, delta_time):
+        super().on_update(delta_time)
+        if self.paused or time.time() - self.last_step < self.step_delay:
+            return
+        self.step()
+
+    def on_key_press(self, key, modifiers):
+        if key == arcade.key.SPACE:
+            self.paused = not self.paused
+        elif key == arcade.key.RIGHT:
+            self.step()
+        elif key == arcade.key.LEFT:
+            self.seek(self.ply - 1)
+        elif key == arcade.key.HOME:
+            self.seek(0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a recorded Grids game.")
+    parser.add_argument("path", help="recording written by recording.GameRecorder")
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds per action")
+    parser.add_argument("--start", type=int, default=0, help="ply to start from")
+    args = parser.parse_args(argv)
+    ReplayViewer(GameRecording.load(args.path), step_delay=args.delay, start=args.start)
+    arcade.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Zobrist hashing of :class:`GameState` positions and a transposition table.
+
+A position hash is the XOR of one random 64-bit key per feature:
+
+* every unit's type and owner on its cell, plus its HP bucket, attack level,
+  freeze and burn timers and whether it has attacked this turn,
+* lingering fires and their remaining turns,
+* each player's unit and spell hands (by slot) and deck sizes,
+* the current player, action points, action-block timers and winner.
+
+HP is bucketed (``HP_BUCKET`` points per bucket), so positions that differ
+only by a few hit points share a hash by design. :meth:`GameState.apply`
+updates the hash incrementally; see :attr:`GameState.zobrist_hash`.
+"""
+
+import random
+from collections import namedtuple
+
+from constants import ROWS, COLUMNS, HAND_CAPACITY
+from units import Warrior, Archer, Healer, Trebuchet, Viking
+from cards import Fireball, Freeze, StrengthUp, MeteoriteStrike, ActionBlock, Teleport
+
+# Hit points per HP bucket and the clamps applied to every counted feature.
+HP_BUCKET = 10
+MAX_HP_BUCKETS = 32
+ATTACK_LEVEL = 10
+MAX_ATTACK_LEVELS = 16
+MAX_TIMER = 8
+MAX_ACTION_POINTS = 16
+MAX_DECK_SIZE = 64
+
+UNIT_TYPES = ("Commander", "Warrior", "Archer", "Healer", "Trebuchet", "Viking")
+CARD_TYPES = (
+    Warrior,
+    Archer,
+    Healer,
+    Trebuchet,
+    Viking,
+    Fireball,
+    Freeze,
+    StrengthUp,
+    MeteoriteStrike,
+    ActionBlock,
+    Teleport,
+)
+UNIT_TYPE_IDS = {name: i for i, name in enumerate(UNIT_TYPES)}
+CARD_TYPE_IDS = {card: i for i, card in enumerate(CARD_TYPES)}
+
+
+def _clamp(value, size):
+    return 0 if value < 0 else size - 1 if value >= size else value
+
+
+class ZobristKeys:
+    """Random key tables and the per-feature hash functions built on them."""
+
+    def __init__(self, seed=0x6A09E667):
+        rng = random.Random(seed)
+
+        def table(*shape):
+            if not shape:
+                return rng.getrandbits(64)
+            return [table(*shape[1:]) for _ in range(shape[0])]
+
+        self.piece = table(len(UNIT_TYPES), 3, ROWS, COLUMNS)
+        self.hp = table(ROWS, COLUMNS, MAX_HP_BUCKETS)
+        self.attack = table(ROWS, COLUMNS, MAX_ATTACK_LEVELS)
+        self.frozen = table(ROWS, COLUMNS, MAX_TIMER)
+        self.burn = table(ROWS, COLUMNS, MAX_TIMER)
+        self.attacked = table(ROWS, COLUMNS)
+        self.fire = table(ROWS, COLUMNS, MAX_TIMER)
+        # hands are indexed by player, kind (0 units, 1 spells), slot, card
+        self.hand = table(3, 2, HAND_CAPACITY, len(CARD_TYPES))
+        self.deck = table(3, 2, MAX_DECK_SIZE)
+        self.player = table(3)
+        self.action_points = table(MAX_ACTION_POINTS)
+        self.blocked = table(3, MAX_TIMER)
+        self.winner = table(3)
+
+    def unit_key(self, unit_type, owner, row, col, health, attack, frozen_turns,
+                 burn_turns, has_attacked):
+        """Return the combined key of one unit's features."""
+        key = (
+            self.piece[UNIT_TYPE_IDS[unit_type]][owner][row][col]
+            ^ self.hp[row][col][_clamp(health // HP_BUCKET, MAX_HP_BUCKETS)]
+            ^ self.attack[row][col][_clamp(attack // ATTACK_LEVEL, MAX_ATTACK_LEVELS)]
+        )
+        if frozen_turns:
+            key ^= self.frozen[row][col][_clamp(frozen_turns, MAX_TIMER)]
+        if burn_turns:
+            key ^= self.burn[row][col][_clamp(burn_turns, MAX_TIMER)]
+        if has_attacked:
+            key ^= self.attacked[row][col]
+        return key
+
+    def cards_key(self, state, player):
+        """Return the key of ``player``'s hands and deck sizes."""
+        key = 0
+        for kind, hand in enumerate((state.unit_hands[player], state.spell_hands[player])):
+            slots = self.hand[player][kind]
+            for slot, card in enumerate(hand):
+                card_type = card if isinstance(card, type) else card.__class__
+                key ^= slots[slot][CARD_TYPE_IDS[card_type]]
+        key ^= self.deck[player][0][_clamp(len(state.unit_decks[player]), MAX_DECK_SIZE)]
+        key ^= self.deck[player][1][_clamp(len(state.spell_decks[player]), MAX_DECK_SIZE)]
+        return key
+
+    def fires_key(self, fires):
+        key = 0
+        for (row, col), turns in fires.items():
+            key ^= self.fire[row][col][_clamp(turns, MAX_TIMER)]
+        return key
+
+    def scalars_key(self, current_player, action_points, blocked1, blocked2, winner):
+        return (
+            self.player[current_player]
+            ^ self.action_points[_clamp(action_points, MAX_ACTION_POINTS)]
+            ^ self.blocked[1][_clamp(blocked1, MAX_TIMER)]
+            ^ self.blocked[2][_clamp(blocked2, MAX_TIMER)]
+            ^ self.winner[winner or 0]
+        )
+
+
+# Keys shared by every game state.
+KEYS = ZobristKeys()
+
+
+# ``value`` and ``action`` are whatever the search stores; ``depth`` is the
+# remaining search depth the value was computed with and ``age`` the search
+# generation that stored it.
+TTEntry = namedtuple("TTEntry", "key value depth action age")
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed by Zobrist hash.
+
+    The table holds ``capacity`` entries in buckets of ``ways`` slots
+    (``capacity // ways`` is rounded up to a power of two). When a bucket is
+    full the new entry replaces the slot holding the same position, else the
+    entry from the oldest search generation, breaking ties by the shallowest
+    depth. Call :meth:`new_search` between searches so stale entries are
+    replaced first.
+    """
+
+    def __init__(self, capacity=1 << 16, ways=4):
+        if capacity < ways or ways < 1:
+            raise ValueError("capacity must be at least ways and ways at least 1")
+        num_buckets = 1
+        while num_buckets * ways < capacity:
+            num_buckets *= 2
+        self.ways = ways
+        self._mask = num_buckets - 1
+        self._buckets = [[] for _ in range(num_buckets)]
+        self.age = 0
+        self._size = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    @property
+    def capacity(self):
+        return len(self._buckets) * self.ways
+
+    def __len__(self):
+        return self._size
+
+    def get(self, key, min_depth=0):
+        """Return the entry stored for ``key`` or ``None``.
+
+        Entries searched shallower than ``min_depth`` count as misses.
+        """
+        self.probes += 1
+        for entry in self._buckets[key & self._mask]:
+            if entry.key == key:
+                if entry.depth < min_depth:
+                    return None
+                self.hits += 1
+                return entry
+        return None
+
+    def __contains__(self, key):
+        return any(entry.key == key for entry in self._buckets[key & self._mask])
+
+    def store(self, key, value, depth=0, action=None):
+        """Store ``value`` for ``key``, replacing an entry if the bucket is full.
+
+        An existing entry for the same position from the current search is
+        only overwritten by a result of at least the same depth.
+        """
+        bucket = self._buckets[key & self._mask]
+        entry = TTEntry(key, value, depth, action, self.age)
+        self.stores += 1
+        for i, old in enumerate(bucket):
+            if old.key == key:
+                if old.age == self.age and old.depth > depth:
+                    return
+                bucket[i] = entry
+                return
+        if len(bucket) < self.ways:
+            bucket.append(entry)
+            self._size += 1
+            return
+        victim = min(range(len(bucket)), key=lambda i: (bucket[i].age, bucket[i].depth))
+        bucket[victim] = entry
+        self.replacements += 1
+
+    def new_search(self):
+        """Start a new search generation."""
+        self.age += 1
+
+    def clear(self):
+        for bucket in self._buckets:
+            bucket.clear()
+        self._size = 0
+        self.age = 0
+        self.probes = self.hits = self.stores = self.replacements = 0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """Return occupancy and hit-rate counters as a dict."""
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "stores": self.stores,
+            "replacements": self.replacements,
+        }